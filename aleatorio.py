@@ -0,0 +1,52 @@
+import threading
+
+import numpy as np
+
+
+class SemillasGeneracion:
+    """
+    Fuente de generadores aleatorios independientes para cada petición.
+    
+    Una SeedSequence raíz (con semilla fija o de entropía del sistema)
+    reparte hijos con spawn(); cada generación de rutina, el hilo del pool
+    o un optimizador reciben su propio np.random.Generator. Así con la
+    misma semilla raíz se repite la misma secuencia de rutinas, y los
+    trabajadores en paralelo tienen flujos independientes sin compartir
+    estado ni bloquearse al sortear (solo el reparto de hijos usa un lock).
+    """
+    
+    def __init__(self, semilla=None):
+        self.raiz = np.random.SeedSequence(semilla)
+        self._lock = threading.Lock()
+    
+    @property
+    def semilla(self):
+        """Entropía de la raíz (sirve para repetir una ejecución sin semilla fija)"""
+        return self.raiz.entropy
+    
+    def nuevo(self):
+        """Generator con un flujo nuevo e independiente"""
+        with self._lock:
+            hija = self.raiz.spawn(1)[0]
+        return np.random.default_rng(hija)
+    
+    def lote(self, cantidad):
+        """Varios Generator independientes (p. ej. uno por trabajador)"""
+        with self._lock:
+            hijas = self.raiz.spawn(cantidad)
+        return [np.random.default_rng(h) for h in hijas]
+
+
+def entero(rng, minimo, maximo):
+    """Entero en [minimo, maximo] (ambos incluidos, como random.randint)"""
+    return int(rng.integers(minimo, maximo + 1))
+
+
+def elegir(rng, secuencia):
+    """Elemento al azar de una secuencia (como random.choice)"""
+    return secuencia[int(rng.integers(len(secuencia)))]
+
+
+def muestra(rng, poblacion, cantidad):
+    """Muestra sin reemplazo (como random.sample)"""
+    return [poblacion[i] for i in rng.choice(len(poblacion), size=cantidad, replace=False)]
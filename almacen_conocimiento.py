@@ -0,0 +1,355 @@
+import json
+import os
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+
+from codec_conocimiento import abrir_lectura, codificar_base, detectar_compresion, escritura_texto
+from lector_json import cargar_json, recorrer_json, coincide_camino
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def bloqueo_exclusivo(ruta):
+    """
+    Bloqueo consultivo entre procesos sobre un archivo auxiliar
+    
+    Se bloquea un archivo '.lock' aparte y no el de datos, porque el de
+    datos se reemplaza con os.replace al compactar.
+    """
+    with open(ruta, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK se rinde tras ~10 s
+                    time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def firma_archivo(ruta):
+    """(inodo, mtime, tamaño) de un archivo, o None si no existe"""
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def escribir_json_atomico(ruta, data, compresion=None, **opciones):
+    """Escribe un JSON (comprimido en flujo si se pide) en un temporal y lo cambia por el archivo de una vez"""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as crudo:
+        with escritura_texto(crudo, compresion) as f:
+            json.dump(data, f, **opciones)
+        os.fsync(crudo.fileno())
+    os.replace(temporal, ruta)
+
+
+class DiarioConocimiento:
+    """
+    Diario de cambios compartido por varios procesos sobre una misma base.
+    
+    Junto al archivo de datos (la instantánea completa) se mantiene un
+    diario '<datos>.diario' con una línea JSON por cambio aprendido
+    (rutina generada, feedback). Cada proceso recuerda hasta qué posición
+    del diario ha leído; al guardar, bajo el bloqueo:
+    
+        1. lee solo lo añadido por otros procesos desde esa posición y lo
+           aplica en memoria,
+        2. añade al final sus propios cambios pendientes,
+        3. solo si el diario ha crecido mucho, compacta: escribe la
+           instantánea completa (temporal + os.replace) y empieza un diario
+           nuevo.
+    
+    Así nadie pierde lo aprendido por otro proceso y en el caso normal el
+    bloqueo dura lo que tarda en añadirse unas líneas, no en reescribir el
+    archivo entero.
+    
+    La primera línea del diario es su cabecera con una 'época' aleatoria;
+    la instantánea guarda la época del diario que le sigue. Si no coinciden
+    (otro proceso compactó, o un corte entre escribir la instantánea y
+    reiniciar el diario) el diario ya está incluido en la instantánea y no
+    se aplica.
+    
+    La instantánea se escribe en JSON plano con sangría o, si se elige un
+    compresor de codec_conocimiento, compacta, codificada con diccionario
+    y comprimida. Al leer el formato se detecta solo.
+    """
+    
+    # Tamaño del diario a partir del cual se compacta en la instantánea
+    TAMANO_COMPACTACION = 4 * 1024 * 1024
+    
+    def __init__(self, ruta_datos, tamano_compactacion=None, compresion='auto'):
+        """
+        Args:
+            ruta_datos: Archivo de la instantánea
+            tamano_compactacion: Bytes de diario que provocan compactar
+            compresion: Formato de la instantánea al compactar: None (JSON
+                plano), 'gzip', 'bz2', 'lzma' o 'auto' (el que ya tenga el
+                archivo, para que un proceso no deshaga la elección de otro)
+        """
+        self.ruta_datos = ruta_datos
+        self.ruta_diario = ruta_datos + '.diario'
+        self.ruta_bloqueo = ruta_datos + '.lock'
+        self.tamano_compactacion = tamano_compactacion or self.TAMANO_COMPACTACION
+        self.compresion = compresion
+        
+        # Identifica las entradas de este proceso (y de esta instancia)
+        self.origen = uuid.uuid4().hex
+        
+        self.epoca = None      # Época del diario con la que está sincronizada la memoria
+        self.posicion = 0      # Bytes del diario ya aplicados
+        self.pendientes = []   # Cambios propios todavía no escritos
+        
+        # Instantánea leída o escrita por última vez (para detectar reemplazos
+        # externos, p. ej. la herramienta de fusión) y firma de ambos archivos
+        # tras la última sincronización
+        self.firma_datos = None
+        self.firma_sincronizada = None
+    
+    def bloqueo(self):
+        return bloqueo_exclusivo(self.ruta_bloqueo)
+    
+    def firma(self):
+        """Firma de instantánea y diario; cambia con cualquier escritura de cualquier proceso"""
+        return firma_archivo(self.ruta_datos), firma_archivo(self.ruta_diario)
+    
+    def hay_cambios(self):
+        """
+        Comprobación barata (dos stat, sin bloqueo) de si alguien ha
+        escrito desde la última sincronización
+        """
+        return self.firma() != self.firma_sincronizada
+    
+    def marcar_sincronizado(self):
+        self.firma_sincronizada = self.firma()
+    
+    def instantanea_reemplazada(self):
+        """La instantánea en disco ya no es la que se leyó o escribió por última vez"""
+        return firma_archivo(self.ruta_datos) != self.firma_datos
+    
+    def registrar(self, tipo, datos):
+        """Anota un cambio propio para escribirlo en el próximo guardado"""
+        self.pendientes.append({'tipo': tipo, 'origen': self.origen, 'datos': datos})
+    
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    
+    def _leer_cabecera(self, f):
+        linea = f.readline()
+        if not linea.endswith(b'\n'):
+            return None
+        try:
+            return json.loads(linea).get('epoca')
+        except ValueError:
+            return None
+    
+    def epoca_actual(self):
+        """Época del diario en disco (None si no hay diario)"""
+        try:
+            with open(self.ruta_diario, 'rb') as f:
+                return self._leer_cabecera(f)
+        except FileNotFoundError:
+            return None
+    
+    def leer_desde(self, epoca, posicion):
+        """
+        Entradas del diario desde una posición, si sigue siendo de esa época
+        
+        Returns:
+            tuple: (entradas, nueva posición), o (None, 0) si la época no coincide
+        """
+        try:
+            f = open(self.ruta_diario, 'rb')
+        except FileNotFoundError:
+            return None, 0
+        
+        with f:
+            return self._leer_entradas(f, epoca, posicion)
+    
+    def _leer_entradas(self, f, epoca, posicion):
+        """leer_desde sobre un diario ya abierto (en binario, desde el principio)"""
+        if epoca is None or self._leer_cabecera(f) != epoca:
+            return None, 0
+        posicion = max(posicion, f.tell())
+        f.seek(posicion)
+        entradas = []
+        while True:
+            linea = f.readline()
+            # Una línea sin '\n' es una escritura a medias: se relee luego
+            if not linea.endswith(b'\n'):
+                break
+            entradas.append(json.loads(linea))
+            posicion = f.tell()
+        return entradas, posicion
+    
+    def cargar_instantanea(self):
+        """
+        Lee la instantánea y las entradas del diario que aún no incluye
+        
+        Returns:
+            tuple: (data o None si no existe, entradas del diario)
+        """
+        firma_datos = firma_archivo(self.ruta_datos)
+        if firma_datos is None:
+            data, epoca = None, self.epoca_actual()
+        else:
+            # Si falla la lectura no se da la instantánea por leída, para que
+            # instantanea_reemplazada vuelva a intentarlo
+            data = cargar_json(self.ruta_datos)
+            epoca = data.get('epoca_diario')
+        self.firma_datos = firma_datos
+        self.epoca, self.posicion = epoca, 0
+        
+        entradas, posicion = self.leer_desde(self.epoca, self.posicion)
+        if entradas is None:
+            # Sin diario o de otra época: ya está todo en la instantánea
+            return data, []
+        self.posicion = posicion
+        return data, entradas
+    
+    # ------------------------------------------------------------------
+    # Escritura (siempre con el bloqueo tomado)
+    # ------------------------------------------------------------------
+    
+    def necesita_compactar(self):
+        if self.epoca is None or self.epoca != self.epoca_actual():
+            return True
+        try:
+            return os.path.getsize(self.ruta_diario) >= self.tamano_compactacion
+        except OSError:
+            return True
+    
+    def escribir_pendientes(self):
+        """Añade los cambios pendientes al final del diario"""
+        if not self.pendientes:
+            return
+        texto = ''.join(json.dumps(e, ensure_ascii=False, default=str) + '\n' for e in self.pendientes)
+        with open(self.ruta_diario, 'r+b') as f:
+            # Lo que haya tras la última línea completa leída es una
+            # escritura cortada de un proceso que murió: se descarta
+            f.truncate(self.posicion)
+            f.seek(self.posicion)
+            f.write(texto.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+            self.posicion = f.tell()
+        self.pendientes = []
+    
+    def compactar(self, data):
+        """
+        Escribe la instantánea completa y empieza un diario vacío
+        
+        Args:
+            data: Contenido completo de la base (ya incluye los pendientes)
+        """
+        epoca = uuid.uuid4().hex
+        data['epoca_diario'] = epoca
+        compresion = self.compresion
+        if compresion == 'auto':
+            compresion = detectar_compresion(self.ruta_datos)
+        if compresion is None:
+            escribir_json_atomico(self.ruta_datos, data, indent=2, ensure_ascii=False)
+        else:
+            escribir_json_atomico(self.ruta_datos, codificar_base(data), compresion,
+                                  ensure_ascii=False, separators=(',', ':'))
+        self.firma_datos = firma_archivo(self.ruta_datos)
+        
+        temporal = f"{self.ruta_diario}.{os.getpid()}.tmp"
+        with open(temporal, 'wb') as f:
+            f.write((json.dumps({'epoca': epoca}) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+            posicion = f.tell()
+        os.replace(temporal, self.ruta_diario)
+        
+        self.epoca, self.posicion = epoca, posicion
+        self.pendientes = []
+
+
+def recorrer_base(ruta_datos, flujos, omitir=()):
+    """
+    Recorre en flujo una base de conocimiento y su diario
+    
+    Para herramientas que leen la base sin AdvancedGymAI (p. ej. la
+    fusión) y que no deben cargar el archivo entero. Instantánea y diario
+    se abren con el bloqueo tomado, así que son coherentes entre sí aunque
+    otro proceso compacte mientras se leen (los archivos ya abiertos
+    conservan su contenido). Las rutinas y el feedback del diario se
+    entregan al final con los caminos que tendrían en la instantánea
+    (rutinas_generadas, historico_usuarios, patrones_exitosos/<clave>),
+    sin recalcular los agregados.
+    
+    Args:
+        flujos, omitir: Como en lector_json.recorrer_json
+    
+    Yields:
+        tuple: (camino, valor), como lector_json.recorrer_json
+    """
+    diario = DiarioConocimiento(ruta_datos)
+    with ExitStack() as pila:
+        with diario.bloqueo():
+            f_datos = _abrir_si_existe(pila, abrir_lectura, ruta_datos)
+            f_diario = _abrir_si_existe(pila, open, diario.ruta_diario, 'rb')
+        
+        epoca = None
+        if f_datos is not None:
+            for camino, valor in recorrer_json(f_datos, flujos, omitir):
+                if camino == ('epoca_diario',):
+                    epoca = valor
+                yield camino, valor
+        elif f_diario is not None:
+            # Sin instantánea el diario es todo lo que hay (como en cargar_instantanea)
+            epoca = diario._leer_cabecera(f_diario)
+            f_diario.seek(0)
+        
+        if f_diario is None:
+            return
+        entradas, _ = diario._leer_entradas(f_diario, epoca, 0)
+        for camino, valor in _caminos_entradas(entradas or []):
+            if any(coincide_camino(camino, patron) for patron in flujos):
+                yield camino, valor
+
+
+def _abrir_si_existe(pila, abrir, *args):
+    try:
+        return pila.enter_context(abrir(*args))
+    except FileNotFoundError:
+        return None
+
+
+def _caminos_entradas(entradas):
+    """Registros del diario con el camino que tendrían en la instantánea"""
+    for entrada in entradas:
+        datos = entrada['datos']
+        if entrada['tipo'] == 'rutina':
+            yield ('learning_system', 'rutinas_generadas'), datos
+        elif entrada['tipo'] == 'feedback':
+            experiencia = datos['experiencia']
+            yield ('learning_system', 'historico_usuarios'), experiencia
+            if experiencia.get('satisfaccion', 0) >= 4:
+                perfil = experiencia['perfil']
+                clave = f"{perfil['nivel_str']}_{perfil['objetivo_str']}"
+                yield ('learning_system', 'patrones_exitosos', clave), {
+                    'rutina': datos['rutina'],
+                    'satisfaccion': experiencia['satisfaccion'],
+                    'fecha': experiencia['fecha']
+                }
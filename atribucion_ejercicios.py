@@ -0,0 +1,261 @@
+import re
+
+import numpy as np
+
+from indice_rutinas import IndiceRutinas
+
+
+# Bandas de repeticiones (por repeticiones máximas): fuerza <= 6, hipertrofia <= 12, resistencia
+LIMITES_BANDAS_REPS = np.array([6, 12])
+NOMBRES_BANDAS = ('fuerza', 'hipertrofia', 'resistencia')
+
+
+def banda_repeticiones(repeticiones):
+    """Índice de banda para un texto de repeticiones como '8-12'"""
+    numeros = re.findall(r'\d+', str(repeticiones))
+    if not numeros:
+        return 1
+    return int(np.searchsorted(LIMITES_BANDAS_REPS, int(numeros[-1])))
+
+
+class EstadisticasEjercicios:
+    """
+    Satisfacción atribuida a cada ejercicio y a cada (ejercicio, banda de reps).
+    
+    Cada feedback se atribuye a todos los ejercicios de la rutina y se
+    acumula en línea (Welford: n, media, M2) sobre arrays indexados por el
+    ID del catálogo. Las estimaciones se contraen hacia la media del grupo
+    muscular (y ésta hacia la media global) con fuerza k:
+    
+        estimacion = (n * media + k * media_grupo) / (n + k)
+    
+    Las tablas de estimaciones se recalculan solo cuando hay datos nuevos;
+    con ellas la satisfacción esperada de una rutina es una suma de
+    búsquedas en arrays, así puntuar muchas rutinas candidatas es una sola
+    operación vectorizada (ver esperada_lote).
+    """
+    
+    # Peso máximo de la estimación por ejercicios al mezclarla con la
+    # predicción por usuarios similares
+    PESO_MAXIMO = 0.5
+    
+    def __init__(self, catalogo, fuerza_contraccion=5.0):
+        self.catalogo = catalogo
+        self.k = fuerza_contraccion
+        
+        n = len(catalogo)
+        self.n = np.zeros(n)
+        self.media = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.n_banda = np.zeros((n, len(NOMBRES_BANDAS)))
+        self.media_banda = np.zeros((n, len(NOMBRES_BANDAS)))
+        self.m2_banda = np.zeros((n, len(NOMBRES_BANDAS)))
+        
+        self._tabla = None  # (id, banda) -> satisfacción estimada
+        self.total_feedback = 0
+    
+    def _asegurar_tamano(self):
+        """Amplía los arrays si el catálogo ha crecido"""
+        faltan = len(self.catalogo) - len(self.n)
+        if faltan <= 0:
+            return
+        self.n = np.concatenate([self.n, np.zeros(faltan)])
+        self.media = np.concatenate([self.media, np.zeros(faltan)])
+        self.m2 = np.concatenate([self.m2, np.zeros(faltan)])
+        extra = np.zeros((faltan, len(NOMBRES_BANDAS)))
+        self.n_banda = np.vstack([self.n_banda, extra])
+        self.media_banda = np.vstack([self.media_banda, extra])
+        self.m2_banda = np.vstack([self.m2_banda, extra])
+    
+    # ------------------------------------------------------------------
+    # Actualización
+    # ------------------------------------------------------------------
+    
+    def ids_y_bandas(self, rutina):
+        """IDs del catálogo y bandas de reps de los ejercicios (sin cardio) de una rutina"""
+        ids = []
+        bandas = []
+        for ejercicios in rutina.get('rutina_semanal', {}).values():
+            for ej in ejercicios:
+                if ej.get('grupo') == 'cardio':
+                    continue
+                ejercicio_id = self.catalogo.id_de(ej.get('grupo'), ej.get('ejercicio'))
+                if ejercicio_id is not None:
+                    ids.append(ejercicio_id)
+                    bandas.append(banda_repeticiones(ej.get('repeticiones')))
+        return ids, bandas
+    
+    def registrar_feedback(self, rutina, satisfaccion):
+        """Atribuye la satisfacción de una rutina a cada uno de sus ejercicios"""
+        if not rutina:
+            return
+        self._asegurar_tamano()
+        
+        for ejercicio_id, banda in zip(*self.ids_y_bandas(rutina)):
+            self.n[ejercicio_id], self.media[ejercicio_id], self.m2[ejercicio_id] = self._welford(
+                self.n[ejercicio_id], self.media[ejercicio_id], self.m2[ejercicio_id], satisfaccion)
+            celda = (ejercicio_id, banda)
+            self.n_banda[celda], self.media_banda[celda], self.m2_banda[celda] = self._welford(
+                self.n_banda[celda], self.media_banda[celda], self.m2_banda[celda], satisfaccion)
+        
+        self.total_feedback += 1
+        self._tabla = None
+    
+    @staticmethod
+    def _welford(n, media, m2, valor):
+        n += 1
+        delta = valor - media
+        media += delta / n
+        m2 += delta * (valor - media)
+        return n, media, m2
+    
+    # ------------------------------------------------------------------
+    # Estimaciones
+    # ------------------------------------------------------------------
+    
+    def _media_global(self):
+        total = self.n.sum()
+        return float((self.n * self.media).sum() / total) if total else 3.5
+    
+    def tabla(self):
+        """Satisfacción estimada por (id, banda), contraída hacia ejercicio, grupo y global"""
+        if self._tabla is not None:
+            return self._tabla
+        self._asegurar_tamano()
+        
+        k = self.k
+        media_global = self._media_global()
+        
+        # Media de cada grupo (agregada desde sus ejercicios) contraída hacia la global
+        grupos = self.catalogo.grupo_id[:len(self.n)]
+        num_grupos = len(self.catalogo.grupos)
+        n_grupo = np.bincount(grupos, weights=self.n, minlength=num_grupos)
+        suma_grupo = np.bincount(grupos, weights=self.n * self.media, minlength=num_grupos)
+        media_grupo = (suma_grupo + k * media_global) / (n_grupo + k)
+        
+        estimacion_ejercicio = (self.n * self.media + k * media_grupo[grupos]) / (self.n + k)
+        self._tabla = ((self.n_banda * self.media_banda + k * estimacion_ejercicio[:, None])
+                       / (self.n_banda + k))
+        return self._tabla
+    
+    def esperada_lote(self, ids, bandas):
+        """
+        Satisfacción esperada y peso de la evidencia para muchas rutinas
+        
+        Args:
+            ids: Array (rutinas x huecos) de IDs, -1 en huecos vacíos
+            bandas: Array de la misma forma con la banda de reps de cada hueco
+        
+        Returns:
+            tuple: (satisfacción esperada, peso de mezcla en [0, PESO_MAXIMO])
+        """
+        ids = np.asarray(ids)
+        bandas = np.asarray(bandas)
+        validos = ids >= 0
+        cuenta = validos.sum(axis=1)
+        seguros = np.where(validos, ids, 0)
+        
+        valores = np.where(validos, self.tabla()[seguros, bandas], 0.0)
+        evidencia = np.where(validos, self.n[seguros], 0.0)
+        
+        divisor = np.maximum(cuenta, 1)
+        esperada = np.where(cuenta > 0, valores.sum(axis=1) / divisor, self._media_global())
+        evidencia_media = evidencia.sum(axis=1) / divisor
+        peso = self.PESO_MAXIMO * evidencia_media / (evidencia_media + self.k)
+        return esperada, peso
+    
+    def esperada_rutinas(self, rutinas):
+        """esperada_lote para rutinas en formato dict"""
+        pares = [self.ids_y_bandas(r) if r else ([], []) for r in rutinas]
+        ancho = max([len(ids) for ids, _ in pares] + [1])
+        ids = np.full((len(rutinas), ancho), -1, dtype=np.int64)
+        bandas = np.zeros((len(rutinas), ancho), dtype=np.int64)
+        for i, (ids_rutina, bandas_rutina) in enumerate(pares):
+            ids[i, :len(ids_rutina)] = ids_rutina
+            bandas[i, :len(bandas_rutina)] = bandas_rutina
+        return self.esperada_lote(ids, bandas)
+    
+    def resumen(self, grupo, nombre):
+        """n, media, varianza y estimación contraída de un ejercicio"""
+        ejercicio_id = self.catalogo.id_de(grupo, nombre)
+        if ejercicio_id is None or ejercicio_id >= len(self.n):
+            return None
+        n = self.n[ejercicio_id]
+        return {
+            'n': int(n),
+            'media': float(self.media[ejercicio_id]),
+            'varianza': float(self.m2[ejercicio_id] / (n - 1)) if n > 1 else 0.0,
+            'por_banda': {
+                nombre_banda: float(self.tabla()[ejercicio_id, b])
+                for b, nombre_banda in enumerate(NOMBRES_BANDAS)
+            }
+        }
+    
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    
+    def a_dict(self):
+        """Formato para guardar en JSON (solo ejercicios con datos, por nombre)"""
+        usados = np.flatnonzero(self.n)
+        return {
+            'ejercicios': [[self.catalogo.grupo(int(i)), self.catalogo.nombre(int(i))] for i in usados],
+            'n': self.n[usados].tolist(),
+            'media': self.media[usados].round(6).tolist(),
+            'm2': self.m2[usados].round(6).tolist(),
+            'n_banda': self.n_banda[usados].tolist(),
+            'media_banda': self.media_banda[usados].round(6).tolist(),
+            'm2_banda': self.m2_banda[usados].round(6).tolist(),
+            'total_feedback': self.total_feedback
+        }
+    
+    @classmethod
+    def desde_dict(cls, data, catalogo, **opciones):
+        """Reconstruye las estadísticas (los ejercicios fuera del catálogo se ignoran)"""
+        estadisticas = cls(catalogo, **opciones)
+        for i, (grupo, nombre) in enumerate(data.get('ejercicios', [])):
+            ejercicio_id = catalogo.id_de(grupo, nombre)
+            if ejercicio_id is None:
+                continue
+            estadisticas.n[ejercicio_id] = data['n'][i]
+            estadisticas.media[ejercicio_id] = data['media'][i]
+            estadisticas.m2[ejercicio_id] = data['m2'][i]
+            estadisticas.n_banda[ejercicio_id] = data['n_banda'][i]
+            estadisticas.media_banda[ejercicio_id] = data['media_banda'][i]
+            estadisticas.m2_banda[ejercicio_id] = data['m2_banda'][i]
+        estadisticas.total_feedback = data.get('total_feedback', 0)
+        return estadisticas
+    
+    def a_arrays(self):
+        """Arrays indexados por ID del catálogo (para IndicesDerivados)"""
+        return {
+            'n': self.n, 'media': self.media, 'm2': self.m2,
+            'n_banda': self.n_banda, 'media_banda': self.media_banda, 'm2_banda': self.m2_banda,
+            'total_feedback': np.array([self.total_feedback])
+        }
+    
+    @classmethod
+    def desde_arrays(cls, arrays, catalogo, **opciones):
+        """Estadísticas sobre arrays de a_arrays (pueden estar mapeados en memoria)"""
+        estadisticas = cls(catalogo, **opciones)
+        estadisticas.n = arrays['n']
+        estadisticas.media = arrays['media']
+        estadisticas.m2 = arrays['m2']
+        estadisticas.n_banda = arrays['n_banda']
+        estadisticas.media_banda = arrays['media_banda']
+        estadisticas.m2_banda = arrays['m2_banda']
+        estadisticas.total_feedback = int(arrays['total_feedback'][0])
+        estadisticas._asegurar_tamano()
+        return estadisticas
+    
+    @classmethod
+    def desde_historico(cls, learning_system, catalogo, **opciones):
+        """Construye las estadísticas desde el histórico (datos sin estadísticas guardadas)"""
+        estadisticas = cls(catalogo, **opciones)
+        rutinas = IndiceRutinas(learning_system.get('rutinas_generadas', []))
+        for experiencia in learning_system.get('historico_usuarios', []):
+            registro = rutinas.obtener(experiencia.get('rutina_id')) or {}
+            rutina = registro.get('rutina') or experiencia.get('rutina_exitosa')
+            if rutina:
+                estadisticas.registrar_feedback(rutina, experiencia.get('satisfaccion', 3))
+        return estadisticas
@@ -0,0 +1,327 @@
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+
+
+class CatalogoEjercicios:
+    """
+    Catálogo de ejercicios con IDs enteros.
+    
+    Cada ejercicio es un ID entero con atributos compactos (grupo y si es
+    compuesto). Los nombres están internados: todas las rutinas comparten
+    la misma cadena por ejercicio. Las tablas de candidatos por
+    (grupo, nivel) se calculan una sola vez, así la selección no tiene que
+    reconstruir listas en cada grupo de cada día.
+    
+    Cada etiqueta (carga articular, equipo, impacto) tiene además un bitset
+    precalculado sobre los IDs, para filtrar por limitaciones con
+    operaciones de bits (ver restricciones.py).
+    """
+    
+    NIVELES = ('principiante', 'intermedio', 'avanzado')
+    
+    # Versión del formato del índice en disco: cambiarla invalida los .idx
+    # (hay que subirla también si cambian los atributos del catálogo)
+    FORMATO_INDICE = 3
+    
+    def __init__(self):
+        self.nombres = []        # id -> nombre
+        self.grupos = []         # grupo_id -> nombre del grupo
+        self._grupo_de = []      # id -> grupo_id
+        self._compuesto = []     # id -> bool
+        self._seleccionable = []  # id -> bool (False: solo conocido por rutinas antiguas)
+        self._etiquetas = []     # id -> tuple de etiquetas
+        self._niveles = []       # id -> tuple de niveles para los que es apto
+        self._ids = {}           # (grupo, nombre) -> id
+        self._ids_grupo = {}     # grupo -> grupo_id
+        self._candidatos = {}    # (grupo, nivel) -> tuple de ids
+        self._bits_candidatos = {}  # (grupo, nivel) -> bitset de ids
+        self._bits_etiqueta = {}    # etiqueta -> bitset de ids
+        self.bits_todos = 0
+        self._tamano_base = (0, 0)  # (ejercicios, grupos) al construir las tablas
+        
+        self.grupo_id = np.zeros(0, dtype=np.int16)
+        self.es_compuesto = np.zeros(0, dtype=bool)
+    
+    @classmethod
+    def desde_ejercicios_base(cls, ejercicios_base, etiquetas=None):
+        """
+        Construye el catálogo a partir del dict ejercicios_base de AdvancedGymAI
+        
+        Args:
+            ejercicios_base: {grupo: {'compuestos': [...], 'aislamiento': [...]}}
+                o {grupo: [...]} para grupos sin distinción (cardio)
+            etiquetas: {nombre: [etiquetas]} opcional
+        """
+        etiquetas = etiquetas or {}
+        catalogo = cls()
+        for grupo, disponibles in ejercicios_base.items():
+            if isinstance(disponibles, dict):
+                compuestos = disponibles.get('compuestos', [])
+                for nombre in compuestos:
+                    catalogo.registrar(nombre, grupo, compuesto=True,
+                                       etiquetas=etiquetas.get(nombre, ()))
+                # Principiantes: solo compuestos (si el grupo los tiene)
+                niveles_aislamiento = ('intermedio', 'avanzado') if compuestos else None
+                for nombre in disponibles.get('aislamiento', []):
+                    catalogo.registrar(nombre, grupo, compuesto=False,
+                                       etiquetas=etiquetas.get(nombre, ()),
+                                       niveles=niveles_aislamiento)
+            else:
+                for nombre in disponibles:
+                    catalogo.registrar(nombre, grupo, compuesto=False,
+                                       etiquetas=etiquetas.get(nombre, ()))
+        catalogo.construir_tablas()
+        return catalogo
+    
+    @classmethod
+    def desde_archivo(cls, ruta, ruta_indice=None):
+        """
+        Carga el catálogo desde un archivo JSON externo
+        
+        El catálogo ya indexado se guarda junto al archivo (ruta + '.idx') y
+        se reutiliza mientras el archivo no cambie (mtime y tamaño), así el
+        arranque no vuelve a parsear ni a indexar.
+        
+        Formato del archivo:
+            {"ejercicios": [{"nombre": ..., "grupo": ..., "compuesto": bool,
+                             "niveles": [...], "etiquetas": [...]}, ...]}
+        
+        Args:
+            ruta: Archivo JSON del catálogo
+            ruta_indice: Archivo del índice (por defecto ruta + '.idx')
+        """
+        ruta_indice = ruta_indice or ruta + '.idx'
+        firma = cls._firma_archivo(ruta)
+        
+        catalogo = cls._cargar_indice(ruta_indice, firma)
+        if catalogo is not None:
+            return catalogo
+        
+        with open(ruta, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        catalogo = cls()
+        for ej in data.get('ejercicios', []):
+            catalogo.registrar(ej['nombre'], ej['grupo'],
+                               compuesto=ej.get('compuesto', False),
+                               etiquetas=ej.get('etiquetas', ()),
+                               niveles=ej.get('niveles'))
+        catalogo.construir_tablas()
+        catalogo._guardar_indice(ruta_indice, firma)
+        return catalogo
+    
+    def guardar(self, ruta):
+        """Exporta el catálogo al formato de archivo de desde_archivo"""
+        ejercicios = []
+        for i, nombre in enumerate(self.nombres):
+            if not self._seleccionable[i]:
+                continue
+            ejercicios.append({
+                'nombre': nombre,
+                'grupo': self.grupo(i),
+                'compuesto': self._compuesto[i],
+                'niveles': list(self._niveles[i]),
+                'etiquetas': list(self._etiquetas[i])
+            })
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({'ejercicios': ejercicios}, f, indent=2, ensure_ascii=False)
+    
+    @staticmethod
+    def _firma_archivo(ruta):
+        estado = os.stat(ruta)
+        return (estado.st_mtime_ns, estado.st_size)
+    
+    @classmethod
+    def _cargar_indice(cls, ruta_indice, firma):
+        """
+        Catálogo indexado desde disco, o None si falta o está desactualizado
+        
+        El archivo lleva primero una cabecera (formato y firma del catálogo)
+        y después el catálogo, en dos pickles: si la cabecera no cuadra no
+        se llega a deserializar el objeto. El índice es solo una caché, así
+        que cualquier error al leerlo (también un pickle de una versión
+        anterior de la clase que ya no se puede reconstruir) hace que se
+        vuelva a construir desde el JSON.
+        """
+        try:
+            with open(ruta_indice, 'rb') as f:
+                cabecera = pickle.load(f)
+                if (not isinstance(cabecera, dict) or cabecera.get('formato') != cls.FORMATO_INDICE
+                        or tuple(cabecera.get('firma', ())) != firma):
+                    return None
+                catalogo = pickle.load(f)
+        except Exception:
+            return None
+        
+        return catalogo if isinstance(catalogo, cls) else None
+    
+    def _guardar_indice(self, ruta_indice, firma):
+        """Guarda el catálogo indexado (escritura atómica; si falla, se ignora)"""
+        temporal = ruta_indice + '.tmp'
+        try:
+            with open(temporal, 'wb') as f:
+                pickle.dump({'formato': self.FORMATO_INDICE, 'firma': firma}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, ruta_indice)
+        except OSError:
+            pass
+    
+    def registrar(self, nombre, grupo, compuesto=False, seleccionable=True, etiquetas=(), niveles=None):
+        """
+        Añade un ejercicio (o devuelve su ID si ya existe)
+        
+        Args:
+            niveles: Niveles para los que es apto (None = todos)
+        
+        Returns:
+            int: ID del ejercicio
+        """
+        clave = (grupo, nombre)
+        if clave in self._ids:
+            return self._ids[clave]
+        
+        if grupo not in self._ids_grupo:
+            self._ids_grupo[grupo] = len(self.grupos)
+            self.grupos.append(grupo)
+        
+        ejercicio_id = len(self.nombres)
+        self.nombres.append(sys.intern(nombre))
+        self._grupo_de.append(self._ids_grupo[grupo])
+        self._compuesto.append(compuesto)
+        self._seleccionable.append(seleccionable)
+        self._etiquetas.append(tuple(etiquetas))
+        self._niveles.append(tuple(niveles) if niveles else self.NIVELES)
+        self._ids[clave] = ejercicio_id
+        return ejercicio_id
+    
+    def id_o_registrar(self, grupo, nombre):
+        """
+        ID de un ejercicio; los desconocidos (de rutinas antiguas o de otro
+        catálogo) se registran como no seleccionables sin reconstruir las tablas
+        """
+        ejercicio_id = self._ids.get((grupo, nombre))
+        if ejercicio_id is None:
+            ejercicio_id = self.registrar(nombre, grupo, seleccionable=False)
+            self.grupo_id = np.append(self.grupo_id, self._grupo_de[ejercicio_id]).astype(np.int16)
+            self.es_compuesto = np.append(self.es_compuesto, False)
+        return ejercicio_id
+    
+    def construir_tablas(self):
+        """Precalcula atributos compactos y candidatos por (grupo, nivel)"""
+        self.grupo_id = np.array(self._grupo_de, dtype=np.int16)
+        self.es_compuesto = np.array(self._compuesto, dtype=bool)
+        
+        self._candidatos = {}
+        self._bits_candidatos = {}
+        for grupo, gid in self._ids_grupo.items():
+            ids = [i for i in range(len(self.nombres))
+                   if self._grupo_de[i] == gid and self._seleccionable[i]]
+            for nivel in self.NIVELES:
+                self._candidatos[(grupo, nivel)] = tuple(i for i in ids if nivel in self._niveles[i])
+                self._bits_candidatos[(grupo, nivel)] = self._a_bits(self._candidatos[(grupo, nivel)])
+        
+        self._bits_etiqueta = {}
+        for ejercicio_id, etiquetas in enumerate(self._etiquetas):
+            for etiqueta in etiquetas:
+                self._bits_etiqueta[etiqueta] = self._bits_etiqueta.get(etiqueta, 0) | (1 << ejercicio_id)
+        
+        self.bits_todos = (1 << len(self.nombres)) - 1
+        self._tamano_base = (len(self.nombres), len(self.grupos))
+    
+    def copia_base(self):
+        """
+        Copia del catálogo tal como se construyeron las tablas, sin los
+        ejercicios que se hayan registrado después con id_o_registrar
+        
+        Sirve para que cada base de conocimiento registre sus ejercicios
+        desconocidos en su propio catálogo sin que aparezcan en los de las
+        demás. Las tablas de candidatos y bitsets no cambian al registrar
+        (construir_tablas las sustituye enteras), así que se comparten.
+        """
+        ejercicios, grupos = self._tamano_base
+        copia = type(self)()
+        copia.nombres = self.nombres[:ejercicios]
+        copia.grupos = self.grupos[:grupos]
+        copia._grupo_de = self._grupo_de[:ejercicios]
+        copia._compuesto = self._compuesto[:ejercicios]
+        copia._seleccionable = self._seleccionable[:ejercicios]
+        copia._etiquetas = self._etiquetas[:ejercicios]
+        copia._niveles = self._niveles[:ejercicios]
+        copia._ids = {clave: i for clave, i in self._ids.items() if i < ejercicios}
+        copia._ids_grupo = {grupo: i for grupo, i in self._ids_grupo.items() if i < grupos}
+        copia._candidatos = self._candidatos
+        copia._bits_candidatos = self._bits_candidatos
+        copia._bits_etiqueta = self._bits_etiqueta
+        copia.bits_todos = self.bits_todos
+        copia._tamano_base = self._tamano_base
+        copia.grupo_id = self.grupo_id[:ejercicios].copy()
+        copia.es_compuesto = self.es_compuesto[:ejercicios].copy()
+        return copia
+    
+    @staticmethod
+    def _a_bits(ids):
+        bits = 0
+        for i in ids:
+            bits |= 1 << i
+        return bits
+    
+    @staticmethod
+    def ids_de_bits(bits):
+        """Lista de IDs presentes en un bitset (en orden creciente)"""
+        ids = []
+        while bits:
+            menor = bits & -bits
+            ids.append(menor.bit_length() - 1)
+            bits ^= menor
+        return ids
+    
+    def __len__(self):
+        return len(self.nombres)
+    
+    def id_de(self, grupo, nombre):
+        """ID de un ejercicio por grupo y nombre, o None si no está"""
+        return self._ids.get((grupo, nombre))
+    
+    def nombre(self, ejercicio_id):
+        return self.nombres[ejercicio_id]
+    
+    def grupo(self, ejercicio_id):
+        return self.grupos[self._grupo_de[ejercicio_id]]
+    
+    def etiquetas(self, ejercicio_id):
+        return self._etiquetas[ejercicio_id]
+    
+    def candidatos(self, grupo, nivel, mascara=None):
+        """
+        IDs seleccionables para un grupo y nivel
+        
+        Sin máscara devuelve la tupla precalculada; con máscara (bitset de
+        IDs permitidos) aplica un AND sobre el bitset de candidatos.
+        """
+        if mascara is None:
+            return self._candidatos.get((grupo, nivel), ())
+        return self.ids_de_bits(self._bits_candidatos.get((grupo, nivel), 0) & mascara)
+    
+    def bits_candidatos(self, grupo, nivel, mascara=None):
+        """Bitset de los IDs seleccionables para un grupo y nivel"""
+        bits = self._bits_candidatos.get((grupo, nivel), 0)
+        return bits if mascara is None else bits & mascara
+    
+    def bits_etiqueta(self, etiqueta):
+        """Bitset de los IDs con una etiqueta"""
+        return self._bits_etiqueta.get(etiqueta, 0)
+    
+    def permitido(self, ejercicio_id, mascara):
+        return mascara is None or bool((mascara >> ejercicio_id) & 1)
+    
+    def nombre_canonico(self, grupo, nombre):
+        """Devuelve la cadena internada del catálogo para un nombre"""
+        ejercicio_id = self._ids.get((grupo, nombre))
+        if ejercicio_id is None:
+            return sys.intern(nombre)
+        return self.nombres[ejercicio_id]
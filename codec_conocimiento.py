@@ -0,0 +1,172 @@
+import bz2
+import gzip
+import io
+import lzma
+from collections import Counter
+from contextlib import contextmanager
+
+
+# Compresores de la biblioteca estándar: módulo, bytes con que empiezan sus
+# archivos y opciones de escritura (gzip al nivel por defecto de zlib: el 9
+# tarda bastante más y apenas reduce nada en JSON)
+COMPRESORES = {
+    'gzip': (gzip, b'\x1f\x8b', {'compresslevel': 6}),
+    'bz2': (bz2, b'BZh', {}),
+    'lzma': (lzma, b'\xfd7zXZ\x00', {})
+}
+
+# Primera clave de un archivo codificado con DiccionarioCadenas
+CLAVE_DICCIONARIO = '__diccionario__'
+
+
+def detectar_compresion(ruta):
+    """Compresor de un archivo según sus primeros bytes (None si es texto plano o no existe)"""
+    try:
+        with open(ruta, 'rb') as f:
+            cabecera = f.read(8)
+    except OSError:
+        return None
+    for nombre, (_, magia, _) in COMPRESORES.items():
+        if cabecera.startswith(magia):
+            return nombre
+    return None
+
+
+def abrir_lectura(ruta):
+    """Abre un archivo de conocimiento como texto, descomprimiéndolo en flujo si hace falta"""
+    compresion = detectar_compresion(ruta)
+    if compresion is None:
+        return open(ruta, 'r', encoding='utf-8')
+    return COMPRESORES[compresion][0].open(ruta, 'rt', encoding='utf-8')
+
+
+@contextmanager
+def escritura_texto(crudo, compresion=None):
+    """
+    Flujo de texto UTF-8 sobre un archivo binario ya abierto
+    
+    Con compresión, lo escrito se comprime en flujo. Al salir se vacía
+    todo en 'crudo' pero no se cierra, para que quien lo abrió pueda hacer
+    fsync antes de reemplazar el archivo.
+    """
+    if compresion is None:
+        destino = crudo
+    else:
+        modulo, _, opciones = COMPRESORES[compresion]
+        destino = modulo.open(crudo, 'wb', **opciones)
+    texto = io.TextIOWrapper(destino, encoding='utf-8')
+    try:
+        yield texto
+    finally:
+        texto.flush()
+        texto.detach()
+        if destino is not crudo:
+            destino.close()  # Escribe el final del flujo comprimido
+
+
+def codificar_base(data):
+    """Base con el diccionario de cadenas delante (para escribirla compacta)"""
+    diccionario = DiccionarioCadenas.construir(data)
+    return {CLAVE_DICCIONARIO: diccionario.tabla, **diccionario.codificar(data)}
+
+
+class DiccionarioCadenas:
+    """
+    Codificación por diccionario de las claves y nombres repetidos.
+    
+    La base de conocimiento repite en cada rutina y cada experiencia las
+    mismas claves ('ejercicio', 'series', 'perfil'...) y los mismos valores
+    (nombres de ejercicios, grupos, objetivos). Las cadenas que aparecen
+    varias veces se guardan una sola vez en una tabla, la más frecuente
+    primero, y en el resto del archivo se escriben como '@<índice>'. Una
+    cadena que de verdad empieza por '@' se escribe con la marca doblada
+    ('@@...').
+    
+    El resultado sigue siendo un objeto JSON con la misma forma, así que
+    se puede recorrer en flujo (lector_json) igual que uno plano, y el
+    compresor trabaja sobre un texto mucho más corto. Al leer, la tabla va
+    primero y el resto se decodifica mientras se construye (ver
+    lector_json), sin una segunda pasada por todo el árbol.
+    """
+    
+    MARCA = '@'
+    
+    def __init__(self, tabla=()):
+        self.tabla = list(tabla)
+        self._indices = {cadena: i for i, cadena in enumerate(self.tabla)}
+        self._referencias = {f"{self.MARCA}{i}": cadena for i, cadena in enumerate(self.tabla)}
+    
+    @classmethod
+    def construir(cls, data, minimo=2):
+        """
+        Diccionario con las cadenas de 'data' que salen a cuenta
+        
+        Args:
+            data: Valor JSON a codificar
+            minimo: Apariciones mínimas para entrar en la tabla
+        """
+        conteo = Counter()
+        pendientes = [data]
+        while pendientes:
+            valor = pendientes.pop()
+            if isinstance(valor, dict):
+                conteo.update(valor.keys())
+                pendientes.extend(valor.values())
+            elif isinstance(valor, list):
+                pendientes.extend(valor)
+            elif isinstance(valor, str):
+                conteo[valor] += 1
+        
+        tabla = []
+        for cadena, apariciones in conteo.most_common():
+            if apariciones < minimo:
+                break
+            # Solo si la referencia es más corta que la cadena
+            if len(cadena) > len(cls.MARCA) + len(str(len(tabla))):
+                tabla.append(cadena)
+        return cls(tabla)
+    
+    def _cadena(self, cadena):
+        i = self._indices.get(cadena)
+        if i is not None:
+            return f"{self.MARCA}{i}"
+        if cadena.startswith(self.MARCA):
+            return self.MARCA + cadena
+        return cadena
+    
+    def decodificar_cadena(self, cadena):
+        original = self._referencias.get(cadena)
+        if original is not None:
+            return original
+        # '@@...' es una cadena que empezaba por '@'
+        return cadena[1:] if cadena.startswith(self.MARCA) else cadena
+    
+    def codificar(self, valor):
+        if isinstance(valor, dict):
+            return {self._cadena(k): self.codificar(v) for k, v in valor.items()}
+        if isinstance(valor, list):
+            return [self.codificar(v) for v in valor]
+        if isinstance(valor, str):
+            return self._cadena(valor)
+        return valor
+    
+    def completar(self, valor):
+        """Decodifica las cadenas de un valor cuyos objetos ya se decodificaron con 'objeto'"""
+        if type(valor) is str:
+            return self.decodificar_cadena(valor)
+        if type(valor) is list:
+            return [self.completar(v) for v in valor]
+        return valor
+    
+    def objeto(self, pares):
+        """object_pairs_hook para json: decodifica cada objeto al construirlo"""
+        cadena = self.decodificar_cadena
+        resultado = {}
+        for clave, valor in pares:
+            tipo = type(valor)
+            if tipo is str:
+                valor = cadena(valor)
+            elif tipo is list:
+                valor = self.completar(valor)
+            resultado[cadena(clave)] = valor
+        return resultado
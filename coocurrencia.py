@@ -0,0 +1,150 @@
+import numpy as np
+
+
+class MatrizCoocurrencia:
+    """
+    Matriz dispersa ejercicio x ejercicio de co-ocurrencias exitosas.
+    
+    Cada vez que una rutina recibe buen feedback, cada par de ejercicios
+    que comparten día suma un peso proporcional a la satisfacción. La
+    matriz es simétrica y se guarda como listas de adyacencia por ID del
+    catálogo ({id: {vecino: peso}}), así consultar los complementarios de
+    un ejercicio cuesta O(grado) y no hay que recorrer las rutinas.
+    
+    Se persiste en formato compacto: la tabla de ejercicios que aparecen
+    (grupo, nombre) y los pares como tripletas [i, j, peso] con i < j
+    sobre esa tabla, independiente del orden de IDs del catálogo.
+    """
+    
+    def __init__(self, catalogo):
+        self.catalogo = catalogo
+        self._vecinos = {}  # id -> {id vecino: peso acumulado}
+        self.total_rutinas = 0
+    
+    def __len__(self):
+        """Número de pares distintos"""
+        return sum(len(v) for v in self._vecinos.values()) // 2
+    
+    def grado(self, ejercicio_id):
+        return len(self._vecinos.get(ejercicio_id, ()))
+    
+    def peso(self, a, b):
+        return self._vecinos.get(a, {}).get(b, 0.0)
+    
+    def registrar_rutina(self, rutina, satisfaccion):
+        """
+        Suma los pares de ejercicios de cada día de una rutina exitosa
+        
+        Args:
+            rutina: Rutina con 'rutina_semanal'
+            satisfaccion: Satisfacción del feedback (1-5); el peso es satisfaccion/5
+        """
+        peso = satisfaccion / 5
+        for ejercicios in rutina.get('rutina_semanal', {}).values():
+            ids = []
+            for ej in ejercicios:
+                if ej.get('grupo') == 'cardio':
+                    continue
+                ejercicio_id = self.catalogo.id_de(ej.get('grupo'), ej.get('ejercicio'))
+                if ejercicio_id is not None and ejercicio_id not in ids:
+                    ids.append(ejercicio_id)
+            
+            for i, a in enumerate(ids):
+                for b in ids[i + 1:]:
+                    self._sumar(a, b, peso)
+        
+        self.total_rutinas += 1
+    
+    def _sumar(self, a, b, peso):
+        vecinos_a = self._vecinos.setdefault(a, {})
+        vecinos_a[b] = vecinos_a.get(b, 0.0) + peso
+        vecinos_b = self._vecinos.setdefault(b, {})
+        vecinos_b[a] = vecinos_b.get(a, 0.0) + peso
+    
+    def complementarios(self, ids, bits_candidatos=None, excluir=()):
+        """
+        Ejercicios que mejor acompañan a los ya elegidos
+        
+        Suma los pesos de los vecinos de cada ID elegido, así el coste es la
+        suma de sus grados.
+        
+        Args:
+            ids: IDs ya elegidos (por ejemplo, los del mismo día)
+            bits_candidatos: Bitset de IDs admitidos (None = cualquiera), ver
+                CatalogoEjercicios.bits_candidatos
+            excluir: IDs que no se deben devolver
+        
+        Returns:
+            list: [(id, peso)] ordenada de mayor a menor peso
+        """
+        puntuacion = {}
+        for ejercicio_id in ids:
+            for vecino, peso in self._vecinos.get(ejercicio_id, {}).items():
+                if bits_candidatos is not None and not (bits_candidatos >> vecino) & 1:
+                    continue
+                puntuacion[vecino] = puntuacion.get(vecino, 0.0) + peso
+        
+        for ejercicio_id in list(ids) + list(excluir):
+            puntuacion.pop(ejercicio_id, None)
+        
+        return sorted(puntuacion.items(), key=lambda x: x[1], reverse=True)
+    
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    
+    def a_dict(self):
+        """Formato compacto para guardar en JSON"""
+        tabla = sorted(self._vecinos)
+        posicion = {ejercicio_id: i for i, ejercicio_id in enumerate(tabla)}
+        pares = [
+            [posicion[a], posicion[b], round(peso, 4)]
+            for a in tabla
+            for b, peso in self._vecinos[a].items()
+            if a < b
+        ]
+        return {
+            'ejercicios': [[self.catalogo.grupo(i), self.catalogo.nombre(i)] for i in tabla],
+            'pares': pares,
+            'total_rutinas': self.total_rutinas
+        }
+    
+    @classmethod
+    def desde_dict(cls, data, catalogo):
+        """Reconstruye la matriz (los ejercicios que ya no están en el catálogo se ignoran)"""
+        matriz = cls(catalogo)
+        ids = [catalogo.id_de(grupo, nombre) for grupo, nombre in data.get('ejercicios', [])]
+        for i, j, peso in data.get('pares', []):
+            if ids[i] is not None and ids[j] is not None:
+                matriz._sumar(ids[i], ids[j], peso)
+        matriz.total_rutinas = data.get('total_rutinas', 0)
+        return matriz
+    
+    def a_arrays(self):
+        """Pares (i < j) por ID del catálogo y sus pesos (para IndicesDerivados)"""
+        pares = [(a, b, peso) for a, vecinos in self._vecinos.items()
+                 for b, peso in vecinos.items() if a < b]
+        return {
+            'pares': np.array([(a, b) for a, b, _ in pares], dtype=np.int32).reshape(-1, 2),
+            'pesos': np.array([peso for _, _, peso in pares], dtype=np.float64),
+            'total_rutinas': np.array([self.total_rutinas])
+        }
+    
+    @classmethod
+    def desde_arrays(cls, arrays, catalogo):
+        """Reconstruye la matriz desde a_arrays (coste por par, no por rutina)"""
+        matriz = cls(catalogo)
+        for (a, b), peso in zip(arrays['pares'].tolist(), arrays['pesos'].tolist()):
+            matriz._sumar(a, b, peso)
+        matriz.total_rutinas = int(arrays['total_rutinas'][0])
+        return matriz
+    
+    @classmethod
+    def desde_patrones(cls, patrones_exitosos, catalogo):
+        """Construye la matriz desde los patrones exitosos (datos sin matriz guardada)"""
+        matriz = cls(catalogo)
+        for patrones in patrones_exitosos.values():
+            for patron in patrones:
+                if patron.get('rutina'):
+                    matriz.registrar_rutina(patron['rutina'], patron.get('satisfaccion', 4))
+        return matriz
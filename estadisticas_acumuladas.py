@@ -0,0 +1,152 @@
+import math
+
+
+NIVELES_SATISFACCION = 5
+
+
+def _nuevo_acumulado():
+    return {'n': 0, 'suma': 0, 'suma_cuadrados': 0}
+
+
+def _sumar(acumulado, satisfaccion):
+    acumulado['n'] += 1
+    acumulado['suma'] += satisfaccion
+    acumulado['suma_cuadrados'] += satisfaccion * satisfaccion
+
+
+def _resumir(acumulado):
+    """n, media y desviación típica (poblacional) de un acumulado"""
+    n = acumulado['n']
+    if not n:
+        return {'n': 0, 'media': 0, 'desviacion': 0}
+    media = acumulado['suma'] / n
+    varianza = max(acumulado['suma_cuadrados'] / n - media * media, 0.0)
+    return {'n': n, 'media': media, 'desviacion': math.sqrt(varianza)}
+
+
+def segmento(perfil):
+    """Segmento de un perfil: '<nivel>_<objetivo>', como las claves de patrones_exitosos"""
+    return f"{perfil.get('nivel_str', '?')}_{perfil.get('objetivo_str', '?')}"
+
+
+class EstadisticasAcumuladas:
+    """
+    Agregados de la satisfacción del histórico, mantenidos al añadir feedback.
+    
+    Cuenta, suma y suma de cuadrados de la satisfacción (global, por
+    generación, por segmento nivel_objetivo y por modo de generación:
+    exploración / explotación), el histograma de 1 a 5 y cuántas veces se
+    ha detectado cada tipo de anomalía.
+    Con ellos media, desviación y distribución cuestan O(1) (o el número de
+    generaciones y segmentos) en lugar de recorrer historico_usuarios en
+    cada consulta, así que los paneles pueden pedirlos tan a menudo como
+    quieran.
+    
+    Se guardan en metricas['estadisticas_acumuladas']; si no cuadran con
+    el histórico cargado (bases antiguas o fusionadas) se reconstruyen con
+    desde_historico.
+    """
+    
+    FORMATO = 1
+    
+    def __init__(self):
+        self.global_ = _nuevo_acumulado()
+        self.histograma = [0] * NIVELES_SATISFACCION
+        self.por_generacion = {}   # generación -> acumulado
+        self.por_segmento = {}     # segmento -> acumulado
+        self.por_modo = {}         # 'exploracion' / 'explotacion' -> acumulado
+        self.anomalias = {}        # tipo de anomalía -> veces detectada
+    
+    @property
+    def total(self):
+        return self.global_['n']
+    
+    def registrar(self, experiencia, generacion, modo=None, anomalias=()):
+        """
+        Suma una experiencia recién añadida al histórico
+        
+        Args:
+            experiencia: Registro de historico_usuarios
+            generacion: Generación del sistema cuando llegó el feedback
+            modo: Modo con que se generó la rutina valorada
+            anomalias: Tipos de anomalía detectados al añadirla
+        """
+        satisfaccion = experiencia.get('satisfaccion', 0)
+        _sumar(self.global_, satisfaccion)
+        nivel = min(max(int(round(satisfaccion)), 1), NIVELES_SATISFACCION)
+        self.histograma[nivel - 1] += 1
+        _sumar(self.por_generacion.setdefault(generacion, _nuevo_acumulado()), satisfaccion)
+        _sumar(self.por_segmento.setdefault(segmento(experiencia.get('perfil', {})), _nuevo_acumulado()),
+               satisfaccion)
+        _sumar(self.por_modo.setdefault(modo or 'desconocido', _nuevo_acumulado()), satisfaccion)
+        for tipo in anomalias:
+            self.anomalias[tipo] = self.anomalias.get(tipo, 0) + 1
+    
+    def media(self):
+        return _resumir(self.global_)['media']
+    
+    def resumen(self):
+        """
+        Todos los agregados listos para mostrar
+        
+        Returns:
+            dict: 'global' (n, media, desviacion), 'histograma' {1..5: cuenta},
+                'por_generacion' [{generacion, n, media, desviacion}] ordenado,
+                'por_segmento' y 'por_modo' ({clave: {n, media, desviacion}})
+                y 'anomalias' {tipo: veces}
+        """
+        return {
+            'global': _resumir(self.global_),
+            'histograma': {i + 1: cuenta for i, cuenta in enumerate(self.histograma)},
+            'por_generacion': [{'generacion': generacion, **_resumir(acumulado)}
+                               for generacion, acumulado in sorted(self.por_generacion.items())],
+            'por_segmento': {clave: _resumir(acumulado)
+                             for clave, acumulado in sorted(self.por_segmento.items())},
+            'por_modo': {modo: _resumir(acumulado) for modo, acumulado in sorted(self.por_modo.items())},
+            'anomalias': dict(self.anomalias)
+        }
+    
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    
+    def a_dict(self):
+        """Formato para guardar en JSON (las generaciones como texto, por ser claves)"""
+        return {
+            'formato': self.FORMATO,
+            'global': dict(self.global_),
+            'histograma': list(self.histograma),
+            'por_generacion': {str(g): dict(a) for g, a in self.por_generacion.items()},
+            'por_segmento': {s: dict(a) for s, a in self.por_segmento.items()},
+            'por_modo': {m: dict(a) for m, a in self.por_modo.items()},
+            'anomalias': dict(self.anomalias)
+        }
+    
+    @classmethod
+    def desde_dict(cls, data):
+        """Agregados guardados con a_dict (None si son de otro formato)"""
+        if data.get('formato') != cls.FORMATO:
+            return None
+        estadisticas = cls()
+        estadisticas.global_ = dict(data['global'])
+        estadisticas.histograma = list(data['histograma'])
+        estadisticas.por_generacion = {int(g): dict(a) for g, a in data['por_generacion'].items()}
+        estadisticas.por_segmento = {s: dict(a) for s, a in data['por_segmento'].items()}
+        estadisticas.por_modo = {m: dict(a) for m, a in data['por_modo'].items()}
+        estadisticas.anomalias = dict(data['anomalias'])
+        return estadisticas
+    
+    @classmethod
+    def desde_historico(cls, historico, generaciones, modos, anomalias):
+        """
+        Reconstruye los agregados recorriendo el histórico una vez
+        
+        Args:
+            historico: Lista historico_usuarios
+            generaciones, modos, anomalias: Lo que se pasaría a registrar
+                con cada experiencia, en el mismo orden (iterables)
+        """
+        estadisticas = cls()
+        for experiencia, generacion, modo, tipos in zip(historico, generaciones, modos, anomalias):
+            estadisticas.registrar(experiencia, generacion, modo, tipos)
+        return estadisticas
@@ -0,0 +1,329 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from almacen_conocimiento import recorrer_base
+from codec_conocimiento import COMPRESORES, escritura_texto
+
+
+# Listas que se leen registro a registro (el resto de la base son valores pequeños)
+FLUJOS = (
+    ('learning_system', 'rutinas_generadas'),
+    ('learning_system', 'historico_usuarios'),
+    ('learning_system', 'patrones_exitosos', '*'),
+    ('metricas', 'precision_predicciones'),
+    ('metricas', 'mejores_rutinas')
+)
+
+# Partes que se recalculan o reconstruyen y no hace falta ni decodificar
+OMITIR = (
+    ('learning_system', 'coocurrencia'),
+    ('learning_system', 'estadisticas_ejercicios'),
+    ('metricas', 'satisfaccion_promedio_por_generacion'),
+    ('metricas', 'estadisticas_acumuladas')
+)
+
+
+class FusionConocimiento:
+    """
+    Fusiona las bases de conocimiento de varios kioscos en una sola.
+    
+    Cada archivo de entrada se lee una vez y en flujo (lector_json). Los
+    registros (rutinas generadas, feedback, patrones exitosos, métricas) se
+    deduplican por su identificador y se vuelcan a archivos temporales; en
+    memoria solo quedan las claves de deduplicación con la posición de cada
+    registro y los agregados pequeños. Al escribir, los registros se
+    copian desde los temporales ordenados por fecha, así el resultado no
+    depende del orden de las entradas.
+    
+    Resolución de cada parte:
+        rutinas_generadas           únicas por (id, fecha_generacion)
+        historico_usuarios          únicas por (rutina_id, fecha)
+        patrones_exitosos           únicos por (clave, fecha)
+        combinaciones_ejercicios    recalculadas desde el feedback único
+        generacion                  máximo
+        factor_exploracion          media ponderada por feedback de cada entrada
+        tasa_aprendizaje            media ponderada por feedback de cada entrada
+        parametros_optimos          por clave, el de la entrada con más feedback
+    
+    Las combinaciones se recalculan en lugar de sumarse para que una base
+    compartida por varios kioscos (el mismo archivo de partida) no cuente
+    dos veces. La matriz de co-ocurrencia, las estadísticas por ejercicio
+    y los agregados de satisfacción no se copian: AdvancedGymAI los
+    reconstruye al cargar desde los patrones y el histórico fusionados.
+    """
+    
+    def __init__(self, directorio_temporal=None):
+        self._dir = tempfile.mkdtemp(prefix='fusion_', dir=directorio_temporal)
+        self._archivos = {}   # nombre de sección -> archivo temporal abierto
+        self._indices = {}    # nombre de sección -> {clave única: (orden, posición)}
+        
+        self.generacion = 0
+        self.last_update = None
+        self._ponderados = {'factor_exploracion': [0.0, 0.0, []], 'tasa_aprendizaje': [0.0, 0.0, []]}
+        self._parametros_optimos = {}  # clave -> (peso, valor)
+        self._generacion_rutina = {}   # rutina_id -> generación en que se generó
+        
+        self.entradas = 0
+        self.duplicados = 0
+    
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    
+    def agregar(self, ruta):
+        """
+        Añade una base de conocimiento desde su archivo JSON (con su diario,
+        si lo tiene), leída en flujo: en memoria solo hay un registro a la vez
+        """
+        self._agregar_caminos(recorrer_base(ruta, FLUJOS, OMITIR))
+    
+    def agregar_datos(self, data):
+        """Añade una base de conocimiento ya cargada (formato de save_data)"""
+        def caminos():
+            for seccion in ('learning_system', 'metricas'):
+                for clave, valor in data.get(seccion, {}).items():
+                    camino = (seccion, clave)
+                    if camino in FLUJOS:
+                        for registro in valor:
+                            yield camino, registro
+                    elif camino == ('learning_system', 'patrones_exitosos'):
+                        for clave_patron, patrones in valor.items():
+                            for patron in patrones:
+                                yield camino + (clave_patron,), patron
+                    elif camino not in OMITIR:
+                        yield camino, valor
+            if 'last_update' in data:
+                yield ('last_update',), data['last_update']
+        
+        self._agregar_caminos(caminos())
+    
+    def _agregar_caminos(self, caminos):
+        """Procesa los (camino, valor) de una base, como los entrega lector_json.recorrer_json"""
+        ls = {}  # Valores pequeños de learning_system (escalares, parámetros)
+        last_update = None
+        feedback = 0
+        
+        for camino, valor in caminos:
+            seccion, nombre = camino[0], camino[-1]
+            if camino == ('learning_system', 'rutinas_generadas'):
+                self._volcar('rutinas_generadas', (valor.get('id'), valor.get('fecha_generacion')),
+                             (valor.get('fecha_generacion') or '', valor.get('id') or ''), valor)
+                self._generacion_rutina[valor.get('id')] = valor.get('generacion', 0)
+            elif camino == ('learning_system', 'historico_usuarios'):
+                feedback += 1
+                self._volcar('historico_usuarios', (valor.get('rutina_id'), valor.get('fecha')),
+                             (valor.get('fecha') or '', valor.get('rutina_id') or ''), valor)
+            elif camino[:2] == ('learning_system', 'patrones_exitosos') and len(camino) == 3:
+                unico = valor.get('fecha') or json.dumps(valor, sort_keys=True, default=str)
+                self._volcar('patrones:' + nombre, unico, (valor.get('fecha') or '',), valor)
+            elif seccion == 'metricas' and camino in FLUJOS:
+                texto = json.dumps(valor, sort_keys=True, ensure_ascii=False, default=str)
+                self._volcar('metricas:' + nombre, texto, (texto,), valor)
+            elif seccion == 'learning_system' and len(camino) == 2:
+                ls[nombre] = valor
+            elif camino == ('last_update',):
+                last_update = valor
+        
+        # Escalares
+        self.generacion = max(self.generacion, ls.get('generacion', 0))
+        if last_update and (self.last_update is None or last_update > self.last_update):
+            self.last_update = last_update
+        
+        for nombre, acumulado in self._ponderados.items():
+            if nombre in ls:
+                acumulado[0] += ls[nombre] * feedback
+                acumulado[1] += feedback
+                acumulado[2].append(ls[nombre])
+        
+        for clave, valor in ls.get('parametros_optimos', {}).items():
+            candidato = (feedback, json.dumps(valor, sort_keys=True, default=str))
+            if clave not in self._parametros_optimos or candidato > self._parametros_optimos[clave][0]:
+                self._parametros_optimos[clave] = (candidato, valor)
+        
+        self.entradas += 1
+    
+    def _volcar(self, seccion, clave, orden, registro):
+        """Escribe un registro en el temporal de su sección si no está repetido"""
+        indice = self._indices.setdefault(seccion, {})
+        if clave in indice:
+            self.duplicados += 1
+            return
+        
+        archivo = self._archivos.get(seccion)
+        if archivo is None:
+            nombre = os.path.join(self._dir, f"{len(self._archivos)}.jsonl")
+            archivo = open(nombre, 'w+', encoding='utf-8')
+            self._archivos[seccion] = archivo
+        
+        posicion = archivo.tell()
+        archivo.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+        indice[clave] = (orden, posicion)
+    
+    def _registros(self, seccion):
+        """Registros únicos de una sección, ordenados (se leen del temporal)"""
+        indice = self._indices.get(seccion)
+        if not indice:
+            return
+        archivo = self._archivos[seccion]
+        archivo.flush()
+        for _, posicion in sorted(indice.values()):
+            archivo.seek(posicion)
+            yield json.loads(archivo.readline())
+    
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    
+    def _escalar_ponderado(self, nombre, defecto):
+        suma, pesos, valores = self._ponderados[nombre]
+        if pesos:
+            return round(suma / pesos, 4)
+        if valores:
+            return round(sum(valores) / len(valores), 4)
+        return defecto
+    
+    def escribir(self, ruta_salida, compresion=None):
+        """
+        Escribe la base fusionada (en un temporal y luego reemplazo atómico)
+        
+        Args:
+            ruta_salida: Archivo fusionado
+            compresion: None (JSON plano) o un compresor de
+                codec_conocimiento.COMPRESORES; los registros se escriben
+                en flujo, así que no se codifican con diccionario
+        
+        Returns:
+            dict: Resumen de la fusión
+        """
+        temporal = ruta_salida + '.tmp'
+        combinaciones = {}
+        satisfaccion_por_generacion = []
+        totales = {}
+        
+        with open(temporal, 'wb') as crudo, escritura_texto(crudo, compresion) as f:
+            f.write('{\n  "learning_system": {\n')
+            
+            totales['rutinas_generadas'] = self._escribir_lista(
+                f, 'rutinas_generadas', self._registros('rutinas_generadas'))
+            f.write(',\n')
+            
+            def historico():
+                # El feedback se recorre una vez: se escribe y a la vez se
+                # recalculan combinaciones y métricas derivadas
+                for experiencia in self._registros('historico_usuarios'):
+                    satisfaccion_por_generacion.append({
+                        'generacion': self._generacion_rutina.get(experiencia.get('rutina_id'), 0),
+                        'satisfaccion': experiencia.get('satisfaccion')
+                    })
+                    rutina = experiencia.get('rutina_exitosa')
+                    if rutina and experiencia.get('satisfaccion', 0) >= 4:
+                        for ejercicios in rutina.get('rutina_semanal', {}).values():
+                            for ej in ejercicios:
+                                if 'grupo' in ej and ej['grupo'] != 'cardio':
+                                    conteos = combinaciones.setdefault(ej['grupo'], {})
+                                    conteos[ej['ejercicio']] = conteos.get(ej['ejercicio'], 0) + 1
+                    yield experiencia
+            
+            totales['historico_usuarios'] = self._escribir_lista(f, 'historico_usuarios', historico())
+            f.write(',\n    "patrones_exitosos": {')
+            claves = sorted(s[len('patrones:'):] for s in self._indices if s.startswith('patrones:'))
+            for i, clave in enumerate(claves):
+                f.write(',' if i else '')
+                f.write('\n  ')
+                self._escribir_lista(f, clave, self._registros('patrones:' + clave))
+            f.write('\n    },\n')
+            
+            escalares = {
+                'combinaciones_ejercicios': combinaciones,
+                'parametros_optimos': {k: v for k, (_, v) in sorted(self._parametros_optimos.items())},
+                'generacion': self.generacion,
+                'tasa_aprendizaje': self._escalar_ponderado('tasa_aprendizaje', 0.1),
+                'factor_exploracion': self._escalar_ponderado('factor_exploracion', 0.2)
+            }
+            for i, (nombre, valor) in enumerate(escalares.items()):
+                f.write(',\n' if i else '')
+                f.write(f'    {json.dumps(nombre)}: {json.dumps(valor, ensure_ascii=False)}')
+            f.write('\n  },\n  "metricas": {\n')
+            
+            self._escribir_lista(f, 'precision_predicciones', self._registros('metricas:precision_predicciones'))
+            f.write(',\n')
+            self._escribir_lista(f, 'satisfaccion_promedio_por_generacion', iter(satisfaccion_por_generacion))
+            f.write(',\n')
+            self._escribir_lista(f, 'mejores_rutinas', self._registros('metricas:mejores_rutinas'))
+            f.write('\n  },\n')
+            f.write(f'  "last_update": {json.dumps(self.last_update or datetime.now().isoformat())}\n}}\n')
+        
+        os.replace(temporal, ruta_salida)
+        
+        return {
+            'entradas': self.entradas,
+            'duplicados': self.duplicados,
+            'generacion': self.generacion,
+            **totales
+        }
+    
+    @staticmethod
+    def _escribir_lista(f, nombre, registros):
+        """Escribe '"nombre": [ ... ]' registro a registro; devuelve cuántos escribió"""
+        f.write(f'    {json.dumps(nombre, ensure_ascii=False)}: [')
+        total = 0
+        for registro in registros:
+            f.write(',\n      ' if total else '\n      ')
+            f.write(json.dumps(registro, ensure_ascii=False))
+            total += 1
+        f.write('\n    ]' if total else ']')
+        return total
+    
+    def cerrar(self):
+        """Cierra y borra los temporales"""
+        for archivo in self._archivos.values():
+            archivo.close()
+        self._archivos.clear()
+        shutil.rmtree(self._dir, ignore_errors=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *_):
+        self.cerrar()
+
+
+def fusionar_conocimiento(rutas_entrada, ruta_salida, directorio_temporal=None, compresion=None):
+    """
+    Fusiona varios archivos de conocimiento en uno
+    
+    Args:
+        rutas_entrada: Archivos gym_ai_advanced_data.json de cada kiosco
+        ruta_salida: Archivo fusionado (puede ser uno de los de entrada)
+        directorio_temporal: Dónde crear los temporales (por defecto el del sistema)
+        compresion: Compresor del archivo fusionado (None = JSON plano)
+    
+    Returns:
+        dict: Resumen de la fusión
+    """
+    with FusionConocimiento(directorio_temporal) as fusion:
+        for ruta in rutas_entrada:
+            fusion.agregar(ruta)
+        return fusion.escribir(ruta_salida, compresion)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fusiona bases de conocimiento de varios kioscos")
+    parser.add_argument('salida', help="Archivo JSON fusionado")
+    parser.add_argument('entradas', nargs='+', help="Archivos JSON de conocimiento a fusionar")
+    parser.add_argument('--compresion', choices=sorted(COMPRESORES),
+                        help="Comprimir el archivo fusionado (las entradas se leen en cualquier formato)")
+    args = parser.parse_args()
+    
+    resumen = fusionar_conocimiento(args.entradas, args.salida, compresion=args.compresion)
+    print(f"✓ {resumen['entradas']} bases fusionadas en {args.salida}")
+    print(f"   Rutinas: {resumen['rutinas_generadas']} | Feedback: {resumen['historico_usuarios']} | "
+          f"Duplicados descartados: {resumen['duplicados']} | Generación: {resumen['generacion']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from codec_conocimiento import detectar_compresion
+from gym_ai_advanced import AdvancedGymAI
+from registro_eventos import RegistroEventos
+
+
+class GestorSucursales:
+    """
+    Bases de conocimiento de muchas sucursales en un mismo proceso.
+    
+    Cada sucursal tiene su propio archivo de datos y su propio
+    AdvancedGymAI, que se carga la primera vez que se pide. Solo las
+    sucursales usadas recientemente se mantienen en memoria: si la memoria
+    estimada supera el límite, se descarga la menos usada (LRU), guardando
+    antes su conocimiento si tiene cambios pendientes.
+    
+    Las sucursales parten del mismo catálogo de ejercicios, pero cada una
+    recibe su propia copia (CatalogoEjercicios.copia_base): al cargar su
+    histórico registra en ella los ejercicios que no conoce, y esos no
+    deben aparecer en las demás.
+    
+    La carga (lenta: lee y reconstruye toda la base) se hace fuera del
+    bloqueo general, así que no detiene a las demás sucursales; si otro
+    hilo pide la misma sucursal mientras se carga, espera a esa carga en
+    lugar de empezar otra.
+    """
+    
+    # Memoria estimada de un sistema cargado: tamaño del JSON por este factor
+    # (los dicts y listas de Python ocupan varias veces lo que su texto)
+    FACTOR_MEMORIA = 4
+    # Lo que suele ocupar descomprimido un archivo comprimido con diccionario
+    FACTOR_COMPRIMIDO = 15
+    MEMORIA_BASE = 2 * 1024 * 1024
+    
+    def __init__(self, directorio, memoria_maxima_mb=512, max_sucursales=None,
+                 eventos=None, catalogo_file='catalogo_ejercicios.json', **opciones_sistema):
+        """
+        Args:
+            directorio: Carpeta con un archivo '<sucursal>.json' por sucursal
+            memoria_maxima_mb: Límite de memoria estimada de las sucursales cargadas
+            max_sucursales: Límite opcional de sucursales cargadas a la vez
+            eventos: RegistroEventos compartido por todas las sucursales
+            catalogo_file: Catálogo de ejercicios común
+            **opciones_sistema: Opciones adicionales para cada AdvancedGymAI
+        """
+        self.directorio = directorio
+        self.memoria_maxima = memoria_maxima_mb * 1024 * 1024
+        self.max_sucursales = max_sucursales
+        self.eventos = eventos or RegistroEventos()
+        self.opciones_sistema = opciones_sistema
+        
+        os.makedirs(directorio, exist_ok=True)
+        
+        # Catálogo común sin ejercicios de ninguna sucursal: se toma del
+        # primer sistema creado y cada sucursal recibe una copia
+        self.catalogo_file = catalogo_file
+        self.catalogo = None
+        
+        self._cargadas = OrderedDict()  # sucursal -> AdvancedGymAI (más reciente al final)
+        self._memoria = {}              # sucursal -> bytes estimados
+        self._cargando = {}             # sucursal -> threading.Event de la carga en curso
+        self._lock = threading.RLock()
+        
+        self.cargas = 0
+        self.descargas = 0
+    
+    def ruta_datos(self, sucursal):
+        """Archivo de datos de una sucursal"""
+        if not re.fullmatch(r'[\w\-]+', str(sucursal)):
+            raise ValueError(f"Identificador de sucursal no válido: {sucursal!r}")
+        return os.path.join(self.directorio, f"{sucursal}.json")
+    
+    def obtener(self, sucursal):
+        """
+        Sistema de IA de una sucursal (lo carga si no está en memoria)
+        
+        Returns:
+            AdvancedGymAI
+        """
+        ruta = self.ruta_datos(sucursal)
+        while True:
+            with self._lock:
+                sistema = self._cargadas.get(sucursal)
+                if sistema is not None:
+                    self._cargadas.move_to_end(sucursal)
+                    return sistema
+                
+                en_curso = self._cargando.get(sucursal)
+                if en_curso is None:
+                    self._cargando[sucursal] = threading.Event()
+                    catalogo = self.catalogo.copia_base() if self.catalogo is not None else None
+                    break
+            
+            # Otro hilo la está cargando: esperar y volver a mirar (si su
+            # carga falló, este hilo lo intenta de nuevo)
+            en_curso.wait()
+        
+        try:
+            sistema = self._cargar(sucursal, ruta, catalogo)
+            with self._lock:
+                self._cargadas[sucursal] = sistema
+                self._memoria[sucursal] = self._estimar_memoria(sucursal)
+                self._liberar_espacio(conservar=sucursal)
+        finally:
+            with self._lock:
+                self._cargando.pop(sucursal).set()
+        return sistema
+    
+    def _cargar(self, sucursal, ruta, catalogo):
+        """Crea el sistema de una sucursal (sin el bloqueo tomado)"""
+        sistema = AdvancedGymAI(
+            data_file=ruta,
+            eventos=self.eventos,
+            catalogo_file=self.catalogo_file,
+            catalogo=catalogo,
+            **self.opciones_sistema
+        )
+        
+        with self._lock:
+            if self.catalogo is None:
+                self.catalogo = sistema.catalogo.copia_base()
+            self.cargas += 1
+        self.eventos.info('sucursales.cargada', sucursal=sucursal,
+                          generacion=sistema.learning_system['generacion'])
+        return sistema
+    
+    def _estimar_memoria(self, sucursal):
+        ruta = self.ruta_datos(sucursal)
+        tamano = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+        if detectar_compresion(ruta) is not None:
+            tamano *= self.FACTOR_COMPRIMIDO
+        return tamano * self.FACTOR_MEMORIA + self.MEMORIA_BASE
+    
+    def memoria_estimada(self):
+        """Bytes estimados de todas las sucursales cargadas"""
+        with self._lock:
+            return sum(self._memoria.values())
+    
+    def _liberar_espacio(self, conservar=None):
+        """Descarga las sucursales menos usadas hasta cumplir los límites"""
+        while len(self._cargadas) > 1:
+            excede_memoria = sum(self._memoria.values()) > self.memoria_maxima
+            excede_cantidad = self.max_sucursales is not None and len(self._cargadas) > self.max_sucursales
+            if not (excede_memoria or excede_cantidad):
+                break
+            
+            victima = next(iter(self._cargadas))
+            if victima == conservar:
+                break
+            self.descargar(victima)
+    
+    def descargar(self, sucursal):
+        """Quita una sucursal de memoria (guarda antes si tiene cambios pendientes)"""
+        with self._lock:
+            sistema = self._cargadas.pop(sucursal, None)
+            self._memoria.pop(sucursal, None)
+            if sistema is None:
+                return False
+            
+            if sistema.pool_rutinas:
+                sistema.pool_rutinas.detener(timeout=1.0)
+            
+            guardada = sistema.cambios_pendientes
+            if guardada:
+                sistema.save_data()
+            
+            self.descargas += 1
+            self.eventos.info('sucursales.descargada', sucursal=sucursal, guardada=guardada)
+            return True
+    
+    def guardar(self, sucursal):
+        """Guarda una sucursal cargada si tiene cambios pendientes"""
+        with self._lock:
+            sistema = self._cargadas.get(sucursal)
+            if sistema is None or not sistema.cambios_pendientes:
+                return False
+            sistema.save_data()
+            self._memoria[sucursal] = self._estimar_memoria(sucursal)
+            return True
+    
+    def guardar_todo(self):
+        """Guarda todas las sucursales con cambios pendientes"""
+        with self._lock:
+            return sum(1 for sucursal in list(self._cargadas) if self.guardar(sucursal))
+    
+    def cerrar(self):
+        """Descarga todas las sucursales guardando los cambios"""
+        with self._lock:
+            for sucursal in list(self._cargadas):
+                self.descargar(sucursal)
+    
+    def sucursales_disponibles(self):
+        """Sucursales con archivo de datos en el directorio"""
+        return sorted(nombre[:-5] for nombre in os.listdir(self.directorio)
+                      if nombre.endswith('.json'))
+    
+    def estado(self):
+        """Resumen para diagnóstico"""
+        with self._lock:
+            return {
+                'cargadas': list(self._cargadas),
+                'memoria_estimada_mb': round(sum(self._memoria.values()) / (1024 * 1024), 2),
+                'memoria_maxima_mb': round(self.memoria_maxima / (1024 * 1024), 2),
+                'pendientes_de_guardar': [s for s, sistema in self._cargadas.items()
+                                          if sistema.cambios_pendientes],
+                'cargas': self.cargas,
+                'descargas': self.descargas
+            }
@@ -1,10 +1,25 @@
-import json
 import os
-import random
 import math
 from datetime import datetime, timedelta
 from collections import defaultdict
 import pickle
+import threading
+
+import numpy as np
+
+from registro_eventos import RegistroEventos
+from pool_rutinas import PoolRutinas
+from catalogo_ejercicios import CatalogoEjercicios
+from restricciones import etiquetas_excluidas, mascara_permitidos
+from coocurrencia import MatrizCoocurrencia
+from atribucion_ejercicios import EstadisticasEjercicios
+from rutina_compacta import RutinaCompacta, CacheRutinasCompactas, concatenar_filas
+from aleatorio import SemillasGeneracion, entero, elegir, muestra
+from almacen_conocimiento import DiarioConocimiento
+from indices_derivados import IndicesDerivados
+from perfiles_columnares import ColumnasPerfiles
+from indice_rutinas import GeneradorIdsRutina, IndiceRutinas
+from estadisticas_acumuladas import EstadisticasAcumuladas
 
 # Importar motor de inferencia
 try:
@@ -26,10 +41,24 @@ class AdvancedGymAI:
     5. Generación automática de nuevas rutinas basadas en datos históricos
     """
     
-    def __init__(self, data_file='gym_ai_advanced_data.json'):
+    def __init__(self, data_file='gym_ai_advanced_data.json', eventos=None,
+                 catalogo_file='catalogo_ejercicios.json', semilla=None, catalogo=None,
+                 compresion='auto'):
         self.data_file = data_file
+        self.catalogo_file = catalogo_file
         self.user_data = {}
         
+        # Generadores aleatorios por petición (semilla fija = ejecución reproducible)
+        self.semillas = SemillasGeneracion(semilla)
+        
+        # Registro estructurado de eventos (desactivado por defecto)
+        self.eventos = eventos or RegistroEventos()
+        
+        # Serializa el aprendizaje y la recarga (que cambian histórico,
+        # catálogo, estadísticas y archivo de perfiles) con la puntuación
+        # de rutinas en otros hilos, como el del pool
+        self.lock_conocimiento = threading.RLock()
+        
         # Base de conocimiento inicial (seed data)
         self.ejercicios_base = {
             'pecho': {
@@ -58,8 +87,137 @@ class AdvancedGymAI:
             'cardio': ['Caminata', 'Trote', 'HIIT', 'Bicicleta', 'Remo', 'Elíptica', 'Escaladora', 'Sprints']
         }
         
-        # Sistema de aprendizaje
-        self.learning_system = {
+        # Etiquetas para filtrar por limitaciones (carga articular, equipo, impacto)
+        self.etiquetas_ejercicios = {
+            'Press banca': ['equipo_barra', 'equipo_banco', 'carga_hombro'],
+            'Press inclinado': ['equipo_barra', 'equipo_banco', 'carga_hombro'],
+            'Fondos en paralelas': ['equipo_paralelas', 'carga_hombro', 'carga_codo'],
+            'Press declinado': ['equipo_barra', 'equipo_banco'],
+            'Aperturas con mancuernas': ['equipo_mancuernas', 'equipo_banco', 'carga_hombro'],
+            'Cruces en polea': ['equipo_polea'],
+            'Pullover': ['equipo_mancuernas', 'equipo_banco', 'carga_hombro'],
+            'Press con mancuernas': ['equipo_mancuernas', 'equipo_banco'],
+            'Dominadas': ['equipo_barra_fija', 'carga_hombro', 'carga_codo'],
+            'Peso muerto': ['equipo_barra', 'carga_lumbar', 'carga_rodilla'],
+            'Remo con barra': ['equipo_barra', 'carga_lumbar'],
+            'Remo en polea': ['equipo_polea'],
+            'Jalón al pecho': ['equipo_polea'],
+            'Remo con mancuerna': ['equipo_mancuernas', 'equipo_banco'],
+            'Face pulls': ['equipo_polea'],
+            'Pullover espalda': ['equipo_polea', 'carga_hombro'],
+            'Sentadilla': ['equipo_barra', 'carga_rodilla', 'carga_lumbar'],
+            'Prensa': ['equipo_maquina', 'carga_rodilla'],
+            'Peso muerto rumano': ['equipo_barra', 'carga_lumbar'],
+            'Sentadilla búlgara': ['equipo_mancuernas', 'equipo_banco', 'carga_rodilla'],
+            'Extensiones de cuádriceps': ['equipo_maquina', 'carga_rodilla'],
+            'Curl femoral': ['equipo_maquina'],
+            'Elevación de pantorrillas': ['equipo_maquina'],
+            'Hip thrust': ['equipo_barra', 'equipo_banco'],
+            'Press militar': ['equipo_barra', 'carga_hombro', 'carga_lumbar'],
+            'Press Arnold': ['equipo_mancuernas', 'carga_hombro'],
+            'Remo al mentón': ['equipo_barra', 'carga_hombro', 'carga_muneca'],
+            'Elevaciones laterales': ['equipo_mancuernas', 'carga_hombro'],
+            'Elevaciones frontales': ['equipo_mancuernas', 'carga_hombro'],
+            'Pájaros': ['equipo_mancuernas'],
+            'Press cerrado': ['equipo_barra', 'equipo_banco', 'carga_codo', 'carga_muneca'],
+            'Dominadas cerradas': ['equipo_barra_fija', 'carga_codo'],
+            'Curl con barra': ['equipo_barra', 'carga_muneca', 'carga_codo'],
+            'Extensiones de tríceps': ['equipo_polea', 'carga_codo'],
+            'Curl martillo': ['equipo_mancuernas'],
+            'Curl concentrado': ['equipo_mancuernas'],
+            'Fondos tríceps': ['equipo_banco', 'carga_hombro', 'carga_codo'],
+            'Plancha': ['peso_corporal'],
+            'Crunches': ['peso_corporal', 'carga_lumbar'],
+            'Elevación de piernas': ['peso_corporal', 'carga_lumbar'],
+            'Russian twists': ['peso_corporal', 'carga_lumbar'],
+            'Caminata': [],
+            'Trote': ['alto_impacto', 'carga_rodilla'],
+            'HIIT': ['alto_impacto', 'carga_rodilla'],
+            'Bicicleta': ['equipo_maquina'],
+            'Remo': ['equipo_maquina', 'carga_lumbar'],
+            'Elíptica': ['equipo_maquina'],
+            'Escaladora': ['equipo_maquina', 'carga_rodilla'],
+            'Sprints': ['alto_impacto', 'carga_rodilla']
+        }
+        
+        # Catálogo con IDs enteros y tablas de selección precalculadas
+        # (compartido si se recibe; si no, desde archivo o desde los ejercicios base)
+        self.catalogo = catalogo or self._cargar_catalogo()
+        self._mascaras_limitaciones = {}  # etiquetas excluidas (frozenset) -> bitset permitido
+        
+        # Rutinas del histórico convertidas a arrays (compartidas con el motor)
+        self.rutinas_compactas = CacheRutinasCompactas(self.catalogo)
+        
+        # Sistema de aprendizaje y métricas de rendimiento (sin conocimiento previo)
+        self.learning_system, self.metricas = self._conocimiento_inicial()
+        
+        # Inicializar motor de inferencia
+        self.motor_inferencia = None
+        
+        # Pool de rutinas precalculadas (se activa con activar_pool_rutinas)
+        self.pool_rutinas = None
+        
+        # Hay conocimiento en memoria que todavía no se ha guardado
+        self.cambios_pendientes = False
+        
+        # Diario de cambios compartido con otros procesos que usen el mismo archivo
+        # (compresion: formato de la instantánea, ver DiarioConocimiento)
+        self.diario = DiarioConocimiento(data_file, compresion=compresion)
+        
+        # IDs de rutina únicos entre procesos e índice ID -> rutina generada
+        self.ids_rutina = GeneradorIdsRutina(self.diario.origen[:8])
+        self.indice_rutinas = IndiceRutinas()
+        
+        # Co-ocurrencia y estadísticas guardadas en arrays junto a la base
+        self.indices = IndicesDerivados(data_file)
+        self._indices_cargados = None
+        
+        # Perfiles del histórico en columnas (archivo mapeado en memoria)
+        self.columnas_perfiles = ColumnasPerfiles(data_file + '.perfiles')
+        
+        entradas_diario = self.load_data()
+        
+        # Co-ocurrencias de ejercicios en rutinas exitosas
+        self.coocurrencia = self._cargar_coocurrencia()
+        
+        # Satisfacción atribuida a cada ejercicio (y banda de repeticiones)
+        self.estadisticas_ejercicios = self._cargar_estadisticas_ejercicios()
+        self._indices_cargados = None
+        
+        # Cargar motor de inferencia con los datos
+        if MOTOR_INFERENCIA_DISPONIBLE:
+            self.motor_inferencia = MotorInferencia(
+                self._base_motor(), eventos=self.eventos,
+                estadisticas_ejercicios=self.estadisticas_ejercicios,
+                rutinas_compactas=self.rutinas_compactas,
+                columnas_perfiles=self.columnas_perfiles)
+            self.eventos.info('motor.integrado', "✓ Motor de inferencia integrado")
+        
+        # Agregados de satisfacción para estadísticas y panel (las anomalías
+        # se detectan con el motor, así que van después)
+        self.estadisticas_acumuladas = self._cargar_estadisticas_acumuladas()
+        
+        # Cambios del diario posteriores a la instantánea (de cualquier proceso)
+        self._aplicar_entradas(entradas_diario)
+        with self.diario.bloqueo():
+            self._sincronizar_columnas()
+    
+    def _base_motor(self):
+        return {
+            'learning_system': self.learning_system,
+            'historico_usuarios': self.learning_system.get('historico_usuarios', []),
+            'patrones_exitosos': self.learning_system.get('patrones_exitosos', {})
+        }
+    
+    @staticmethod
+    def _conocimiento_inicial():
+        """
+        Conocimiento de un sistema que aún no ha aprendido nada
+        
+        Returns:
+            tuple: (learning_system, metricas) nuevos
+        """
+        learning_system = {
             'rutinas_generadas': [],  # Todas las rutinas que ha creado el sistema
             'historico_usuarios': [],  # Histórico de todos los usuarios
             'patrones_exitosos': {},   # Patrones que han funcionado bien
@@ -69,49 +227,297 @@ class AdvancedGymAI:
             'tasa_aprendizaje': 0.1,  # Qué tanto aprende de cada feedback
             'factor_exploracion': 0.2  # Probabilidad de probar cosas nuevas
         }
-        
-        # Métricas de rendimiento del sistema
-        self.metricas = {
+        metricas = {
             'precision_predicciones': [],
             'satisfaccion_promedio_por_generacion': [],
             'mejores_rutinas': []
         }
+        return learning_system, metricas
+    
+    def load_data(self):
+        """
+        Carga el conocimiento previo del sistema
         
-        # Inicializar motor de inferencia
-        self.motor_inferencia = None
+        Returns:
+            list: Entradas del diario posteriores a la instantánea, que se
+                aplican una vez construidos los índices (ver _aplicar_entradas)
+        """
+        with self.diario.bloqueo():
+            entradas = self._leer_datos()
+            self.diario.marcar_sincronizado()
+            return entradas or []
+    
+    def _leer_datos(self):
+        """
+        load_data sin tomar el bloqueo (para quien ya lo tiene)
         
-        self.load_data()
+        Si la lectura tiene éxito, el conocimiento en memoria pasa a ser el
+        de la instantánea (o el inicial si no existe) y las entradas devueltas
+        son las que faltan por aplicarle. Si falla, la memoria no se toca.
         
-        # Cargar motor de inferencia con los datos
-        if MOTOR_INFERENCIA_DISPONIBLE:
-            self.motor_inferencia = MotorInferencia({
-                'learning_system': self.learning_system,
-                'historico_usuarios': self.learning_system.get('historico_usuarios', []),
-                'patrones_exitosos': self.learning_system.get('patrones_exitosos', {})
-            })
-            print("✓ Motor de inferencia integrado")
+        Returns:
+            list: Entradas del diario posteriores a la instantánea, o None si
+                no se pudo leer
+        """
+        try:
+            data, entradas = self.diario.cargar_instantanea()
+        except Exception as e:
+            self.eventos.advertencia('conocimiento.error_carga',
+                                     "Se mantiene el conocimiento en memoria",
+                                     archivo=self.data_file, error=str(e))
+            return None
+        
+        if data is None:
+            # Sin instantánea el diario se lee desde el principio: se aplica
+            # sobre el conocimiento inicial, no sobre el que ya lo contiene
+            self.learning_system, self.metricas = self._conocimiento_inicial()
+            self.indice_rutinas.reconstruir([])
+            self._indices_cargados = None
+        else:
+            learning_system, metricas = self._conocimiento_inicial()
+            self.learning_system = data.get('learning_system', learning_system)
+            self.metricas = data.get('metricas', metricas)
+            self._internar_nombres_ejercicios()
+            self.indice_rutinas.reconstruir(self.learning_system['rutinas_generadas'])
+            # Bajo el mismo bloqueo que la instantánea, para que sean de su versión
+            self._indices_cargados = self.indices.cargar(self.diario.epoca, self.catalogo)
+            self.eventos.info('conocimiento.cargado',
+                              "✓ Conocimiento cargado - Generación {generacion}",
+                              archivo=self.data_file,
+                              generacion=self.learning_system['generacion'],
+                              entradas_diario=len(entradas),
+                              indices=self._indices_cargados is not None)
+        return entradas
     
-    def load_data(self):
-        """Carga el conocimiento previo del sistema"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.learning_system = data.get('learning_system', self.learning_system)
-                    self.metricas = data.get('metricas', self.metricas)
-                    print(f"✓ Conocimiento cargado - Generación {self.learning_system['generacion']}")
-            except Exception as e:
-                print(f"Iniciando con conocimiento base")
-    
-    def save_data(self):
-        """Guarda el conocimiento aprendido"""
-        data = {
+    def _internar_nombres_ejercicios(self):
+        """
+        Hace que las rutinas cargadas compartan las cadenas del catálogo
+        en lugar de guardar una copia del nombre por cada ejercicio
+        """
+        rutinas = [r['rutina'] for r in self.learning_system['rutinas_generadas']]
+        rutinas += [u.get('rutina_exitosa') for u in self.learning_system['historico_usuarios']]
+        for patrones in self.learning_system['patrones_exitosos'].values():
+            rutinas += [p.get('rutina') for p in patrones]
+        
+        for rutina in rutinas:
+            if not rutina or 'rutina_semanal' not in rutina:
+                continue
+            for ejercicios in rutina['rutina_semanal'].values():
+                for ej in ejercicios:
+                    if 'ejercicio' in ej:
+                        ej['ejercicio'] = self.catalogo.nombre_canonico(ej.get('grupo'), ej['ejercicio'])
+    
+    def _cargar_coocurrencia(self):
+        """Matriz de co-ocurrencia guardada, o reconstruida desde los patrones exitosos"""
+        indices = (self._indices_cargados or {}).get('coocurrencia')
+        if indices is not None:
+            return MatrizCoocurrencia.desde_arrays(indices, self.catalogo)
+        # Bases guardadas antes de los índices derivados la llevan en el JSON
+        guardada = self.learning_system.get('coocurrencia')
+        if guardada:
+            return MatrizCoocurrencia.desde_dict(guardada, self.catalogo)
+        return MatrizCoocurrencia.desde_patrones(self.learning_system['patrones_exitosos'], self.catalogo)
+    
+    def _cargar_estadisticas_ejercicios(self):
+        """Estadísticas por ejercicio guardadas, o reconstruidas desde el histórico"""
+        indices = (self._indices_cargados or {}).get('estadisticas')
+        if indices is not None:
+            return EstadisticasEjercicios.desde_arrays(indices, self.catalogo)
+        guardadas = self.learning_system.get('estadisticas_ejercicios')
+        if guardadas:
+            return EstadisticasEjercicios.desde_dict(guardadas, self.catalogo)
+        return EstadisticasEjercicios.desde_historico(self.learning_system, self.catalogo)
+    
+    def _cargar_estadisticas_acumuladas(self):
+        """Agregados de satisfacción guardados, o reconstruidos si no cuadran con el histórico"""
+        historico = self.learning_system['historico_usuarios']
+        guardadas = self.metricas.get('estadisticas_acumuladas')
+        if guardadas:
+            estadisticas = EstadisticasAcumuladas.desde_dict(guardadas)
+            if estadisticas is not None and estadisticas.total == len(historico):
+                return estadisticas
+        
+        # Generación de cada feedback: la de las métricas (una por feedback) o,
+        # si no van a la par (bases fusionadas), la de la rutina valorada
+        rutinas = [self.obtener_rutina(e.get('rutina_id')) or {} for e in historico]
+        por_generacion = self.metricas['satisfaccion_promedio_por_generacion']
+        if len(por_generacion) == len(historico):
+            generaciones = [m['generacion'] for m in por_generacion]
+        else:
+            generaciones = [r.get('generacion', 0) for r in rutinas]
+        return EstadisticasAcumuladas.desde_historico(
+            historico, generaciones, (r.get('modo') for r in rutinas),
+            (self._tipos_anomalia(historico[max(0, i - 4):i + 1]) for i in range(len(historico))))
+    
+    def _tipos_anomalia(self, recientes):
+        """Tipos de anomalía que el motor ve en las últimas experiencias (como en procesar_feedback)"""
+        if not self.motor_inferencia or len(recientes) < 3:
+            return []
+        return [a['tipo'] for a in self.motor_inferencia.detectar_anomalias({}, recientes)['anomalias']]
+    
+    def save_data(self, compactar=False):
+        """
+        Guarda el conocimiento aprendido
+        
+        Otros procesos pueden estar aprendiendo sobre el mismo archivo: con
+        el bloqueo tomado se aplica primero lo que ellos hayan añadido al
+        diario desde la última vez y después se añaden los cambios propios.
+        La instantánea completa solo se reescribe al compactar el diario.
+        
+        Args:
+            compactar: Escribir la instantánea completa aunque el diario sea pequeño
+        """
+        with self.lock_conocimiento, self.diario.bloqueo():
+            self._sincronizar_diario()
+            if compactar or self.diario.necesita_compactar():
+                self.diario.compactar(self._datos_completos())
+                self.indices.guardar(self.diario.epoca, self.catalogo,
+                                     coocurrencia=self.coocurrencia.a_arrays(),
+                                     estadisticas=self.estadisticas_ejercicios.a_arrays())
+            else:
+                self.diario.escribir_pendientes()
+            self._sincronizar_columnas()
+            self.diario.marcar_sincronizado()
+        self.cambios_pendientes = False
+    
+    def recargar_cambios_externos(self):
+        """
+        Aplica lo aprendido por otros procesos (lotes, otros kioscos) desde
+        la última sincronización, sin reiniciar
+        
+        Pensado para llamarse periódicamente: si ni la instantánea ni el
+        diario han cambiado (según inodo, mtime y tamaño) solo cuesta dos
+        stat. Si solo ha crecido el diario se leen y aplican las entradas
+        nuevas; si la instantánea se ha reemplazado se recarga completa.
+        
+        Returns:
+            int: Entradas aplicadas (0 si no había cambios)
+        """
+        if not self.diario.hay_cambios():
+            return 0
+        with self.lock_conocimiento, self.diario.bloqueo():
+            aplicadas = self._sincronizar_diario()
+            self.diario.marcar_sincronizado()
+        return aplicadas
+    
+    def _datos_completos(self):
+        # La co-ocurrencia y las estadísticas van en los índices derivados;
+        # se quitan las copias de bases antiguas para que no queden obsoletas
+        self.learning_system.pop('coocurrencia', None)
+        self.learning_system.pop('estadisticas_ejercicios', None)
+        self.metricas['estadisticas_acumuladas'] = self.estadisticas_acumuladas.a_dict()
+        return {
             'learning_system': self.learning_system,
             'metricas': self.metricas,
             'last_update': datetime.now().isoformat()
         }
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    
+    def _sincronizar_diario(self):
+        """
+        Aplica lo que otros procesos han añadido al diario (con el bloqueo tomado)
+        
+        Returns:
+            int: Entradas ajenas aplicadas
+        """
+        aplicadas = self._aplicar_diario()
+        self._sincronizar_columnas()
+        return aplicadas
+    
+    def _feedback_sin_guardar(self):
+        return sum(1 for e in self.diario.pendientes if e['tipo'] == 'feedback')
+    
+    def _sincronizar_columnas(self):
+        """Lleva al archivo de perfiles lo ya escrito en la base (con el bloqueo tomado)"""
+        historico = self.learning_system['historico_usuarios']
+        self.columnas_perfiles.sincronizar(historico, len(historico) - self._feedback_sin_guardar())
+    
+    def _aplicar_diario(self):
+        if self.diario.instantanea_reemplazada():
+            # Otro proceso compactó (o se fusionó otra base encima): la
+            # instantánea nueva ya lo incluye todo
+            return self._recargar_completo()
+        
+        entradas, posicion = self.diario.leer_desde(self.diario.epoca, self.diario.posicion)
+        if entradas is None:
+            return 0
+        
+        self.diario.posicion = posicion
+        ajenas = [e for e in entradas if e['origen'] != self.diario.origen]
+        # Cada experiencia aplicada invalida en el motor solo las entradas de
+        # caché afectadas (registrar_experiencia); las listas que usa son las
+        # mismas de learning_system, así que ya ve los datos nuevos
+        self._aplicar_entradas(ajenas)
+        
+        # En la base lo ajeno queda antes que lo propio aún sin escribir: se
+        # ordena igual el histórico en memoria para que coincida fila a fila
+        # con el archivo de perfiles
+        propias = self._feedback_sin_guardar()
+        nuevas = sum(1 for e in ajenas if e['tipo'] == 'feedback')
+        if propias and nuevas:
+            historico = self.learning_system['historico_usuarios']
+            cola = historico[-(propias + nuevas):]
+            historico[-(propias + nuevas):] = cola[propias:] + cola[:propias]
+        if ajenas:
+            self.eventos.info('conocimiento.sincronizado', archivo=self.data_file,
+                              entradas=len(ajenas))
+        return len(ajenas)
+    
+    def _recargar_completo(self):
+        """
+        Vuelve a leer instantánea y diario, y reaplica los cambios propios sin guardar
+        
+        Returns:
+            int: Experiencias en el histórico tras recargar (0 si no se pudo
+                leer la instantánea y se mantiene lo que había en memoria)
+        """
+        pendientes = self.diario.pendientes
+        entradas = self._leer_datos()
+        if entradas is None:
+            # La memoria ya contiene los pendientes: no se reaplican
+            return 0
+        
+        self.coocurrencia = self._cargar_coocurrencia()
+        self.estadisticas_ejercicios = self._cargar_estadisticas_ejercicios()
+        self._indices_cargados = None
+        if self.motor_inferencia:
+            self.motor_inferencia.estadisticas_ejercicios = self.estadisticas_ejercicios
+            self.motor_inferencia.actualizar_base_conocimientos(self._base_motor())
+        self.estadisticas_acumuladas = self._cargar_estadisticas_acumuladas()
+        
+        self._aplicar_entradas(entradas + pendientes)
+        self.diario.pendientes = pendientes
+        self.eventos.info('conocimiento.recargado', archivo=self.data_file,
+                          generacion=self.learning_system['generacion'])
+        return len(self.learning_system['historico_usuarios'])
+    
+    def _aplicar_entradas(self, entradas):
+        """Aplica en memoria cambios leídos del diario"""
+        for entrada in entradas:
+            datos = entrada['datos']
+            if entrada['tipo'] == 'rutina':
+                self.learning_system['rutinas_generadas'].append(datos)
+                self.indice_rutinas.agregar(datos)
+            elif entrada['tipo'] == 'feedback':
+                self._aprender_de_feedback(datos['experiencia'], datos['rutina'], datos.get('modo'))
+    
+    def version_conocimiento(self):
+        """
+        Versión del conocimiento que usan las cachés derivadas.
+        Cambia al evolucionar de generación o al guardarse nuevos patrones exitosos.
+        """
+        with self.lock_conocimiento:
+            total_patrones = sum(len(p) for p in self.learning_system['patrones_exitosos'].values())
+            return (self.learning_system['generacion'], total_patrones)
+    
+    def activar_pool_rutinas(self, **opciones):
+        """
+        Activa el pool de rutinas precalculadas por celda (nivel, objetivo, días).
+        Un hilo en segundo plano lo mantiene lleno; ver PoolRutinas para las opciones.
+        """
+        if self.pool_rutinas is None:
+            self.pool_rutinas = PoolRutinas(self, **opciones)
+        self.pool_rutinas.iniciar()
+        return self.pool_rutinas
     
     def calcular_imc(self, peso, altura):
         """Calcula el Índice de Masa Corporal"""
@@ -134,20 +540,61 @@ class AdvancedGymAI:
             'objetivo_num': objetivo_map[datos['objetivo']],
             'dias': datos['dias_entrenamiento'],
             'nivel_str': datos['nivel_experiencia'],
-            'objetivo_str': datos['objetivo']
+            'objetivo_str': datos['objetivo'],
+            'limitaciones': datos.get('limitaciones', 'ninguna')
         }
         
         return perfil
     
+    def _cargar_catalogo(self):
+        """Carga el catálogo de ejercicios del archivo, o lo construye desde ejercicios_base"""
+        if self.catalogo_file and os.path.exists(self.catalogo_file):
+            try:
+                catalogo = CatalogoEjercicios.desde_archivo(self.catalogo_file)
+                self.eventos.info('catalogo.cargado', archivo=self.catalogo_file,
+                                  ejercicios=len(catalogo))
+                return catalogo
+            except (OSError, ValueError, KeyError) as e:
+                self.eventos.error('catalogo.error_carga', "⚠️ Error cargando catálogo: {error}",
+                                   archivo=self.catalogo_file, error=str(e))
+        
+        return CatalogoEjercicios.desde_ejercicios_base(self.ejercicios_base, self.etiquetas_ejercicios)
+    
+    def _mascara_limitaciones(self, perfil):
+        """
+        Bitset de ejercicios permitidos según las limitaciones del perfil
+        (None si no hay restricciones).
+        
+        Se guarda una máscara por combinación de etiquetas excluidas y no por
+        texto: el texto es libre y casi nunca se repite, mientras que las
+        combinaciones posibles son pocas, así que la caché no crece con la
+        sesión del kiosco.
+        """
+        excluidas = frozenset(etiquetas_excluidas(perfil.get('limitaciones') or ''))
+        if excluidas not in self._mascaras_limitaciones:
+            self._mascaras_limitaciones[excluidas] = mascara_permitidos(excluidas, self.catalogo)
+        return self._mascaras_limitaciones[excluidas]
+    
     def buscar_patrones_similares(self, perfil_actual):
         """
         FUNCIÓN CLAVE DE APRENDIZAJE:
         Busca en el histórico usuarios con perfiles similares y sus rutinas exitosas.
         Esto permite que el sistema aprenda de experiencias pasadas.
         """
+        historico = self.learning_system['historico_usuarios']
+        if self.columnas_perfiles.cubre(historico):
+            # Misma similitud calculada sobre las columnas de todo el histórico;
+            # el orden empata como el sort estable (similitud, satisfacción)
+            similitudes = self.columnas_perfiles.similitudes(perfil_actual)
+            satisfacciones = self.columnas_perfiles.columna('satisfaccion')
+            indices = np.flatnonzero(similitudes > 0.7)  # Umbral de similitud
+            orden = np.lexsort((indices, -satisfacciones[indices], -similitudes[indices]))
+            return [{'usuario': historico[i], 'similitud': float(similitudes[i])}
+                    for i in indices[orden[:5]]]
+        
         usuarios_similares = []
         
-        for usuario in self.learning_system['historico_usuarios']:
+        for usuario in historico:
             # Calcular similitud entre perfiles (distancia euclidiana)
             similitud = self._calcular_similitud_perfil(perfil_actual, usuario['perfil'])
             
@@ -188,7 +635,7 @@ class AdvancedGymAI:
         
         return similitud
     
-    def generar_rutina_inteligente(self, perfil):
+    def generar_rutina_inteligente(self, perfil, semilla=None):
         """
         CORAZÓN DEL SISTEMA DE IA:
         Genera una rutina completamente nueva basándose en:
@@ -197,79 +644,114 @@ class AdvancedGymAI:
         3. Parámetros óptimos encontrados
         4. Exploración de nuevas combinaciones (factor de innovación)
         5. Predicciones del motor de inferencia (NUEVO)
-        """
-        print("\n🧠 Generando rutina con IA...")
         
-        # NUEVO: Usar motor de inferencia para predicciones
-        if self.motor_inferencia:
-            print("\n🔮 Consultando motor de inferencia...")
+        Con semilla la generación es reproducible: la misma semilla y el
+        mismo conocimiento dan la misma rutina (en ese caso no se usa el pool).
+        """
+        with self.lock_conocimiento:
+            rng = np.random.default_rng(semilla) if semilla is not None else self.semillas.nuevo()
             
-            # Predecir parámetros óptimos
-            parametros_inferidos = self.motor_inferencia.inferir_parametros_optimos(perfil)
-            print(f"   → Parámetros inferidos: {parametros_inferidos['series']} series, "
-                  f"{parametros_inferidos['repeticiones_min']}-{parametros_inferidos['repeticiones_max']} reps")
+            self.eventos.debug('generacion.inicio', "\n🧠 Generando rutina con IA...")
             
-            # Clasificar usuario
-            clasificacion = self.motor_inferencia.clasificar_usuario(perfil)
-            print(f"   → Usuario clasificado como: {clasificacion['categoria'].upper()}")
+            # NUEVO: Usar motor de inferencia para predicciones
+            if self.motor_inferencia:
+                self.eventos.debug('generacion.consulta_motor', "\n🔮 Consultando motor de inferencia...")
+                
+                # Predecir parámetros óptimos
+                parametros_inferidos = self.motor_inferencia.inferir_parametros_optimos(perfil)
+                self.eventos.info('generacion.parametros_inferidos',
+                                  "   → Parámetros inferidos: {series} series, "
+                                  "{repeticiones_min}-{repeticiones_max} reps",
+                                  series=parametros_inferidos['series'],
+                                  repeticiones_min=parametros_inferidos['repeticiones_min'],
+                                  repeticiones_max=parametros_inferidos['repeticiones_max'],
+                                  confianza=parametros_inferidos['confianza'])
+                
+                # Clasificar usuario
+                clasificacion = self.motor_inferencia.clasificar_usuario(perfil)
+                self.eventos.info('generacion.clasificacion',
+                                  "   → Usuario clasificado como: {categoria!u}",
+                                  categoria=clasificacion['categoria'])
+                
+                # Guardar para uso posterior
+                self.parametros_inferidos = parametros_inferidos
+                self.clasificacion_usuario = clasificacion
+            else:
+                self.parametros_inferidos = None
+                self.clasificacion_usuario = None
             
-            # Guardar para uso posterior
-            self.parametros_inferidos = parametros_inferidos
-            self.clasificacion_usuario = clasificacion
-        else:
-            self.parametros_inferidos = None
-            self.clasificacion_usuario = None
-        
-        # Buscar patrones de éxito en perfiles similares
-        usuarios_similares = self.buscar_patrones_similares(perfil)
-        
-        # Decidir si explorar (probar algo nuevo) o explotar (usar conocimiento)
-        explorar = random.random() < self.learning_system['factor_exploracion']
-        
-        if explorar or len(usuarios_similares) == 0:
-            print("   → Modo EXPLORACIÓN: Generando rutina innovadora")
-            rutina = self._generar_rutina_exploracion(perfil)
-        else:
-            print(f"   → Modo EXPLOTACIÓN: Basándose en {len(usuarios_similares)} perfiles similares exitosos")
-            rutina = self._generar_rutina_aprendida(perfil, usuarios_similares)
-        
-        # NUEVO: Aplicar parámetros inferidos si están disponibles
-        if self.parametros_inferidos and self.parametros_inferidos['confianza'] >= 0.6:
-            print("\n   ✓ Aplicando parámetros optimizados por motor de inferencia")
-            rutina = self._aplicar_parametros_inferidos(rutina, self.parametros_inferidos)
-        
-        # Registrar rutina generada
-        rutina_registro = {
-            'id': f"RUT_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            'perfil': perfil,
-            'rutina': rutina,
-            'fecha_generacion': datetime.now().isoformat(),
-            'modo': 'exploracion' if explorar else 'explotacion',
-            'generacion': self.learning_system['generacion'],
-            'parametros_inferidos': self.parametros_inferidos,
-            'clasificacion_usuario': self.clasificacion_usuario
-        }
-        
-        # NUEVO: Predecir satisfacción esperada
-        if self.motor_inferencia:
-            prediccion = self.motor_inferencia.predecir_satisfaccion(perfil, rutina)
-            rutina_registro['prediccion_satisfaccion'] = prediccion
-            print(f"\n   🎯 Satisfacción predicha: {prediccion['satisfaccion_predicha']}/5 "
-                  f"(Confianza: {prediccion['confianza']*100:.0f}%)")
-        
-        self.learning_system['rutinas_generadas'].append(rutina_registro)
-        self.rutina_actual = rutina_registro
-        
-        return rutina
+            # Buscar patrones de éxito en perfiles similares
+            usuarios_similares = self.buscar_patrones_similares(perfil)
+            
+            # Decidir si explorar (probar algo nuevo) o explotar (usar conocimiento)
+            explorar = rng.random() < self.learning_system['factor_exploracion']
+            
+            if explorar or len(usuarios_similares) == 0:
+                self.eventos.info('generacion.modo',
+                                  "   → Modo EXPLORACIÓN: Generando rutina innovadora",
+                                  modo='exploracion', similares=len(usuarios_similares))
+                # El pool no conoce limitaciones: solo sirve a perfiles sin restricciones
+                usar_pool = (self.pool_rutinas and semilla is None
+                             and self._mascara_limitaciones(perfil) is None)
+                rutina = self.pool_rutinas.tomar(perfil) if usar_pool else None
+                if rutina is not None:
+                    # Rutina precalculada: solo queda personalizar parámetros (más abajo)
+                    rutina['metadatos']['origen'] = 'pool'
+                else:
+                    rutina = self._generar_rutina_exploracion(perfil, rng)
+            else:
+                self.eventos.info('generacion.modo',
+                                  "   → Modo EXPLOTACIÓN: Basándose en {similares} perfiles similares exitosos",
+                                  modo='explotacion', similares=len(usuarios_similares))
+                rutina = self._generar_rutina_aprendida(perfil, usuarios_similares, rng)
+            
+            # NUEVO: Aplicar parámetros inferidos si están disponibles
+            if self.parametros_inferidos and self.parametros_inferidos['confianza'] >= 0.6:
+                self.eventos.debug('generacion.parametros_aplicados',
+                                   "\n   ✓ Aplicando parámetros optimizados por motor de inferencia")
+                rutina = self._aplicar_parametros_inferidos(rutina, self.parametros_inferidos)
+            
+            # Registrar rutina generada
+            rutina_registro = {
+                'id': self.ids_rutina.nuevo(),
+                'perfil': perfil,
+                'rutina': rutina,
+                'fecha_generacion': datetime.now().isoformat(),
+                'modo': 'exploracion' if explorar else 'explotacion',
+                'generacion': self.learning_system['generacion'],
+                'parametros_inferidos': self.parametros_inferidos,
+                'clasificacion_usuario': self.clasificacion_usuario
+            }
+            
+            # NUEVO: Predecir satisfacción esperada
+            if self.motor_inferencia:
+                prediccion = self.motor_inferencia.predecir_satisfaccion(perfil, rutina)
+                rutina_registro['prediccion_satisfaccion'] = prediccion
+                self.eventos.info('generacion.prediccion',
+                                  "\n   🎯 Satisfacción predicha: {satisfaccion_predicha}/5 "
+                                  "(Confianza: {confianza:.0%})",
+                                  rutina_id=rutina_registro['id'],
+                                  satisfaccion_predicha=prediccion['satisfaccion_predicha'],
+                                  confianza=prediccion['confianza'])
+            
+            self.learning_system['rutinas_generadas'].append(rutina_registro)
+            self.indice_rutinas.agregar(rutina_registro)
+            self.diario.registrar('rutina', rutina_registro)
+            self.cambios_pendientes = True
+            self.rutina_actual = rutina_registro
+            
+            return rutina
     
-    def _generar_rutina_exploracion(self, perfil):
+    def _generar_rutina_exploracion(self, perfil, rng=None):
         """
         Genera una rutina nueva experimentando con combinaciones.
         Permite al sistema descubrir nuevas rutinas potencialmente mejores.
         """
+        rng = rng or self.semillas.nuevo()
         dias = perfil['dias']
         nivel = perfil['nivel_str']
         objetivo = perfil['objetivo_str']
+        mascara = self._mascara_limitaciones(perfil)
         
         rutina_semanal = {}
         
@@ -302,10 +784,10 @@ class AdvancedGymAI:
             
             for grupo in grupos:
                 num_ejercicios = self._decidir_num_ejercicios(grupo, estructura, nivel)
-                ejercicios_grupo = self._seleccionar_ejercicios_innovadores(grupo, num_ejercicios, nivel)
+                ejercicios_grupo = self._seleccionar_ejercicios_innovadores(grupo, num_ejercicios, nivel, mascara, rng)
                 
                 for ejercicio in ejercicios_grupo:
-                    params = self._generar_parametros_experimentales(objetivo, nivel, grupo)
+                    params = self._generar_parametros_experimentales(objetivo, nivel, grupo, rng)
                     ejercicios_dia.append({
                         'ejercicio': ejercicio,
                         'grupo': grupo,
@@ -313,13 +795,14 @@ class AdvancedGymAI:
                     })
             
             # Agregar cardio si es necesario
-            if self._necesita_cardio(objetivo, dia_num):
-                cardio = random.choice(self.ejercicios_base['cardio'])
+            cardios = self.catalogo.candidatos('cardio', nivel, mascara)
+            if self._necesita_cardio(objetivo, dia_num, rng) and cardios:
+                cardio_id = elegir(rng, cardios)
                 ejercicios_dia.append({
-                    'ejercicio': cardio,
+                    'ejercicio': self.catalogo.nombre(cardio_id),
                     'grupo': 'cardio',
-                    'duracion': f"{random.randint(15, 30)} min",
-                    'intensidad': random.choice(['moderada', 'alta', 'HIIT'])
+                    'duracion': f"{entero(rng, 15, 30)} min",
+                    'intensidad': elegir(rng, ['moderada', 'alta', 'HIIT'])
                 })
             
             rutina_semanal[f"Día {dia_num}"] = ejercicios_dia
@@ -333,25 +816,28 @@ class AdvancedGymAI:
             }
         }
     
-    def _generar_rutina_aprendida(self, perfil, usuarios_similares):
+    def _generar_rutina_aprendida(self, perfil, usuarios_similares, rng=None):
         """
         APRENDIZAJE REAL:
         Genera rutina basándose en lo que ha funcionado para usuarios similares.
         Este es el verdadero "aprendizaje" del sistema.
         """
+        rng = rng or self.semillas.nuevo()
+        
         # Extraer las mejores rutinas de usuarios similares
         mejores_rutinas = []
         for similar in usuarios_similares:
-            if 'rutina_exitosa' in similar['usuario']:
+            if similar['usuario'].get('rutina_exitosa'):
                 mejores_rutinas.append({
                     'rutina': similar['usuario']['rutina_exitosa'],
+                    'compacta': self.rutinas_compactas.de_experiencia(similar['usuario']),
                     'satisfaccion': similar['usuario'].get('satisfaccion', 3),
                     'peso': similar['similitud']
                 })
         
         if not mejores_rutinas:
             # Si no hay rutinas exitosas, explorar
-            return self._generar_rutina_exploracion(perfil)
+            return self._generar_rutina_exploracion(perfil, rng)
         
         # Analizar patrones comunes en rutinas exitosas
         patrones = self._extraer_patrones_exitosos(mejores_rutinas)
@@ -360,6 +846,7 @@ class AdvancedGymAI:
         dias = perfil['dias']
         nivel = perfil['nivel_str']
         objetivo = perfil['objetivo_str']
+        mascara = self._mascara_limitaciones(perfil)
         
         rutina_semanal = {}
         
@@ -388,11 +875,18 @@ class AdvancedGymAI:
             for grupo in grupos:
                 # Usar ejercicios que han funcionado bien
                 ejercicios_preferidos = patrones.get(f'ejercicios_{grupo}', [])
+                if mascara is not None:
+                    ejercicios_preferidos = [
+                        ej for ej in ejercicios_preferidos
+                        if self.catalogo.id_de(grupo, ej) is not None
+                        and self.catalogo.permitido(self.catalogo.id_de(grupo, ej), mascara)
+                    ]
                 
                 if ejercicios_preferidos:
                     # 70% usar ejercicios aprendidos, 30% innovar
-                    if random.random() < 0.7:
-                        ejercicios_seleccionados = random.sample(
+                    if rng.random() < 0.7:
+                        ejercicios_seleccionados = muestra(
+                            rng,
                             ejercicios_preferidos,
                             min(len(ejercicios_preferidos), self._decidir_num_ejercicios(grupo, estructura, nivel))
                         )
@@ -400,13 +894,19 @@ class AdvancedGymAI:
                         ejercicios_seleccionados = self._seleccionar_ejercicios_innovadores(
                             grupo,
                             self._decidir_num_ejercicios(grupo, estructura, nivel),
-                            nivel
+                            nivel,
+                            mascara,
+                            rng
                         )
                 else:
-                    ejercicios_seleccionados = self._seleccionar_ejercicios_innovadores(
+                    # Sin preferidos: los que mejor combinan con lo ya elegido hoy
+                    ejercicios_seleccionados = self._seleccionar_ejercicios_complementarios(
                         grupo,
                         self._decidir_num_ejercicios(grupo, estructura, nivel),
-                        nivel
+                        nivel,
+                        ejercicios_dia,
+                        mascara,
+                        rng
                     )
                 
                 for ejercicio in ejercicios_seleccionados:
@@ -420,7 +920,7 @@ class AdvancedGymAI:
                             'descanso': params_aprendidos.get('descanso', '60s')
                         }
                     else:
-                        params = self._generar_parametros_experimentales(objetivo, nivel, grupo)
+                        params = self._generar_parametros_experimentales(objetivo, nivel, grupo, rng)
                     
                     ejercicios_dia.append({
                         'ejercicio': ejercicio,
@@ -440,59 +940,86 @@ class AdvancedGymAI:
             }
         }
     
+    def optimizar_rutina(self, perfil, num_semillas=6, **opciones):
+        """
+        Optimiza una rutina con el algoritmo genético (fitness = score del motor)
+        
+        Las semillas son rutinas de exploración del perfil; definen la
+        plantilla de días y grupos que el optimizador recombina.
+        
+        Args:
+            perfil: Perfil del usuario
+            num_semillas: Rutinas iniciales de la población
+            **opciones: Opciones de OptimizadorGenetico (generaciones,
+                tiempo_max, paciencia, procesos, ...)
+        
+        Returns:
+            dict: Resultado de OptimizadorGenetico.optimizar (rutina, fitness,
+            traza de convergencia), o None sin motor de inferencia
+        """
+        with self.lock_conocimiento:
+            if not self.motor_inferencia:
+                return None
+            
+            rng = opciones.pop('rng', None) or self.semillas.nuevo()
+            semillas = [self._generar_rutina_exploracion(perfil, rng) for _ in range(num_semillas)]
+            
+            params = self.motor_inferencia.inferir_parametros_optimos(perfil)
+            descanso = [int(n) for n in str(params['descanso']).rstrip('s').split('-')]
+            params_defecto = (params['series'], params['repeticiones_min'],
+                              params['repeticiones_max'], descanso[0], descanso[-1])
+            
+            # Solo se usa bajo demanda: se importa aquí para no cargarlo al arrancar
+            from optimizador_genetico import OptimizadorGenetico
+            optimizador = OptimizadorGenetico(self.motor_inferencia, self.catalogo, rng=rng, **opciones)
+            resultado = optimizador.optimizar(perfil, semillas,
+                                              mascara=self._mascara_limitaciones(perfil),
+                                              params_defecto=params_defecto)
+            
+            self.eventos.info('optimizacion.resultado',
+                              "   🧬 Rutina optimizada: fitness {fitness:.2f} en {generaciones} "
+                              "generaciones ({motivo_parada})",
+                              fitness=resultado['fitness'],
+                              generaciones=resultado['generaciones'],
+                              motivo_parada=resultado['motivo_parada'])
+            return resultado
+    
     def _extraer_patrones_exitosos(self, rutinas_exitosas):
         """
         Analiza rutinas exitosas para identificar patrones comunes.
         Esto es cómo el sistema "aprende" qué funciona.
         """
-        patrones = {
-            'estructuras': [],
-            'ejercicios_por_grupo': defaultdict(list),
-            'parametros': defaultdict(list)
-        }
+        compactas = [
+            r.get('compacta') or RutinaCompacta.desde_dict(r['rutina'], self.catalogo)
+            for r in rutinas_exitosas
+        ]
+        estructuras = [r.estructura for r in compactas if r.estructura is not None]
         
-        for rutina_data in rutinas_exitosas:
-            rutina = rutina_data['rutina']
-            peso = rutina_data['peso']
-            
-            # Extraer estructura
-            if 'estructura' in rutina:
-                patrones['estructuras'].append(rutina['estructura'])
-            
-            # Extraer ejercicios usados
-            if 'rutina_semanal' in rutina:
-                for dia, ejercicios in rutina['rutina_semanal'].items():
-                    for ej in ejercicios:
-                        if 'grupo' in ej and ej['grupo'] != 'cardio':
-                            patrones['ejercicios_por_grupo'][ej['grupo']].append(ej['ejercicio'])
-                            
-                            # Extraer parámetros
-                            if 'series' in ej:
-                                patrones['parametros']['series'].append(ej['series'])
-                            if 'repeticiones' in ej:
-                                patrones['parametros']['repeticiones'].append(ej['repeticiones'])
+        # Ejercicios usados y parámetros, como columnas de todas las rutinas juntas
+        filas, _ = concatenar_filas(compactas)
+        fuerza = filas[filas['intensidad'] == 0]
         
         # Procesar patrones encontrados
         resultado = {}
         
         # Estructura más común
-        if patrones['estructuras']:
-            resultado['estructura_preferida'] = max(set(patrones['estructuras']), key=patrones['estructuras'].count)
-        
-        # Ejercicios más exitosos por grupo
-        for grupo, ejercicios in patrones['ejercicios_por_grupo'].items():
-            # Contar frecuencia
-            frecuencias = defaultdict(int)
-            for ej in ejercicios:
-                frecuencias[ej] += 1
-            # Top ejercicios
-            top_ejercicios = sorted(frecuencias.items(), key=lambda x: x[1], reverse=True)[:3]
-            resultado[f'ejercicios_{grupo}'] = [ej for ej, _ in top_ejercicios]
+        if estructuras:
+            resultado['estructura_preferida'] = max(set(estructuras), key=estructuras.count)
+        
+        # Ejercicios más exitosos por grupo: frecuencia (empates por primera aparición)
+        ids, primera, frecuencia = np.unique(fuerza['ejercicio_id'], return_index=True, return_counts=True)
+        por_grupo = {g: [] for g in fuerza['grupo_id'][np.sort(primera)].tolist()}
+        for i in np.lexsort((primera, -frecuencia)):
+            por_grupo[int(self.catalogo.grupo_id[ids[i]])].append(int(ids[i]))
+        for grupo_id, top_ejercicios in por_grupo.items():
+            grupo = self.catalogo.grupos[grupo_id]
+            resultado[f'ejercicios_{grupo}'] = [self.catalogo.nombre(i) for i in top_ejercicios[:3]]
         
         # Parámetros promedio
-        if patrones['parametros']['series']:
+        series = fuerza['series'][fuerza['series'] > 0]
+        if len(series):
             resultado['params_general'] = {
-                'series': int(sum(patrones['parametros']['series']) / len(patrones['parametros']['series'])),
+                'series': int(series.mean()),
                 'repeticiones': '8-12',  # Más común
                 'descanso': '60s'
             }
@@ -508,49 +1035,66 @@ class AdvancedGymAI:
         else:  # split
             return 3 if nivel == 'avanzado' else 2
     
-    def _seleccionar_ejercicios_innovadores(self, grupo, cantidad, nivel):
+    def _seleccionar_ejercicios_innovadores(self, grupo, cantidad, nivel, mascara=None, rng=None):
         """Selecciona ejercicios mezclando compuestos y aislamiento"""
-        if grupo not in self.ejercicios_base:
-            return []
+        ids = self._seleccionar_ids_ejercicios(grupo, cantidad, nivel, mascara, rng)
+        return [self.catalogo.nombre(i) for i in ids]
+    
+    def _seleccionar_ids_ejercicios(self, grupo, cantidad, nivel, mascara=None, rng=None):
+        """
+        Selecciona IDs del catálogo. Los candidatos por (grupo, nivel) están
+        precalculados: compuestos para principiantes, mezcla para el resto.
+        La máscara de limitaciones se aplica con un AND sobre su bitset.
+        """
+        rng = rng or self.semillas.nuevo()
+        candidatos = self.catalogo.candidatos(grupo, nivel, mascara)
+        return muestra(rng, candidatos, min(cantidad, len(candidatos)))
+    
+    def _seleccionar_ejercicios_complementarios(self, grupo, cantidad, nivel, ejercicios_dia,
+                                               mascara=None, rng=None):
+        """
+        Selecciona los ejercicios del grupo que más han co-ocurrido en rutinas
+        exitosas con los ejercicios ya elegidos para el día; completa al azar
+        si la matriz no tiene suficientes
+        """
+        elegidos = [self.catalogo.id_de(ej['grupo'], ej['ejercicio']) for ej in ejercicios_dia]
+        elegidos = [i for i in elegidos if i is not None]
         
-        ejercicios = []
-        disponibles = self.ejercicios_base[grupo]
+        sugeridos = self.coocurrencia.complementarios(
+            elegidos, bits_candidatos=self.catalogo.bits_candidatos(grupo, nivel, mascara)
+        )
+        ids = [i for i, _ in sugeridos[:cantidad]]
         
-        if isinstance(disponibles, dict):
-            # Priorizar compuestos para principiantes
-            if nivel == 'principiante':
-                compuestos = disponibles.get('compuestos', [])
-                ejercicios = random.sample(compuestos, min(cantidad, len(compuestos)))
-            else:
-                # Mix de compuestos y aislamiento
-                todos = disponibles.get('compuestos', []) + disponibles.get('aislamiento', [])
-                ejercicios = random.sample(todos, min(cantidad, len(todos)))
-        else:
-            ejercicios = random.sample(disponibles, min(cantidad, len(disponibles)))
+        if len(ids) < cantidad:
+            restantes = [i for i in self.catalogo.candidatos(grupo, nivel, mascara) if i not in ids]
+            rng = rng or self.semillas.nuevo()
+            ids += muestra(rng, restantes, min(cantidad - len(ids), len(restantes)))
         
-        return ejercicios
+        return [self.catalogo.nombre(i) for i in ids]
     
-    def _generar_parametros_experimentales(self, objetivo, nivel, grupo):
+    def _generar_parametros_experimentales(self, objetivo, nivel, grupo, rng=None):
         """Genera parámetros experimentando con rangos"""
+        rng = rng or self.semillas.nuevo()
+        
         # Mapas base
         nivel_series = {'principiante': 3, 'intermedio': 4, 'avanzado': 5}
         
         if objetivo == 'perder_peso':
             series = nivel_series[nivel]
-            reps = f"{random.randint(12, 15)}-{random.randint(15, 20)}"
-            descanso = f"{random.randint(30, 60)}s"
+            reps = f"{entero(rng, 12, 15)}-{entero(rng, 15, 20)}"
+            descanso = f"{entero(rng, 30, 60)}s"
         elif objetivo == 'ganar_masa':
             series = nivel_series[nivel] + 1
-            reps = f"{random.randint(8, 10)}-{random.randint(10, 12)}"
-            descanso = f"{random.randint(60, 90)}s"
+            reps = f"{entero(rng, 8, 10)}-{entero(rng, 10, 12)}"
+            descanso = f"{entero(rng, 60, 90)}s"
         elif objetivo == 'resistencia':
             series = nivel_series[nivel]
-            reps = f"{random.randint(15, 20)}-{random.randint(20, 25)}"
-            descanso = f"{random.randint(20, 45)}s"
+            reps = f"{entero(rng, 15, 20)}-{entero(rng, 20, 25)}"
+            descanso = f"{entero(rng, 20, 45)}s"
         else:  # fuerza
             series = nivel_series[nivel] + 1
-            reps = f"{random.randint(4, 6)}-{random.randint(6, 8)}"
-            descanso = f"{random.randint(120, 180)}s"
+            reps = f"{entero(rng, 4, 6)}-{entero(rng, 6, 8)}"
+            descanso = f"{entero(rng, 120, 180)}s"
         
         return {
             'series': series,
@@ -558,14 +1102,15 @@ class AdvancedGymAI:
             'descanso': descanso
         }
     
-    def _necesita_cardio(self, objetivo, dia):
+    def _necesita_cardio(self, objetivo, dia, rng=None):
         """Decide si agregar cardio según objetivo"""
+        rng = rng or self.semillas.nuevo()
         if objetivo == 'perder_peso':
-            return random.random() < 0.8  # 80% de probabilidad
+            return rng.random() < 0.8  # 80% de probabilidad
         elif objetivo == 'resistencia':
-            return random.random() < 0.9  # 90% de probabilidad
+            return rng.random() < 0.9  # 90% de probabilidad
         else:
-            return random.random() < 0.3  # 30% de probabilidad
+            return rng.random() < 0.3  # 30% de probabilidad
     
     def _aplicar_parametros_inferidos(self, rutina, parametros_inferidos):
         """
@@ -609,122 +1154,189 @@ class AdvancedGymAI:
         Procesa el feedback del usuario y actualiza el conocimiento del sistema.
         Aquí es donde el sistema realmente "aprende".
         """
-        print("\n🎓 Procesando feedback y aprendiendo...")
+        with self.lock_conocimiento:
+            self.eventos.debug('feedback.inicio', "\n🎓 Procesando feedback y aprendiendo...",
+                               rutina_id=self.rutina_actual['id'], satisfaccion=satisfaccion)
+            
+            # Registrar experiencia
+            experiencia = {
+                'perfil': self.user_data['perfil'],
+                'rutina_id': self.rutina_actual['id'],
+                'rutina_exitosa': self.rutina_actual['rutina'] if satisfaccion >= 4 else None,
+                'satisfaccion': satisfaccion,
+                'comentarios': comentarios,
+                'fecha': datetime.now().isoformat()
+            }
+            
+            self._aprender_de_feedback(experiencia, self.rutina_actual['rutina'], self.rutina_actual.get('modo'))
+            self.diario.registrar('feedback', {
+                'experiencia': experiencia,
+                'rutina': self.rutina_actual['rutina'],
+                'modo': self.rutina_actual.get('modo')
+            })
+            self.cambios_pendientes = True
+            
+            # Guardar conocimiento aprendido
+            self.save_data()
+            self.eventos.debug('feedback.guardado', "   💾 Conocimiento guardado para futuras generaciones",
+                               archivo=self.data_file)
+            
+            # NUEVO: Detectar anomalías con motor de inferencia
+            if self.motor_inferencia and hasattr(self, 'user_data'):
+                self.eventos.debug('feedback.analisis_anomalias', "\n   🔍 Analizando patrones y anomalías...")
+                
+                # Obtener todos los feedbacks del sistema
+                usuario_feedbacks = self.learning_system.get('historico_usuarios', [])
+                
+                if len(usuario_feedbacks) >= 3:
+                    anomalias = self.motor_inferencia.detectar_anomalias(
+                        self.user_data.get('perfil', {}),
+                        usuario_feedbacks[-5:]  # Últimos 5 para detectar tendencias
+                    )
+                    
+                    if anomalias.get('anomalias'):
+                        self.eventos.advertencia('feedback.anomalias',
+                                                 "   ⚠️  {cantidad} anomalía(s) detectada(s):",
+                                                 cantidad=len(anomalias['anomalias']))
+                        for anomalia in anomalias['anomalias']:
+                            self.eventos.advertencia('feedback.anomalia',
+                                                     "      • {descripcion}\n        → {recomendacion}",
+                                                     **anomalia)
+                    else:
+                        self.eventos.debug('feedback.sin_anomalias',
+                                           "   ✓ No se detectaron anomalías, progreso normal")
+    
+    def _aprender_de_feedback(self, experiencia, rutina, modo):
+        """
+        Actualiza el conocimiento con una experiencia
         
-        # Registrar experiencia
-        experiencia = {
-            'perfil': self.user_data['perfil'],
-            'rutina_id': self.rutina_actual['id'],
-            'rutina_exitosa': self.rutina_actual['rutina'] if satisfaccion >= 4 else None,
-            'satisfaccion': satisfaccion,
-            'comentarios': comentarios,
-            'fecha': datetime.now().isoformat()
-        }
+        Es la parte determinista de procesar_feedback: se usa tanto para el
+        feedback propio como para reproducir el que otros procesos dejaron
+        en el diario.
         
+        Args:
+            experiencia: Registro para historico_usuarios
+            rutina: Rutina valorada (completa, aunque no haya sido exitosa)
+            modo: 'exploracion' o 'explotacion'
+        """
+        satisfaccion = experiencia['satisfaccion']
         self.learning_system['historico_usuarios'].append(experiencia)
+        self.columnas_perfiles.agregar(experiencia)
+        self.estadisticas_ejercicios.registrar_feedback(rutina, satisfaccion)
+        if self.motor_inferencia:
+            self.motor_inferencia.registrar_experiencia(experiencia)
         
         # APRENDIZAJE 1: Actualizar patrones exitosos
         if satisfaccion >= 4:
-            perfil = self.user_data['perfil']
+            perfil = experiencia['perfil']
             clave_patron = f"{perfil['nivel_str']}_{perfil['objetivo_str']}"
             
             if clave_patron not in self.learning_system['patrones_exitosos']:
                 self.learning_system['patrones_exitosos'][clave_patron] = []
             
             self.learning_system['patrones_exitosos'][clave_patron].append({
-                'rutina': self.rutina_actual['rutina'],
+                'rutina': rutina,
                 'satisfaccion': satisfaccion,
-                'fecha': datetime.now().isoformat()
+                'fecha': experiencia['fecha']
             })
             
-            print(f"   ✓ Patrón exitoso guardado para: {clave_patron}")
+            self.eventos.info('feedback.patron_guardado',
+                              "   ✓ Patrón exitoso guardado para: {clave_patron}",
+                              clave_patron=clave_patron)
         
         # APRENDIZAJE 2: Actualizar combinaciones de ejercicios
         if satisfaccion >= 4:
-            for dia, ejercicios in self.rutina_actual['rutina']['rutina_semanal'].items():
+            self.coocurrencia.registrar_rutina(rutina, satisfaccion)
+            
+            for dia, ejercicios in rutina['rutina_semanal'].items():
                 for ej in ejercicios:
                     if 'grupo' in ej and ej['grupo'] != 'cardio':
                         grupo = ej['grupo']
                         ejercicio = ej['ejercicio']
                         
-                        if grupo not in self.learning_system['combinaciones_ejercicios']:
-                            self.learning_system['combinaciones_ejercicios'][grupo] = defaultdict(int)
-                        
-                        self.learning_system['combinaciones_ejercicios'][grupo][ejercicio] += 1
+                        # Tras cargar de JSON es un dict normal, no un defaultdict
+                        conteos = self.learning_system['combinaciones_ejercicios'].setdefault(grupo, {})
+                        conteos[ejercicio] = conteos.get(ejercicio, 0) + 1
             
-            print("   ✓ Combinaciones de ejercicios actualizadas")
+            self.eventos.debug('feedback.combinaciones_actualizadas',
+                               "   ✓ Combinaciones de ejercicios actualizadas")
         
         # APRENDIZAJE 3: Ajustar factor de exploración
         # Si las rutinas aprendidas funcionan bien, explorar menos
         # Si funcionan mal, explorar más
-        if satisfaccion >= 4 and self.rutina_actual.get('modo') == 'explotacion':
+        if satisfaccion >= 4 and modo == 'explotacion':
             self.learning_system['factor_exploracion'] = max(0.1, self.learning_system['factor_exploracion'] - 0.01)
-            print(f"   ✓ Reduciendo exploración (confianza aumenta): {self.learning_system['factor_exploracion']:.2f}")
+            self.eventos.info('feedback.exploracion',
+                              "   ✓ Reduciendo exploración (confianza aumenta): {factor_exploracion:.2f}",
+                              factor_exploracion=self.learning_system['factor_exploracion'])
         elif satisfaccion <= 2:
             self.learning_system['factor_exploracion'] = min(0.4, self.learning_system['factor_exploracion'] + 0.02)
-            print(f"   ✓ Aumentando exploración (buscando mejores opciones): {self.learning_system['factor_exploracion']:.2f}")
+            self.eventos.info('feedback.exploracion',
+                              "   ✓ Aumentando exploración (buscando mejores opciones): {factor_exploracion:.2f}",
+                              factor_exploracion=self.learning_system['factor_exploracion'])
         
         # APRENDIZAJE 4: Actualizar métricas
         self.metricas['satisfaccion_promedio_por_generacion'].append({
             'generacion': self.learning_system['generacion'],
             'satisfaccion': satisfaccion
         })
+        historico = self.learning_system['historico_usuarios']
+        self.estadisticas_acumuladas.registrar(experiencia, self.learning_system['generacion'], modo,
+                                               self._tipos_anomalia(historico[-5:]))
         
         # APRENDIZAJE 5: Incrementar generación (evolución del sistema)
         if len(self.learning_system['historico_usuarios']) % 10 == 0:
             self.learning_system['generacion'] += 1
-            print(f"   🎉 Sistema evolucionó a Generación {self.learning_system['generacion']}")
+            self.eventos.info('feedback.nueva_generacion',
+                              "   🎉 Sistema evolucionó a Generación {generacion}",
+                              generacion=self.learning_system['generacion'])
             
             # Analizar mejora
             if len(self.metricas['satisfaccion_promedio_por_generacion']) >= 10:
                 ultimas_10 = self.metricas['satisfaccion_promedio_por_generacion'][-10:]
                 promedio = sum(x['satisfaccion'] for x in ultimas_10) / 10
-                print(f"   📊 Satisfacción promedio últimos 10 usuarios: {promedio:.2f}/5")
-        
-        # Guardar conocimiento aprendido
-        self.save_data()
-        print("   💾 Conocimiento guardado para futuras generaciones")
-        
-        # NUEVO: Detectar anomalías con motor de inferencia
-        if self.motor_inferencia and hasattr(self, 'user_data'):
-            print("\n   🔍 Analizando patrones y anomalías...")
-            
-            # Obtener todos los feedbacks del sistema
-            usuario_feedbacks = self.learning_system.get('historico_usuarios', [])
-            
-            if len(usuario_feedbacks) >= 3:
-                anomalias = self.motor_inferencia.detectar_anomalias(
-                    self.user_data.get('perfil', {}),
-                    usuario_feedbacks[-5:]  # Últimos 5 para detectar tendencias
-                )
-                
-                if anomalias.get('anomalias'):
-                    print(f"   ⚠️  {len(anomalias['anomalias'])} anomalía(s) detectada(s):")
-                    for anomalia in anomalias['anomalias']:
-                        print(f"      • {anomalia['descripcion']}")
-                        print(f"        → {anomalia['recomendacion']}")
-                else:
-                    print("   ✓ No se detectaron anomalías, progreso normal")
+                self.eventos.info('feedback.promedio_reciente',
+                                  "   📊 Satisfacción promedio últimos 10 usuarios: {promedio:.2f}/5",
+                                  promedio=promedio)
+    
+    def obtener_rutina(self, rutina_id):
+        """Registro de rutinas_generadas con ese ID, p. ej. el de una experiencia (None si no existe)"""
+        return self.indice_rutinas.obtener(rutina_id)
     
     def obtener_estadisticas_sistema(self):
         """Retorna estadísticas del aprendizaje del sistema"""
-        total_usuarios = len(self.learning_system['historico_usuarios'])
-        total_rutinas = len(self.learning_system['rutinas_generadas'])
-        
-        if total_usuarios > 0:
-            satisfacciones = [u['satisfaccion'] for u in self.learning_system['historico_usuarios']]
-            promedio_satisfaccion = sum(satisfacciones) / len(satisfacciones)
-        else:
-            promedio_satisfaccion = 0
-        
         return {
             'generacion': self.learning_system['generacion'],
-            'total_usuarios': total_usuarios,
-            'total_rutinas_generadas': total_rutinas,
-            'promedio_satisfaccion': promedio_satisfaccion,
+            'total_usuarios': len(self.learning_system['historico_usuarios']),
+            'total_rutinas_generadas': len(self.learning_system['rutinas_generadas']),
+            'promedio_satisfaccion': self.estadisticas_acumuladas.media(),
             'patrones_exitosos': len(self.learning_system['patrones_exitosos']),
             'factor_exploracion': self.learning_system['factor_exploracion']
         }
+    
+    def obtener_estadisticas_detalladas(self, top_ejercicios=3):
+        """
+        Estadísticas del sistema con el desglose de la satisfacción
+        
+        Sale de los agregados mantenidos al añadir feedback, sin recorrer
+        el histórico, así que se puede consultar periódicamente.
+        
+        Args:
+            top_ejercicios: Ejercicios por grupo en 'top_ejercicios'
+        
+        Returns:
+            dict: Lo de obtener_estadisticas_sistema más 'satisfaccion'
+                (ver EstadisticasAcumuladas.resumen) y 'top_ejercicios'
+                ({grupo: [(ejercicio, veces en rutinas exitosas)]})
+        """
+        return {
+            **self.obtener_estadisticas_sistema(),
+            'satisfaccion': self.estadisticas_acumuladas.resumen(),
+            'top_ejercicios': {
+                grupo: sorted(conteos.items(), key=lambda x: x[1], reverse=True)[:top_ejercicios]
+                for grupo, conteos in sorted(self.learning_system['combinaciones_ejercicios'].items())
+            }
+        }
 
 
 # Exportar para uso en la interfaz
@@ -1,23 +1,50 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import json
-from gym_ai_advanced import AdvancedGymAI
+import threading
+from registro_eventos import RegistroEventos
 from datetime import datetime
 
 class GymAIGUI:
+    # Cada cuánto se comprueba si otros procesos han aprendido algo nuevo
+    INTERVALO_RECARGA_MS = 5000
+    
+    # Cada cuánto se mira si ya terminó de cargarse el sistema de IA
+    INTERVALO_CARGA_MS = 100
+    
+    # Cada cuánto se refresca el panel de administración mientras está abierto
+    INTERVALO_PANEL_MS = 2000
+    
     def __init__(self, root):
         self.root = root
         self.root.title("🏋️ Sistema de IA Adaptativo - Gimnasio")
         self.root.geometry("1000x700")
         self.root.configure(bg='#1a1a2e')
         
-        # Inicializar el sistema de IA
-        self.ai_system = AdvancedGymAI()
+        # El sistema de IA (numpy, motor de inferencia, base de conocimiento)
+        # se carga en un hilo para que la ventana aparezca enseguida; hasta
+        # entonces ai_system es None
+        self.ai_system = None
+        self._resultado_carga = None
+        self.error_carga = None  # Excepción si la carga falló (ai_system queda en None)
+        threading.Thread(target=self._cargar_sistema_ia, daemon=True).start()
         
         # Variables
         self.current_step = 0
         self.user_data = {}
         self.rutina_generada = None
+        self.info_bienvenida = None  # Label de estadísticas de la bienvenida
+        self.panel = None            # Labels del panel de administración
+        self._version_panel = None   # Estado que muestra el panel
+        self._sondeo_panel = None    # after() pendiente del panel
+        
+        # Pantallas construidas una vez y reutilizadas (ver mostrar_pantalla)
+        self.pantallas = {}
+        self.pantalla_actual = None
+        
+        # Widgets de la rutina que se reutilizan de una rutina a la siguiente:
+        # un marco por día con su título y sus filas de ejercicio
+        self.dias_rutina = []
         
         # Estilo
         self.setup_styles()
@@ -26,6 +53,62 @@ class GymAIGUI:
         self.create_header()
         self.create_main_container()
         self.show_welcome_screen()
+        
+        self.root.after(self.INTERVALO_CARGA_MS, self._comprobar_carga_ia)
+    
+    def _cargar_sistema_ia(self):
+        """Hilo de carga: importa los módulos pesados y construye el sistema (sin tocar Tk)"""
+        try:
+            from gym_ai_advanced import AdvancedGymAI
+            
+            # Uso interactivo: eventos visibles en consola
+            sistema = AdvancedGymAI(eventos=RegistroEventos(activo=True, nivel='DEBUG', consola=True))
+            
+            # Rutinas precalculadas en segundo plano para respuesta inmediata
+            sistema.activar_pool_rutinas()
+            self._resultado_carga = ('ok', sistema)
+        except Exception as e:
+            self._resultado_carga = ('error', e)
+    
+    def _comprobar_carga_ia(self):
+        """Espera (desde el hilo de Tk) a que termine la carga del sistema"""
+        if self._resultado_carga is None:
+            self.root.after(self.INTERVALO_CARGA_MS, self._comprobar_carga_ia)
+            return
+        
+        estado, valor = self._resultado_carga
+        if estado == 'error':
+            # Sin sistema no hay nada que esperar: lo que dependa de él
+            # (generación, panel) consulta error_carga en lugar de sondear
+            self.error_carga = valor
+            texto = self.texto_error_carga()
+            self.stats_label.config(text=texto)
+            if self.info_bienvenida is not None:
+                self.info_bienvenida.config(text=texto)
+            # En la pantalla de carga ya hay un finish_generation pendiente,
+            # que vuelve al formulario y avisa
+            if self.pantalla_actual != 'carga':
+                messagebox.showerror("Error", f"No se pudo cargar el sistema de IA:\n{valor}")
+            return
+        
+        self.ai_system = valor
+        self.actualizar_estadisticas()
+        
+        # Conocimiento aprendido por otros kioscos o procesos por lotes
+        self.root.after(self.INTERVALO_RECARGA_MS, self.vigilar_conocimiento)
+    
+    def texto_error_carga(self):
+        return f"⚠️ No se pudo cargar el sistema de IA: {self.error_carga}"
+    
+    def vigilar_conocimiento(self):
+        """Aplica periódicamente los cambios externos de la base de conocimiento"""
+        try:
+            if self.ai_system.recargar_cambios_externos():
+                self.actualizar_estadisticas()
+        except Exception as e:
+            self.ai_system.eventos.advertencia('conocimiento.error_recarga',
+                                               archivo=self.ai_system.data_file, error=str(e))
+        self.root.after(self.INTERVALO_RECARGA_MS, self.vigilar_conocimiento)
     
     def setup_styles(self):
         """Configura estilos personalizados"""
@@ -82,32 +165,73 @@ class GymAIGUI:
                         fg=self.colors['accent'])
         title.pack(pady=20)
         
-        # Estadísticas del sistema
+        # Estadísticas del sistema (se rellenan al terminar la carga)
+        self.stats_label = tk.Label(header,
+                                   text="Cargando base de conocimiento...",
+                                   font=('Helvetica', 9),
+                                   bg=self.colors['bg_light'],
+                                   fg=self.colors['text'])
+        self.stats_label.pack()
+    
+    def actualizar_estadisticas(self):
+        """Refresca las estadísticas del header (y de la bienvenida si está visible)"""
         stats = self.ai_system.obtener_estadisticas_sistema()
-        stats_text = f"Generación: {stats['generacion']} | Usuarios: {stats['total_usuarios']} | Satisfacción: {stats['promedio_satisfaccion']:.1f}/5"
+        self.stats_label.config(
+            text=f"Generación: {stats['generacion']} | Usuarios: {stats['total_usuarios']} | Satisfacción: {stats['promedio_satisfaccion']:.1f}/5")
         
-        stats_label = tk.Label(header,
-                              text=stats_text,
-                              font=('Helvetica', 9),
-                              bg=self.colors['bg_light'],
-                              fg=self.colors['text'])
-        stats_label.pack()
+        if self.info_bienvenida is not None and self.info_bienvenida.winfo_exists():
+            self.info_bienvenida.config(text=self.texto_info_sistema(stats))
+    
+    def texto_info_sistema(self, stats):
+        """Texto con el estado del sistema para la pantalla de bienvenida"""
+        return f"""
+🧠 Generación actual del sistema: {stats['generacion']}
+👥 Usuarios que han ayudado a entrenar la IA: {stats['total_usuarios']}
+📊 Patrones exitosos identificados: {stats['patrones_exitosos']}
+🎯 Tasa de satisfacción promedio: {stats['promedio_satisfaccion']:.2f}/5
+"""
     
     def create_main_container(self):
         """Crea el contenedor principal"""
         self.main_container = tk.Frame(self.root, bg=self.colors['bg_dark'])
         self.main_container.pack(fill='both', expand=True, padx=20, pady=20)
     
-    def clear_main_container(self):
-        """Limpia el contenedor principal"""
-        for widget in self.main_container.winfo_children():
-            widget.destroy()
+    def mostrar_pantalla(self, nombre, construir):
+        """
+        Pone delante una pantalla, construyéndola solo la primera vez
+        
+        Cada pantalla es un marco que ocupa todo el contenedor principal;
+        cambiar de pantalla es subirla con tkraise y actualizar en su sitio
+        lo que cambia, sin destruir ni recrear widgets. Así una sesión larga
+        de kiosco no acumula ni libera widgets a cada navegación.
+        
+        Args:
+            nombre: Clave de la pantalla
+            construir: Función que recibe el marco vacío y crea sus widgets
+        
+        Returns:
+            tk.Frame: Marco de la pantalla
+        """
+        pantalla = self.pantallas.get(nombre)
+        if pantalla is None:
+            pantalla = tk.Frame(self.main_container, bg=self.colors['bg_dark'])
+            pantalla.place(relx=0, rely=0, relwidth=1, relheight=1)
+            construir(pantalla)
+            self.pantallas[nombre] = pantalla
+        pantalla.tkraise()
+        self.pantalla_actual = nombre
+        return pantalla
     
     def show_welcome_screen(self):
         """Pantalla de bienvenida"""
-        self.clear_main_container()
-        
-        frame = tk.Frame(self.main_container, bg=self.colors['bg_medium'], padx=40, pady=40)
+        self.mostrar_pantalla('bienvenida', self._construir_bienvenida)
+        if self.ai_system is not None:
+            self.info_bienvenida.config(text=self.texto_info_sistema(self.ai_system.obtener_estadisticas_sistema()))
+        elif self.error_carga is not None:
+            self.info_bienvenida.config(text=self.texto_error_carga())
+    
+    def _construir_bienvenida(self, pantalla):
+        frame = tk.Frame(pantalla, bg=self.colors['bg_medium'], padx=40, pady=40)
         frame.place(relx=0.5, rely=0.5, anchor='center')
         
         # Logo/Icono
@@ -135,22 +259,14 @@ y genera una rutina completamente personalizada para ti.
                              justify='center')
         desc_label.pack(pady=20)
         
-        # Información del sistema
-        stats = self.ai_system.obtener_estadisticas_sistema()
-        info = f"""
-🧠 Generación actual del sistema: {stats['generacion']}
-👥 Usuarios que han ayudado a entrenar la IA: {stats['total_usuarios']}
-📊 Patrones exitosos identificados: {stats['patrones_exitosos']}
-🎯 Tasa de satisfacción promedio: {stats['promedio_satisfaccion']:.2f}/5
-"""
-        
-        info_label = tk.Label(frame,
-                             text=info,
-                             font=('Helvetica', 10),
-                             bg=self.colors['bg_medium'],
-                             fg=self.colors['success'],
-                             justify='left')
-        info_label.pack(pady=15)
+        # Información del sistema (se actualiza al mostrar la pantalla)
+        self.info_bienvenida = tk.Label(frame,
+                                        text="\n🧠 Cargando el conocimiento del sistema...\n",
+                                        font=('Helvetica', 10),
+                                        bg=self.colors['bg_medium'],
+                                        fg=self.colors['success'],
+                                        justify='left')
+        self.info_bienvenida.pack(pady=15)
         
         # Botón comenzar
         start_btn = tk.Button(frame,
@@ -166,14 +282,182 @@ y genera una rutina completamente personalizada para ti.
                              cursor='hand2',
                              command=self.show_form_screen)
         start_btn.pack(pady=20)
+        
+        # Acceso al panel de administración (recepción)
+        panel_btn = tk.Button(frame,
+                             text="📊 Panel de administración",
+                             font=('Helvetica', 10),
+                             bg=self.colors['bg_light'],
+                             fg='white',
+                             activebackground=self.colors['accent'],
+                             activeforeground='white',
+                             padx=15,
+                             pady=6,
+                             border=0,
+                             cursor='hand2',
+                             command=self.show_dashboard_screen)
+        panel_btn.pack()
     
-    def show_form_screen(self):
-        """Formulario de datos del usuario"""
-        self.clear_main_container()
+    def show_dashboard_screen(self):
+        """
+        Panel de administración: progreso del aprendizaje
+        
+        Solo lee los agregados que el sistema mantiene al añadir feedback
+        (obtener_estadisticas_detalladas), así que abrirlo y refrescarlo no
+        depende del tamaño del histórico. Mientras está visible se sondea
+        con after() y solo se vuelven a escribir los textos si hay feedback
+        o rutinas nuevas.
+        """
+        self.mostrar_pantalla('panel', self._construir_panel)
+        
+        # Un solo sondeo aunque se abra el panel varias veces
+        if self._sondeo_panel is not None:
+            self.root.after_cancel(self._sondeo_panel)
+        self._version_panel = None
+        self.refrescar_panel()
+    
+    def _construir_panel(self, pantalla):
+        frame = tk.Frame(pantalla, bg=self.colors['bg_medium'], padx=30, pady=20)
+        frame.pack(fill='both', expand=True)
+        
+        top = tk.Frame(frame, bg=self.colors['bg_medium'])
+        top.pack(fill='x')
         
+        tk.Label(top,
+                text="📊 PANEL DE ADMINISTRACIÓN",
+                font=('Helvetica', 18, 'bold'),
+                bg=self.colors['bg_medium'],
+                fg=self.colors['accent']).pack(side='left')
+        
+        back_btn = tk.Button(top,
+                            text="🏠 INICIO",
+                            font=('Helvetica', 11, 'bold'),
+                            bg=self.colors['accent'],
+                            fg='white',
+                            activebackground=self.colors['success'],
+                            activeforeground='white',
+                            padx=20,
+                            pady=8,
+                            border=0,
+                            cursor='hand2',
+                            command=self.show_welcome_screen)
+        back_btn.pack(side='right')
+        
+        self.panel = {}
+        self.panel['resumen'] = tk.Label(frame,
+                                         text="Cargando base de conocimiento...",
+                                         font=('Helvetica', 10),
+                                         bg=self.colors['bg_medium'],
+                                         fg=self.colors['text'],
+                                         anchor='w')
+        self.panel['resumen'].pack(fill='x', pady=(10, 15))
+        
+        columnas = tk.Frame(frame, bg=self.colors['bg_medium'])
+        columnas.pack(fill='both', expand=True)
+        columnas.columnconfigure(0, weight=1)
+        columnas.columnconfigure(1, weight=1)
+        
+        secciones = [
+            ('generaciones', "🧠 Satisfacción por generación", 0, 0),
+            ('histograma', "⭐ Distribución de la satisfacción", 1, 0),
+            ('modos', "🔀 Exploración / explotación", 0, 1),
+            ('anomalias', "⚠️ Anomalías detectadas", 1, 1),
+            ('ejercicios', "🏆 Ejercicios top por grupo", 2, 1)
+        ]
+        for nombre, titulo, fila, columna in secciones:
+            seccion = tk.Frame(columnas, bg=self.colors['bg_light'], padx=12, pady=8)
+            seccion.grid(row=fila, column=columna, rowspan=2 if nombre == 'generaciones' else 1,
+                         sticky='nsew', padx=6, pady=6)
+            tk.Label(seccion,
+                    text=titulo,
+                    font=('Helvetica', 11, 'bold'),
+                    bg=self.colors['bg_light'],
+                    fg=self.colors['accent']).pack(anchor='w')
+            self.panel[nombre] = tk.Label(seccion,
+                                          text="",
+                                          font=('Courier', 9),
+                                          bg=self.colors['bg_light'],
+                                          fg=self.colors['text'],
+                                          justify='left')
+            self.panel[nombre].pack(anchor='w', pady=(5, 0))
+    
+    def refrescar_panel(self):
+        """Sondeo del panel: actualiza sus textos si algo ha cambiado (deja de sondear al salir)"""
+        self._sondeo_panel = None
+        if self.pantalla_actual != 'panel':
+            return
+        
+        if self.ai_system is None and self.error_carga is not None:
+            # La carga falló: no habrá estadísticas que esperar
+            self.panel['resumen'].config(text=self.texto_error_carga())
+            return
+        
+        if self.ai_system is not None:
+            stats = self.ai_system.obtener_estadisticas_detalladas()
+            version = (stats['generacion'], stats['total_usuarios'], stats['total_rutinas_generadas'])
+            if version != self._version_panel:
+                self._version_panel = version
+                self.mostrar_estadisticas_panel(stats)
+        
+        self._sondeo_panel = self.root.after(self.INTERVALO_PANEL_MS, self.refrescar_panel)
+    
+    def mostrar_estadisticas_panel(self, stats):
+        """Escribe en los labels del panel unas estadísticas detalladas"""
+        satisfaccion = stats['satisfaccion']
+        
+        def barra(valor, maximo, ancho=20):
+            llenos = round(ancho * valor / maximo) if maximo else 0
+            return '█' * llenos + '░' * (ancho - llenos)
+        
+        self.panel['resumen'].config(
+            text=f"Generación {stats['generacion']} | Usuarios: {stats['total_usuarios']} | "
+                 f"Rutinas: {stats['total_rutinas_generadas']} | "
+                 f"Satisfacción: {satisfaccion['global']['media']:.2f} ± {satisfaccion['global']['desviacion']:.2f} | "
+                 f"Exploración: {stats['factor_exploracion']:.0%} | "
+                 f"Actualizado: {datetime.now().strftime('%H:%M:%S')}")
+        
+        # Las últimas generaciones (las anteriores ya no cambian)
+        generaciones = satisfaccion['por_generacion'][-15:]
+        self.panel['generaciones'].config(text='\n'.join(
+            f"Gen {g['generacion']:>4} {barra(g['media'], 5)} {g['media']:.2f} (n={g['n']})"
+            for g in generaciones) or "Sin feedback todavía")
+        
+        histograma = satisfaccion['histograma']
+        maximo = max(histograma.values())
+        self.panel['histograma'].config(text='\n'.join(
+            f"{nivel} ★ {barra(cuenta, maximo)} {cuenta}" for nivel, cuenta in sorted(histograma.items(), reverse=True)))
+        
+        total = satisfaccion['global']['n']
+        nombres_modo = {'exploracion': "Exploración", 'explotacion': "Explotación"}
+        self.panel['modos'].config(text='\n'.join(
+            f"{nombres_modo.get(modo, modo.capitalize()):<12} {m['n']:>6} ({m['n'] / total:.0%})  media {m['media']:.2f}"
+            for modo, m in satisfaccion['por_modo'].items()) or "Sin feedback todavía")
+        
+        anomalias = sorted(satisfaccion['anomalias'].items(), key=lambda x: x[1], reverse=True)
+        self.panel['anomalias'].config(text='\n'.join(
+            f"{tipo.replace('_', ' ').capitalize():<20} {veces:>6}" for tipo, veces in anomalias)
+            or "Ninguna")
+        
+        self.panel['ejercicios'].config(text='\n'.join(
+            f"{grupo.capitalize():<8} " + ', '.join(f"{nombre} ({veces})" for nombre, veces in top)
+            for grupo, top in stats['top_ejercicios'].items() if top) or "Sin rutinas exitosas todavía")
+    
+    def show_form_screen(self):
+        """Formulario de datos del usuario (vacío para cada usuario nuevo)"""
+        self.mostrar_pantalla('formulario', self._construir_formulario)
+        
+        for campo in ('nombre', 'edad', 'peso', 'altura'):
+            self.form_vars[campo].delete(0, 'end')
+        self.form_vars['nivel'].set("principiante")
+        self.form_vars['objetivo'].set("ganar_masa")
+        self.form_vars['dias'].set(4)
+        self.form_vars['limitaciones'].delete('1.0', 'end')
+        self.canvas_formulario.yview_moveto(0)
+    
+    def _construir_formulario(self, pantalla):
         # Frame principal con scroll
-        canvas = tk.Canvas(self.main_container, bg=self.colors['bg_dark'], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(self.main_container, orient="vertical", command=canvas.yview)
+        canvas = tk.Canvas(pantalla, bg=self.colors['bg_dark'], highlightthickness=0)
+        scrollbar = ttk.Scrollbar(pantalla, orient="vertical", command=canvas.yview)
         scrollable_frame = tk.Frame(canvas, bg=self.colors['bg_medium'])
         
         scrollable_frame.bind(
@@ -186,6 +470,7 @@ y genera una rutina completamente personalizada para ti.
         
         canvas.pack(side="left", fill="both", expand=True, padx=(0, 10))
         scrollbar.pack(side="right", fill="y")
+        self.canvas_formulario = canvas
         
         # Contenido del formulario
         form_frame = tk.Frame(scrollable_frame, bg=self.colors['bg_medium'], padx=50, pady=30)
@@ -390,9 +675,10 @@ y genera una rutina completamente personalizada para ti.
     
     def show_loading_screen(self):
         """Muestra pantalla de carga mientras la IA genera"""
-        self.clear_main_container()
-        
-        frame = tk.Frame(self.main_container, bg=self.colors['bg_medium'], padx=60, pady=60)
+        self.mostrar_pantalla('carga', self._construir_carga)
+    
+    def _construir_carga(self, pantalla):
+        frame = tk.Frame(pantalla, bg=self.colors['bg_medium'], padx=60, pady=60)
         frame.place(relx=0.5, rely=0.5, anchor='center')
         
         # Animación de carga
@@ -422,6 +708,16 @@ y genera una rutina completamente personalizada para ti.
     
     def finish_generation(self):
         """Finaliza la generación de rutina"""
+        if self.ai_system is None:
+            if self.error_carga is not None:
+                # La carga falló: volver al formulario (con sus datos) y avisar
+                self.mostrar_pantalla('formulario', self._construir_formulario)
+                messagebox.showerror("Error", f"No se pudo cargar el sistema de IA:\n{self.error_carga}")
+                return
+            # El sistema aún se está cargando: la pantalla de carga sigue visible
+            self.root.after(self.INTERVALO_CARGA_MS, self.finish_generation)
+            return
+        
         # Crear perfil y generar rutina
         self.ai_system.user_data = self.user_data
         perfil = self.ai_system.crear_perfil_usuario(self.user_data)
@@ -434,11 +730,36 @@ y genera una rutina completamente personalizada para ti.
     
     def show_routine_screen(self):
         """Muestra la rutina generada"""
-        self.clear_main_container()
+        self.mostrar_pantalla('rutina', self._construir_rutina)
+        
+        self.titulo_rutina.config(text=f"🎯 RUTINA PERSONALIZADA PARA {self.user_data['nombre'].upper()}")
         
+        # Análisis del perfil
+        perfil = self.user_data['perfil']
+        imc = perfil['imc']
+        
+        info_text = f"""📊 ANÁLISIS DE TU PERFIL
+        
+IMC: {imc:.1f} - {self.get_imc_category(imc)}
+Edad: {perfil['edad']} años | Nivel: {perfil['nivel_str'].title()} | Objetivo: {perfil['objetivo_str'].replace('_', ' ').title()}
+
+🧠 Modo de generación: {self.rutina_generada['metadatos'].get('modo_generacion', 'IA').upper()}
+"""
+        
+        if 'basado_en' in self.rutina_generada['metadatos']:
+            info_text += f"📚 Basado en {self.rutina_generada['metadatos']['basado_en']} perfiles similares exitosos\n"
+            info_text += f"✅ Nivel de confianza: {self.rutina_generada['metadatos']['confianza']*100:.0f}%"
+        
+        self.info_rutina.config(text=info_text)
+        
+        # Rutina semanal
+        self.mostrar_dias_rutina(self.rutina_generada['rutina_semanal'])
+        self.canvas_rutina.yview_moveto(0)
+    
+    def _construir_rutina(self, pantalla):
         # Frame principal con scroll
-        canvas = tk.Canvas(self.main_container, bg=self.colors['bg_dark'], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(self.main_container, orient="vertical", command=canvas.yview)
+        canvas = tk.Canvas(pantalla, bg=self.colors['bg_dark'], highlightthickness=0)
+        scrollbar = ttk.Scrollbar(pantalla, orient="vertical", command=canvas.yview)
         scrollable_frame = tk.Frame(canvas, bg=self.colors['bg_dark'])
         
         scrollable_frame.bind(
@@ -451,73 +772,33 @@ y genera una rutina completamente personalizada para ti.
         
         canvas.pack(side="left", fill="both", expand=True, padx=(0, 10))
         scrollbar.pack(side="right", fill="y")
+        self.canvas_rutina = canvas
         
         # Contenido
         content_frame = tk.Frame(scrollable_frame, bg=self.colors['bg_dark'], padx=20, pady=20)
         content_frame.pack(fill='both', expand=True)
         
         # Título
-        title = tk.Label(content_frame,
-                        text=f"🎯 RUTINA PERSONALIZADA PARA {self.user_data['nombre'].upper()}",
-                        font=('Helvetica', 18, 'bold'),
-                        bg=self.colors['bg_dark'],
-                        fg=self.colors['accent'])
-        title.pack(pady=(0, 20))
+        self.titulo_rutina = tk.Label(content_frame,
+                                      font=('Helvetica', 18, 'bold'),
+                                      bg=self.colors['bg_dark'],
+                                      fg=self.colors['accent'])
+        self.titulo_rutina.pack(pady=(0, 20))
         
         # Análisis del perfil
-        perfil = self.user_data['perfil']
-        imc = perfil['imc']
-        
         info_frame = tk.Frame(content_frame, bg=self.colors['bg_medium'], padx=20, pady=15)
         info_frame.pack(fill='x', pady=(0, 20))
         
-        info_text = f"""📊 ANÁLISIS DE TU PERFIL
+        self.info_rutina = tk.Label(info_frame,
+                                    font=('Helvetica', 10),
+                                    bg=self.colors['bg_medium'],
+                                    fg=self.colors['text'],
+                                    justify='left')
+        self.info_rutina.pack(anchor='w')
         
-IMC: {imc:.1f} - {self.get_imc_category(imc)}
-Edad: {perfil['edad']} años | Nivel: {perfil['nivel_str'].title()} | Objetivo: {perfil['objetivo_str'].replace('_', ' ').title()}
-
-🧠 Modo de generación: {self.rutina_generada['metadatos'].get('modo_generacion', 'IA').upper()}
-"""
-        
-        if 'basado_en' in self.rutina_generada['metadatos']:
-            info_text += f"📚 Basado en {self.rutina_generada['metadatos']['basado_en']} perfiles similares exitosos\n"
-            info_text += f"✅ Nivel de confianza: {self.rutina_generada['metadatos']['confianza']*100:.0f}%"
-        
-        info_label = tk.Label(info_frame,
-                             text=info_text,
-                             font=('Helvetica', 10),
-                             bg=self.colors['bg_medium'],
-                             fg=self.colors['text'],
-                             justify='left')
-        info_label.pack(anchor='w')
-        
-        # Rutina semanal
-        for dia, ejercicios in self.rutina_generada['rutina_semanal'].items():
-            dia_frame = tk.Frame(content_frame, bg=self.colors['bg_medium'], padx=20, pady=15)
-            dia_frame.pack(fill='x', pady=10)
-            
-            dia_label = tk.Label(dia_frame,
-                                text=f"📅 {dia.upper()}",
-                                font=('Helvetica', 13, 'bold'),
-                                bg=self.colors['bg_medium'],
-                                fg=self.colors['accent'])
-            dia_label.pack(anchor='w', pady=(0, 10))
-            
-            for idx, ej in enumerate(ejercicios, 1):
-                ej_text = f"{idx}. {ej['ejercicio']} ({ej['grupo'].title()})"
-                
-                if 'series' in ej:
-                    ej_text += f"\n   Series: {ej['series']} | Reps: {ej['repeticiones']} | Descanso: {ej['descanso']}"
-                else:
-                    ej_text += f"\n   Duración: {ej['duracion']} | Intensidad: {ej['intensidad'].title()}"
-                
-                ej_label = tk.Label(dia_frame,
-                                   text=ej_text,
-                                   font=('Helvetica', 10),
-                                   bg=self.colors['bg_medium'],
-                                   fg=self.colors['text'],
-                                   justify='left')
-                ej_label.pack(anchor='w', pady=5)
+        # Días de la rutina (se rellenan en mostrar_dias_rutina)
+        self.contenedor_dias = tk.Frame(content_frame, bg=self.colors['bg_dark'])
+        self.contenedor_dias.pack(fill='x')
         
         # Botones
         btn_frame = tk.Frame(content_frame, bg=self.colors['bg_dark'])
@@ -551,6 +832,67 @@ Edad: {perfil['edad']} años | Nivel: {perfil['nivel_str'].title()} | Objetivo:
                            command=self.show_form_screen)
         new_btn.pack(side='left', padx=10)
     
+    def mostrar_dias_rutina(self, rutina_semanal):
+        """
+        Rellena los días de la rutina reutilizando los widgets de la anterior
+        
+        Solo se crean marcos de día o filas de ejercicio cuando la rutina
+        tiene más que cualquiera de las mostradas antes; los que sobran se
+        ocultan (pack_forget) y quedan para la siguiente. Siempre sobran por
+        el final, así que al volver a empaquetarlos conservan el orden.
+        """
+        dias = list(rutina_semanal.items())
+        while len(self.dias_rutina) < len(dias):
+            self.dias_rutina.append(self._crear_dia_rutina())
+        
+        for i, widgets in enumerate(self.dias_rutina):
+            if i >= len(dias):
+                widgets['frame'].pack_forget()
+                continue
+            
+            dia, ejercicios = dias[i]
+            widgets['titulo'].config(text=f"📅 {dia.upper()}")
+            
+            filas = widgets['filas']
+            while len(filas) < len(ejercicios):
+                filas.append(self._crear_fila_ejercicio(widgets['frame']))
+            for idx, fila in enumerate(filas):
+                if idx < len(ejercicios):
+                    fila.config(text=self.texto_ejercicio(idx + 1, ejercicios[idx]))
+                    fila.pack(anchor='w', pady=5)
+                else:
+                    fila.pack_forget()
+            
+            widgets['frame'].pack(fill='x', pady=10)
+    
+    def _crear_dia_rutina(self):
+        dia_frame = tk.Frame(self.contenedor_dias, bg=self.colors['bg_medium'], padx=20, pady=15)
+        
+        dia_label = tk.Label(dia_frame,
+                            font=('Helvetica', 13, 'bold'),
+                            bg=self.colors['bg_medium'],
+                            fg=self.colors['accent'])
+        dia_label.pack(anchor='w', pady=(0, 10))
+        
+        return {'frame': dia_frame, 'titulo': dia_label, 'filas': []}
+    
+    def _crear_fila_ejercicio(self, dia_frame):
+        return tk.Label(dia_frame,
+                       font=('Helvetica', 10),
+                       bg=self.colors['bg_medium'],
+                       fg=self.colors['text'],
+                       justify='left')
+    
+    def texto_ejercicio(self, idx, ej):
+        """Texto de una fila de ejercicio de la rutina"""
+        ej_text = f"{idx}. {ej['ejercicio']} ({ej['grupo'].title()})"
+        
+        if 'series' in ej:
+            ej_text += f"\n   Series: {ej['series']} | Reps: {ej['repeticiones']} | Descanso: {ej['descanso']}"
+        else:
+            ej_text += f"\n   Duración: {ej['duracion']} | Intensidad: {ej['intensidad'].title()}"
+        return ej_text
+    
     def get_imc_category(self, imc):
         """Retorna categoría del IMC"""
         if imc < 18.5:
@@ -564,9 +906,12 @@ Edad: {perfil['edad']} años | Nivel: {perfil['nivel_str'].title()} | Objetivo:
     
     def show_feedback_screen(self):
         """Pantalla para dar feedback"""
-        self.clear_main_container()
-        
-        frame = tk.Frame(self.main_container, bg=self.colors['bg_medium'], padx=50, pady=40)
+        self.mostrar_pantalla('feedback', self._construir_feedback)
+        self.satisfaccion_var.set(3)
+        self.comment_text.delete('1.0', 'end')
+    
+    def _construir_feedback(self, pantalla):
+        frame = tk.Frame(pantalla, bg=self.colors['bg_medium'], padx=50, pady=40)
         frame.place(relx=0.5, rely=0.5, anchor='center')
         
         # Título
@@ -598,7 +943,7 @@ rutinas cada vez más precisas y personalizadas."""
         question.pack(pady=10)
         
         # Escala de satisfacción
-        satisfaccion_var = tk.IntVar(value=3)
+        self.satisfaccion_var = tk.IntVar(value=3)
         
         scale_frame = tk.Frame(frame, bg=self.colors['bg_medium'])
         scale_frame.pack(pady=20)
@@ -614,7 +959,7 @@ rutinas cada vez más precisas y personalizadas."""
         for value, text in ratings:
             rb = tk.Radiobutton(scale_frame,
                                text=text,
-                               variable=satisfaccion_var,
+                               variable=self.satisfaccion_var,
                                value=value,
                                font=('Helvetica', 11),
                                bg=self.colors['bg_medium'],
@@ -632,25 +977,17 @@ rutinas cada vez más precisas y personalizadas."""
                                 fg=self.colors['text'])
         comment_label.pack(pady=(20, 5))
         
-        comment_text = tk.Text(frame,
-                              height=4,
-                              width=50,
-                              font=('Helvetica', 10),
-                              bg=self.colors['bg_light'],
-                              fg=self.colors['text'],
-                              insertbackground=self.colors['text'],
-                              relief='flat')
-        comment_text.pack(pady=10)
+        self.comment_text = tk.Text(frame,
+                                    height=4,
+                                    width=50,
+                                    font=('Helvetica', 10),
+                                    bg=self.colors['bg_light'],
+                                    fg=self.colors['text'],
+                                    insertbackground=self.colors['text'],
+                                    relief='flat')
+        self.comment_text.pack(pady=10)
         
         # Botón enviar
-        def submit_feedback():
-            satisfaccion = satisfaccion_var.get()
-            comentarios = comment_text.get('1.0', 'end').strip()
-            
-            self.ai_system.procesar_feedback(satisfaccion, comentarios)
-            
-            self.show_thanks_screen(satisfaccion)
-        
         submit_btn = tk.Button(frame,
                               text="✅ ENVIAR FEEDBACK",
                               font=('Helvetica', 13, 'bold'),
@@ -662,25 +999,25 @@ rutinas cada vez más precisas y personalizadas."""
                               pady=15,
                               border=0,
                               cursor='hand2',
-                              command=submit_feedback)
+                              command=self.enviar_feedback)
         submit_btn.pack(pady=20)
     
+    def enviar_feedback(self):
+        """Procesa el feedback del formulario y agradece"""
+        satisfaccion = self.satisfaccion_var.get()
+        comentarios = self.comment_text.get('1.0', 'end').strip()
+        
+        self.ai_system.procesar_feedback(satisfaccion, comentarios)
+        
+        self.show_thanks_screen(satisfaccion)
+    
     def show_thanks_screen(self, satisfaccion):
         """Pantalla de agradecimiento"""
-        self.clear_main_container()
-        
-        frame = tk.Frame(self.main_container, bg=self.colors['bg_medium'], padx=60, pady=50)
-        frame.place(relx=0.5, rely=0.5, anchor='center')
+        self.mostrar_pantalla('gracias', self._construir_gracias)
         
         # Icono según satisfacción
         icon = "🎉" if satisfaccion >= 4 else "👍" if satisfaccion == 3 else "🔄"
-        
-        thanks_label = tk.Label(frame,
-                               text=f"{icon} ¡GRACIAS POR TU FEEDBACK!",
-                               font=('Helvetica', 20, 'bold'),
-                               bg=self.colors['bg_medium'],
-                               fg=self.colors['success'])
-        thanks_label.pack(pady=20)
+        self.titulo_gracias.config(text=f"{icon} ¡GRACIAS POR TU FEEDBACK!")
         
         # Mensaje de aprendizaje
         stats = self.ai_system.obtener_estadisticas_sistema()
@@ -697,13 +1034,24 @@ este conocimiento para mejorar las futuras rutinas.
    
 ¡Cada feedback hace que la IA sea más inteligente!"""
         
-        message_label = tk.Label(frame,
-                                text=message,
-                                font=('Helvetica', 11),
-                                bg=self.colors['bg_medium'],
-                                fg=self.colors['text'],
-                                justify='center')
-        message_label.pack(pady=20)
+        self.mensaje_gracias.config(text=message)
+    
+    def _construir_gracias(self, pantalla):
+        frame = tk.Frame(pantalla, bg=self.colors['bg_medium'], padx=60, pady=50)
+        frame.place(relx=0.5, rely=0.5, anchor='center')
+        
+        self.titulo_gracias = tk.Label(frame,
+                                       font=('Helvetica', 20, 'bold'),
+                                       bg=self.colors['bg_medium'],
+                                       fg=self.colors['success'])
+        self.titulo_gracias.pack(pady=20)
+        
+        self.mensaje_gracias = tk.Label(frame,
+                                        font=('Helvetica', 11),
+                                        bg=self.colors['bg_medium'],
+                                        fg=self.colors['text'],
+                                        justify='center')
+        self.mensaje_gracias.pack(pady=20)
         
         # Botones
         btn_frame = tk.Frame(frame, bg=self.colors['bg_medium'])
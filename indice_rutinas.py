@@ -0,0 +1,64 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+
+
+class GeneradorIdsRutina:
+    """
+    IDs de rutina únicos y crecientes.
+    
+    Formato 'RUT_<AAAAMMDD>_<HHMMSS>_<microsegundos>_<nodo>': conserva el
+    prefijo de fecha de los IDs antiguos ('RUT_<AAAAMMDD>_<HHMMSS>'), así
+    que siguen ordenándose por fecha, pero ya no se repiten cuando se
+    generan varias rutinas en el mismo segundo. Dentro de un generador la
+    marca de microsegundos nunca retrocede (si el reloj no ha avanzado, o
+    se atrasa, se toma la anterior + 1) y el nodo distingue a los procesos
+    que comparten la base.
+    """
+    
+    def __init__(self, nodo=None):
+        self.nodo = nodo or uuid.uuid4().hex[:8]
+        self._ultimo = 0
+        self._lock = threading.Lock()
+    
+    def nuevo(self):
+        with self._lock:
+            marca = max(time.time_ns() // 1000, self._ultimo + 1)
+            self._ultimo = marca
+        segundos, micros = divmod(marca, 1_000_000)
+        return f"RUT_{datetime.fromtimestamp(segundos):%Y%m%d_%H%M%S}_{micros:06d}_{self.nodo}"
+
+
+class IndiceRutinas:
+    """
+    Índice ID -> registro de rutinas_generadas.
+    
+    Permite unir cada experiencia del histórico (rutina_id) con la rutina
+    que la produjo en tiempo constante, sin recorrer rutinas_generadas. Se
+    mantiene al añadir rutinas y se reconstruye al recargar la base.
+    
+    Las bases antiguas pueden tener IDs repetidos (eran por segundo): el
+    índice se queda con la última rutina de cada ID, que es la que estaba
+    en curso cuando llegó el feedback que la cita.
+    """
+    
+    def __init__(self, rutinas=()):
+        self._por_id = {}
+        self.reconstruir(rutinas)
+    
+    def __len__(self):
+        return len(self._por_id)
+    
+    def __contains__(self, rutina_id):
+        return rutina_id in self._por_id
+    
+    def reconstruir(self, rutinas):
+        self._por_id = {r['id']: r for r in rutinas if 'id' in r}
+    
+    def agregar(self, registro):
+        self._por_id[registro['id']] = registro
+    
+    def obtener(self, rutina_id):
+        """Registro de la rutina con ese ID (None si no está)"""
+        return self._por_id.get(rutina_id)
@@ -0,0 +1,139 @@
+import json
+import os
+
+import numpy as np
+
+from almacen_conocimiento import escribir_json_atomico
+
+
+class IndicesDerivados:
+    """
+    Estructuras derivadas del histórico guardadas junto a la base de conocimiento.
+    
+    La matriz de co-ocurrencia y las estadísticas por ejercicio se pueden
+    reconstruir desde el histórico, pero eso cuesta en proporción a su
+    longitud. Al compactar la base se guardan como arrays .npy en
+    '<datos>.indices/' y al arrancar se abren mapeados en memoria (copia al
+    escribir: los cambios en memoria no tocan el archivo), así el coste
+    depende del tamaño de los índices y no de la historia.
+    
+    Un manifiesto JSON, escrito al final y de forma atómica, dice de qué
+    versión de la base se construyeron (la época del diario de la
+    instantánea) y con qué tabla de ejercicios (ID -> grupo, nombre). Si la
+    versión no es la de la instantánea cargada, o el catálogo ya no asigna
+    los mismos IDs, los índices se consideran obsoletos y quien los usa los
+    reconstruye desde el histórico.
+    """
+    
+    FORMATO = 1
+    
+    def __init__(self, ruta_datos):
+        self.directorio = ruta_datos + '.indices'
+        self.ruta_manifiesto = os.path.join(self.directorio, 'manifiesto.json')
+    
+    def cargar(self, version, catalogo):
+        """
+        Abre los índices si corresponden a esa versión y catálogo
+        
+        Args:
+            version: Versión de la base cargada (época del diario de la instantánea)
+            catalogo: CatalogoEjercicios en uso (los ejercicios que solo
+                conocen los índices se registran como no seleccionables)
+        
+        Returns:
+            dict: {estructura: {nombre: array mapeado}}, o None si no hay
+                índices válidos
+        """
+        if version is None:
+            return None
+        try:
+            with open(self.ruta_manifiesto, 'r', encoding='utf-8') as f:
+                manifiesto = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if manifiesto.get('formato') != self.FORMATO or manifiesto.get('version') != version:
+            return None
+        ejercicios = manifiesto.get('ejercicios', [])
+        if not self._catalogo_compatible(ejercicios, catalogo):
+            return None
+        
+        try:
+            indices = {
+                estructura: {
+                    nombre: np.load(os.path.join(self.directorio, archivo), mmap_mode='c')
+                    for nombre, archivo in arrays.items()
+                }
+                for estructura, arrays in manifiesto['arrays'].items()
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+        
+        # Solo con los índices aceptados se toca el catálogo en uso
+        for grupo, nombre in ejercicios[len(catalogo):]:
+            catalogo.id_o_registrar(grupo, nombre)
+        return indices
+    
+    @staticmethod
+    def _catalogo_compatible(ejercicios, catalogo):
+        """
+        Los IDs de los índices siguen significando lo mismo en el catálogo
+        (sin modificarlo: los que faltan al final se registran al aceptarlos)
+        """
+        nuevos = set()
+        for i, (grupo, nombre) in enumerate(ejercicios):
+            if i < len(catalogo):
+                if catalogo.id_de(grupo, nombre) != i:
+                    return False
+            elif catalogo.id_de(grupo, nombre) is not None or (grupo, nombre) in nuevos:
+                return False
+            else:
+                nuevos.add((grupo, nombre))
+        return True
+    
+    def guardar(self, version, catalogo, **estructuras):
+        """
+        Escribe los índices de una versión (se llama con el bloqueo de la base tomado)
+        
+        Args:
+            version: Versión de la base de la que salen
+            catalogo: CatalogoEjercicios con el que se indexaron
+            **estructuras: {estructura: {nombre: array}}
+        
+        Returns:
+            bool: False si no se pudieron escribir (quedan obsoletos y se
+                reconstruirán en la próxima carga)
+        """
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            archivos = {}
+            for estructura, arrays in estructuras.items():
+                archivos[estructura] = {}
+                for nombre, array in arrays.items():
+                    # Archivos nuevos por versión: nunca se sobrescribe uno que
+                    # otro proceso (o este mismo) pueda tener mapeado
+                    archivo = f"{estructura}.{nombre}.{version}.npy"
+                    with open(os.path.join(self.directorio, archivo), 'wb') as f:
+                        np.save(f, np.ascontiguousarray(array))
+                    archivos[estructura][nombre] = archivo
+            
+            escribir_json_atomico(self.ruta_manifiesto, {
+                'formato': self.FORMATO,
+                'version': version,
+                'ejercicios': [[catalogo.grupo(i), catalogo.nombre(i)] for i in range(len(catalogo))],
+                'arrays': archivos
+            }, ensure_ascii=False)
+        except OSError:
+            return False
+        
+        self._borrar_antiguos({a for arrays in archivos.values() for a in arrays.values()})
+        return True
+    
+    def _borrar_antiguos(self, vigentes):
+        """Borra los arrays de versiones anteriores (los que sigan mapeados en Windows se dejan)"""
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith('.npy') and nombre not in vigentes:
+                try:
+                    os.remove(os.path.join(self.directorio, nombre))
+                except OSError:
+                    pass
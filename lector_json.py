@@ -0,0 +1,249 @@
+import argparse
+import io
+import json
+import re
+
+from codec_conocimiento import CLAVE_DICCIONARIO, DiccionarioCadenas, abrir_lectura
+
+
+_ESPACIOS = re.compile(r'[ \t\r\n]*')
+_SIGNIFICATIVO = re.compile(r'["\[\]{}]')
+_FIN_CADENA = re.compile(r'["\\]')
+_FIN_ESCALAR = re.compile(r'[ \t\r\n,\]}]')
+
+
+class LectorJSON:
+    """
+    Lectura incremental de un JSON desde un archivo de texto.
+    
+    Solo mantiene en memoria un bloque del archivo y el valor que se esté
+    decodificando: los objetos se recorren clave a clave, las listas
+    elemento a elemento, y los valores que no interesan se saltan
+    contando corchetes (sin construirlos). Así se pueden recorrer bases de
+    conocimiento de varios GB con memoria constante, siempre que cada
+    elemento suelto (una rutina, una experiencia) quepa en memoria.
+    
+    Si el archivo empieza por un diccionario de cadenas (ver
+    codec_conocimiento), las claves y valores se entregan ya decodificados.
+    """
+    
+    def __init__(self, archivo, tam_bloque=1 << 16):
+        self.archivo = archivo
+        self.tam_bloque = tam_bloque
+        self.buf = ''
+        self.pos = 0
+        self.fin = False
+        self.diccionario = None
+        self._decoder = json.JSONDecoder()
+    
+    def usar_diccionario(self, diccionario):
+        """Decodifica con este DiccionarioCadenas todo lo que se lea a partir de ahora"""
+        self.diccionario = diccionario
+        self._decoder = json.JSONDecoder(object_pairs_hook=diccionario.objeto)
+    
+    def _llenar(self):
+        """Lee otro bloque (al menos tan grande como lo pendiente, para no releer de más)"""
+        bloque = self.archivo.read(max(self.tam_bloque, len(self.buf) - self.pos))
+        if not bloque:
+            self.fin = True
+            return False
+        self.buf = self.buf[self.pos:] + bloque
+        self.pos = 0
+        return True
+    
+    def _caracter(self):
+        """Siguiente carácter que no es espacio (sin consumirlo)"""
+        while True:
+            self.pos = _ESPACIOS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._llenar():
+                raise ValueError("JSON incompleto")
+    
+    def _consumir(self, esperado):
+        encontrado = self._caracter()
+        if encontrado not in esperado:
+            raise ValueError(f"Se esperaba {esperado!r} y se encontró {encontrado!r}")
+        self.pos += 1
+        return encontrado
+    
+    def valor(self):
+        """Decodifica el siguiente valor completo"""
+        if self._caracter() not in '"[{':
+            # Número o literal: un '12' al final del bloque puede ser '12.5'
+            while _FIN_ESCALAR.search(self.buf, self.pos) is None and self._llenar():
+                pass
+        while True:
+            try:
+                valor, self.pos = self._decoder.raw_decode(self.buf, self.pos)
+                break
+            except json.JSONDecodeError:
+                # Cadena, lista u objeto cortados: hace falta más bloque
+                if not self._llenar():
+                    raise
+        if self.diccionario is not None:
+            valor = self.diccionario.completar(valor)
+        return valor
+    
+    def saltar(self):
+        """Salta el siguiente valor sin construirlo"""
+        if self._caracter() not in '[{':
+            self.valor()
+            return
+        
+        profundidad = 0
+        en_cadena = False
+        while True:
+            m = (_FIN_CADENA if en_cadena else _SIGNIFICATIVO).search(self.buf, self.pos)
+            if m is None:
+                self.pos = len(self.buf)
+                if not self._llenar():
+                    raise ValueError("JSON incompleto")
+                continue
+            
+            self.pos = m.end()
+            c = m.group()
+            if en_cadena:
+                if c == '\\':
+                    # El carácter escapado puede estar en el bloque siguiente
+                    if self.pos >= len(self.buf) and not self._llenar():
+                        raise ValueError("JSON incompleto")
+                    self.pos += 1
+                else:
+                    en_cadena = False
+            elif c == '"':
+                en_cadena = True
+            elif c in '[{':
+                profundidad += 1
+            else:
+                profundidad -= 1
+                if profundidad == 0:
+                    return
+    
+    def claves(self):
+        """
+        Recorre un objeto: entrega cada clave y quien llama debe consumir
+        (valor, saltar, lista...) su valor antes de pedir la siguiente
+        """
+        self._consumir('{')
+        if self._caracter() == '}':
+            self.pos += 1
+            return
+        while True:
+            clave = self.valor()
+            self._consumir(':')
+            yield clave
+            if self._consumir(',}') == '}':
+                return
+    
+    def elementos(self):
+        """Recorre una lista decodificando un elemento cada vez"""
+        self._consumir('[')
+        if self._caracter() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.valor()
+            if self._consumir(',]') == ']':
+                return
+
+
+def coincide_camino(camino, patron):
+    """El camino encaja con el patrón ('*' vale por cualquier clave)"""
+    return len(camino) == len(patron) and all(p == '*' or p == c for c, p in zip(camino, patron))
+
+
+def _es_prefijo(camino, patron):
+    return len(camino) < len(patron) and all(p == '*' or p == c for c, p in zip(camino, patron))
+
+
+def _recorrer(lector, camino, flujos, omitir, completos):
+    for clave in lector.claves():
+        if not camino and clave == CLAVE_DICCIONARIO:
+            lector.usar_diccionario(DiccionarioCadenas(lector.valor()))
+            continue
+        sub = camino + (clave,)
+        if any(coincide_camino(sub, p) for p in omitir):
+            lector.saltar()
+        elif any(coincide_camino(sub, p) for p in flujos):
+            if lector._caracter() == '[':
+                for elemento in lector.elementos():
+                    yield sub, elemento
+            else:
+                lector.saltar()  # null u otro valor donde se esperaba una lista
+        elif any(_es_prefijo(sub, p) for p in flujos) and lector._caracter() == '{':
+            yield from _recorrer(lector, sub, flujos, omitir, completos)
+        elif completos:
+            yield sub, lector.valor()
+        else:
+            lector.saltar()
+
+
+def recorrer_json(archivo, flujos, omitir=(), completos=True, tam_bloque=1 << 16):
+    """
+    Recorre un objeto JSON grande sin cargarlo entero
+    
+    Args:
+        archivo: Ruta (plano o comprimido) o archivo de texto abierto
+        flujos: Caminos (tuplas de claves) de listas cuyos elementos se
+            entregan uno a uno; '*' en un camino vale por cualquier clave,
+            p. ej. ('learning_system', 'patrones_exitosos', '*')
+        omitir: Caminos cuyo valor se salta sin decodificarlo
+        completos: Entregar también, enteros, los demás valores de los
+            objetos que se recorren (si no, se saltan)
+    
+    Yields:
+        tuple: (camino, valor): un elemento de un flujo (con el camino de
+            su lista) o un valor completo (con su propio camino)
+    """
+    if isinstance(archivo, str):
+        with abrir_lectura(archivo) as f:
+            yield from recorrer_json(f, flujos, omitir, completos, tam_bloque)
+        return
+    yield from _recorrer(LectorJSON(archivo, tam_bloque), (), tuple(flujos), tuple(omitir), completos)
+
+
+def cargar_json(ruta):
+    """Lee entera una base de conocimiento en cualquiera de sus formatos (plano, comprimido, con diccionario)"""
+    with abrir_lectura(ruta) as f:
+        texto = f.read()
+    # Un solo bloque: cada valor se decodifica de una vez, como con json.load
+    lector = LectorJSON(io.StringIO(texto), tam_bloque=max(len(texto), 1))
+    return {camino[0]: valor for camino, valor in _recorrer(lector, (), (), (), True)}
+
+
+def iterar_historico(archivo):
+    """Experiencias de historico_usuarios de un archivo de datos, una a una"""
+    for _, experiencia in recorrer_json(archivo, [('learning_system', 'historico_usuarios')],
+                                        completos=False):
+        yield experiencia
+
+
+def iterar_rutinas(archivo):
+    """Registros de rutinas_generadas de un archivo de datos, uno a uno"""
+    for _, rutina in recorrer_json(archivo, [('learning_system', 'rutinas_generadas')],
+                                   completos=False):
+        yield rutina
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen de un archivo de conocimiento (lectura en flujo)")
+    parser.add_argument('archivo', help="Archivo JSON de conocimiento")
+    args = parser.parse_args()
+    
+    rutinas = feedback = suma = 0
+    for camino, registro in recorrer_json(args.archivo, [('learning_system', 'rutinas_generadas'),
+                                                         ('learning_system', 'historico_usuarios')],
+                                          completos=False):
+        if camino[-1] == 'rutinas_generadas':
+            rutinas += 1
+        else:
+            feedback += 1
+            suma += registro.get('satisfaccion', 0)
+    
+    print(f"Rutinas generadas: {rutinas}")
+    print(f"Feedback: {feedback}" + (f" | Satisfacción promedio: {suma / feedback:.2f}/5" if feedback else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,79 @@
 
-import json
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from datetime import datetime
 import math
 
+from lector_json import cargar_json
+from registro_eventos import RegistroEventos
+from rutina_compacta import CacheRutinasCompactas, concatenar_filas
+
 
 class MotorInferencia:
-    def __init__(self, base_conocimientos=None):
+    def __init__(self, base_conocimientos=None, eventos=None,
+                 tamano_cache_parametros=256, banda_edad=5, banda_imc=2.0,
+                 estadisticas_ejercicios=None, rutinas_compactas=None, columnas_perfiles=None):
    
         self.base_conocimientos = base_conocimientos or {}
+        self.eventos = eventos or RegistroEventos()
+        
+        # Satisfacción atribuida por ejercicio (EstadisticasEjercicios, opcional)
+        self.estadisticas_ejercicios = estadisticas_ejercicios
+        
+        # Rutinas del histórico ya convertidas a arrays (se parsean una vez)
+        self.rutinas_compactas = rutinas_compactas or CacheRutinasCompactas()
+        
+        # Perfiles del histórico en columnas (ColumnasPerfiles, opcional)
+        self.columnas_perfiles = columnas_perfiles
         self.modelos_entrenados = {}
         self.reglas_inferencia = self._inicializar_reglas()
         self.umbrales = self._inicializar_umbrales()
         
+        # Versión de la base de conocimientos (cambia al reemplazarla completa)
+        self.version_base = 0
+        
+        # Memo LRU de inferir_parametros_optimos por perfil cuantizado
+        self.tamano_cache_parametros = tamano_cache_parametros
+        self.banda_edad = banda_edad
+        self.banda_imc = banda_imc
+        self._cache_parametros = OrderedDict()
+        self.aciertos_cache = 0
+        self.fallos_cache = 0
+        
+    def actualizar_base_conocimientos(self, base_conocimientos):
+        """Reemplaza la base de conocimientos completa e invalida las cachés"""
+        self.base_conocimientos = base_conocimientos or {}
+        self.version_base += 1
+        self._cache_parametros.clear()
+    
+    def registrar_experiencia(self, experiencia):
+        """
+        Avisa al motor de una nueva experiencia añadida al histórico
+        
+        Invalida solo las entradas de la caché de parámetros cuyo bucket
+        contiene algún perfil para el que la nueva experiencia puede ser
+        vecina (similitud >= 0.75, el umbral de inferir_parametros_optimos).
+        """
+        perfil = experiencia.get('perfil', {})
+        invalidas = [
+            clave for clave in self._cache_parametros
+            if self._similitud_maxima_bucket(perfil, clave) >= 0.75 - 1e-9
+        ]
+        for clave in invalidas:
+            del self._cache_parametros[clave]
+    
+    def estadisticas_cache(self):
+        """Aciertos, fallos y tamaño de la caché de parámetros"""
+        total = self.aciertos_cache + self.fallos_cache
+        return {
+            'aciertos': self.aciertos_cache,
+            'fallos': self.fallos_cache,
+            'tasa_aciertos': self.aciertos_cache / total if total else 0.0,
+            'entradas': len(self._cache_parametros),
+            'tamano_maximo': self.tamano_cache_parametros
+        }
+    
+        
     def _inicializar_reglas(self):
         return {
             # Reglas para predecir satisfacción
@@ -74,7 +134,7 @@ class MotorInferencia:
                 'recomendacion': bool (si se recomienda usar esta rutina)
             }
         """
-        print("\n🔮 Iniciando predicción de satisfacción...")
+        self.eventos.debug('prediccion.inicio', "\n🔮 Iniciando predicción de satisfacción...")
         
         # Obtener usuarios similares del histórico
         usuarios_similares = self._buscar_usuarios_similares(perfil)
@@ -123,19 +183,34 @@ class MotorInferencia:
             'metodo': 'bayesiano'
         }
         
-        print(f"   ✓ Satisfacción predicha: {resultado['satisfaccion_predicha']}/5")
-        print(f"   ✓ Confianza: {resultado['confianza']*100:.0f}%")
-        print(f"   ✓ Recomendación: {'SÍ' if recomendacion else 'NO'}")
+        self.eventos.info(
+            'prediccion.resultado',
+            "   ✓ Satisfacción predicha: {satisfaccion_predicha}/5\n"
+            "   ✓ Confianza: {confianza:.0%}\n"
+            "   ✓ Recomendación: {recomendacion!b}",
+            satisfaccion_predicha=resultado['satisfaccion_predicha'],
+            confianza=resultado['confianza'],
+            recomendacion=recomendacion,
+            usuarios_similares=resultado['usuarios_similares']
+        )
         
         return resultado
     
     def _buscar_usuarios_similares(self, perfil, umbral=0.7):
         """Busca usuarios similares en el histórico"""
-        if not self.base_conocimientos.get('historico_usuarios'):
+        historico = self.base_conocimientos.get('historico_usuarios')
+        if not historico:
             return []
         
+        if self.columnas_perfiles is not None and self.columnas_perfiles.cubre(historico):
+            similitudes = self.columnas_perfiles.similitudes(perfil)
+            indices = np.flatnonzero(similitudes >= umbral)
+            orden = np.lexsort((indices, -similitudes[indices]))
+            return [{'usuario': historico[i], 'similitud': float(similitudes[i])}
+                    for i in indices[orden[:10]]]
+        
         similares = []
-        for usuario in self.base_conocimientos['historico_usuarios']:
+        for usuario in historico:
             similitud = self._calcular_similitud(perfil, usuario['perfil'])
             if similitud >= umbral:
                 similares.append({
@@ -326,13 +401,76 @@ class MotorInferencia:
         """
         Infiere los parámetros óptimos (series, reps, descanso) para un perfil
         
+        Los resultados se memorizan por perfil cuantizado (banda de edad,
+        banda de IMC, nivel, objetivo, días) y versión de la base.
+        
         Args:
             perfil: Perfil del usuario
             
         Returns:
             dict: Parámetros óptimos inferidos con nivel de confianza
         """
-        print("\n🎯 Infiriendo parámetros óptimos...")
+        clave = self._clave_cache_parametros(perfil)
+        
+        if clave in self._cache_parametros:
+            self._cache_parametros.move_to_end(clave)
+            self.aciertos_cache += 1
+            self.eventos.debug('parametros.cache', acierto=True)
+            return dict(self._cache_parametros[clave])
+        
+        self.fallos_cache += 1
+        resultado = self._inferir_parametros_optimos(perfil)
+        
+        if self.tamano_cache_parametros > 0:
+            self._cache_parametros[clave] = dict(resultado)
+            while len(self._cache_parametros) > self.tamano_cache_parametros:
+                self._cache_parametros.popitem(last=False)
+        
+        return resultado
+    
+    def _clave_cache_parametros(self, perfil):
+        """Perfil cuantizado + versión de la base"""
+        return (
+            self.version_base,
+            int(perfil.get('edad', 30) // self.banda_edad),
+            int(perfil.get('imc', 22) // self.banda_imc),
+            perfil.get('nivel_num', 2),
+            perfil.get('objetivo_str', ''),
+            perfil.get('dias', 4)
+        )
+    
+    def _similitud_maxima_bucket(self, perfil, clave):
+        """
+        Mayor similitud posible entre un perfil y cualquier perfil del bucket
+        (misma métrica que _calcular_similitud, con la distancia mínima a
+        los rangos de edad e IMC del bucket)
+        """
+        _, banda_edad, banda_imc, nivel, objetivo, dias = clave
+        
+        def distancia_rango(valor, banda, ancho):
+            inferior = banda * ancho
+            superior = inferior + ancho
+            return max(0, inferior - valor, valor - superior)
+        
+        diff_edad = distancia_rango(perfil.get('edad', 30), banda_edad, self.banda_edad) / 100
+        diff_imc = distancia_rango(perfil.get('imc', 22), banda_imc, self.banda_imc) / 20
+        diff_nivel = abs(perfil.get('nivel_num', 2) - nivel) / 3
+        diff_obj = 0 if perfil.get('objetivo_str', '') == objetivo else 1
+        diff_dias = abs(perfil.get('dias', 4) - dias) / 7
+        
+        distancia = math.sqrt(
+            diff_edad**2 + 
+            diff_imc**2 + 
+            diff_nivel**2 + 
+            diff_obj**2 + 
+            diff_dias**2
+        )
+        
+        return 1 / (1 + distancia)
+    
+    def _inferir_parametros_optimos(self, perfil):
+        """Inferencia de parámetros sin caché (ver inferir_parametros_optimos)"""
+        self.eventos.debug('parametros.inicio', "\n🎯 Infiriendo parámetros óptimos...")
         
         # Buscar usuarios similares exitosos
         usuarios_similares = self._buscar_usuarios_similares(perfil, umbral=0.75)
@@ -345,37 +483,25 @@ class MotorInferencia:
             # Sin datos, usar heurísticas por objetivo
             return self._parametros_por_heuristica(perfil)
         
-        # Extraer parámetros de rutinas exitosas
-        series_list = []
-        reps_list = []
-        descansos_list = []
+        # Extraer parámetros de rutinas exitosas (columnas de las rutinas compactas)
+        compactas = [self.rutinas_compactas.de_experiencia(u['usuario']) for u in usuarios_exitosos]
+        filas, _ = concatenar_filas([r for r in compactas if r is not None])
+        fuerza = filas[filas['intensidad'] == 0]
         
-        for usuario_data in usuarios_exitosos:
-            rutina = usuario_data['usuario'].get('rutina_exitosa', {})
-            if 'rutina_semanal' in rutina:
-                for dia, ejercicios in rutina['rutina_semanal'].items():
-                    for ej in ejercicios:
-                        if 'series' in ej:
-                            series_list.append(ej['series'])
-                        if 'repeticiones' in ej:
-                            # Extraer el promedio del rango (ej: "8-12" -> 10)
-                            reps_str = str(ej['repeticiones'])
-                            if '-' in reps_str:
-                                reps_range = reps_str.split('-')
-                                try:
-                                    reps_avg = (int(reps_range[0]) + int(reps_range[1])) / 2
-                                    reps_list.append(reps_avg)
-                                except:
-                                    pass
+        series = fuerza['series'][fuerza['series'] > 0]
+        # Solo repeticiones dadas como rango: una cifra suelta ("12") no cuenta
+        con_reps = fuerza[fuerza['reps_rango']]
+        # Promedio del rango (ej: "8-12" -> 10)
+        reps = (con_reps['reps_min'].astype(float) + con_reps['reps_max']) / 2
         
         # Calcular valores óptimos
-        if series_list:
-            series_optimo = int(round(np.median(series_list)))
+        if len(series):
+            series_optimo = int(round(np.median(series)))
         else:
             series_optimo = 4
         
-        if reps_list:
-            reps_optimo = int(round(np.median(reps_list)))
+        if len(reps):
+            reps_optimo = int(round(np.median(reps)))
         else:
             reps_optimo = 10
         
@@ -392,10 +518,14 @@ class MotorInferencia:
             'metodo': 'inferencia_datos'
         }
         
-        print(f"   ✓ Series: {resultado['series']}")
-        print(f"   ✓ Reps: {resultado['repeticiones_min']}-{resultado['repeticiones_max']}")
-        print(f"   ✓ Descanso: {resultado['descanso']}")
-        print(f"   ✓ Confianza: {resultado['confianza']*100:.0f}%")
+        self.eventos.info(
+            'parametros.inferidos',
+            "   ✓ Series: {series}\n"
+            "   ✓ Reps: {repeticiones_min}-{repeticiones_max}\n"
+            "   ✓ Descanso: {descanso}\n"
+            "   ✓ Confianza: {confianza:.0%}",
+            **resultado
+        )
         
         return resultado
     
@@ -458,7 +588,7 @@ class MotorInferencia:
         Returns:
             dict: Clasificación y características
         """
-        print("\n👤 Clasificando usuario...")
+        self.eventos.debug('clasificacion.inicio', "\n👤 Clasificando usuario...")
         
         # Contar experiencias del usuario
         num_experiencias = len(historico_personal) if historico_personal else 0
@@ -515,10 +645,17 @@ class MotorInferencia:
             )
         }
         
-        print(f"   ✓ Categoría: {categoria.upper()}")
-        print(f"   ✓ Experiencias: {num_experiencias}")
-        print(f"   ✓ Satisfacción promedio: {satisfaccion_promedio:.2f}/5")
-        print(f"   ✓ Rendimiento: {rendimiento}")
+        self.eventos.info(
+            'clasificacion.resultado',
+            "   ✓ Categoría: {categoria!u}\n"
+            "   ✓ Experiencias: {experiencias}\n"
+            "   ✓ Satisfacción promedio: {satisfaccion_promedio:.2f}/5\n"
+            "   ✓ Rendimiento: {rendimiento}",
+            categoria=categoria,
+            experiencias=num_experiencias,
+            satisfaccion_promedio=satisfaccion_promedio,
+            rendimiento=rendimiento
+        )
         
         return resultado
     
@@ -567,15 +704,17 @@ class MotorInferencia:
         Returns:
             dict: Mejor rutina recomendada con scoring
         """
-        print("\n⭐ Recomendando rutina óptima...")
+        self.eventos.debug('recomendacion.inicio', "\n⭐ Recomendando rutina óptima...",
+                           opciones=len(opciones_rutinas) if opciones_rutinas else 0)
         
         if not opciones_rutinas:
             return None
         
-        # Evaluar cada opción
+        # Evaluar todas las opciones en lote (una sola búsqueda de vecinos)
+        scores = self._evaluar_rutinas_lote(perfil, opciones_rutinas)
+        
         evaluaciones = []
-        for idx, rutina in enumerate(opciones_rutinas):
-            score = self._evaluar_rutina(perfil, rutina)
+        for idx, (rutina, score) in enumerate(zip(opciones_rutinas, scores)):
             evaluaciones.append({
                 'indice': idx,
                 'rutina': rutina,
@@ -588,8 +727,13 @@ class MotorInferencia:
         
         mejor = evaluaciones[0]
         
-        print(f"   ✓ Mejor opción: Rutina #{mejor['indice']+1}")
-        print(f"   ✓ Score: {mejor['score']:.2f}/100")
+        self.eventos.info(
+            'recomendacion.resultado',
+            "   ✓ Mejor opción: Rutina #{opcion}\n"
+            "   ✓ Score: {score:.2f}/100",
+            opcion=mejor['indice'] + 1,
+            score=mejor['score']
+        )
         
         return {
             'rutina_recomendada': mejor['rutina'],
@@ -600,52 +744,146 @@ class MotorInferencia:
     
     def _evaluar_rutina(self, perfil, rutina):
         """Evalúa una rutina y le asigna un score (0-100)"""
-        scores = {}
+        return self._evaluar_rutinas_lote(perfil, [rutina])[0]
+    
+    def _evaluar_rutinas_lote(self, perfil, rutinas):
+        """
+        Evalúa varias rutinas a la vez y les asigna un score (0-100)
+        
+        Da el mismo resultado que evaluar cada rutina por separado, pero la
+        búsqueda de usuarios similares se hace una sola vez para el perfil y
+        las características de las rutinas se puntúan juntas como arrays.
+        
+        Args:
+            perfil: Perfil del usuario
+            rutinas: Lista de rutinas a evaluar
+        
+        Returns:
+            list: Un dict {'score_total', 'scores_detallados'} por rutina
+        """
+        if not rutinas:
+            return []
+        
+        num_ejercicios, variedad, validas = self._extraer_caracteristicas_rutinas(rutinas)
+        complejidad = num_ejercicios / perfil.get('dias', 4)
         
         # Criterio 1: Predicción de satisfacción (40 puntos)
-        prediccion = self.predecir_satisfaccion(perfil, rutina)
-        scores['satisfaccion'] = (prediccion['satisfaccion_predicha'] / 5) * 40
+        satisfaccion_predicha = self._predecir_satisfaccion_lote(perfil, complejidad, validas)
+        
+        # Mezclar con la satisfacción atribuida a los ejercicios de cada rutina
+        # (el peso crece con la evidencia; sin datos la predicción no cambia)
+        if self.estadisticas_ejercicios is not None:
+            esperada, peso = self.estadisticas_ejercicios.esperada_rutinas(rutinas)
+            satisfaccion_predicha = np.where(
+                validas, (1 - peso) * satisfaccion_predicha + peso * esperada, satisfaccion_predicha
+            )
+        scores_satisfaccion = (satisfaccion_predicha / 5) * 40
         
         # Criterio 2: Adecuación al nivel (20 puntos)
         nivel = perfil.get('nivel_num', 2)
-        if rutina and 'rutina_semanal' in rutina:
-            num_ejercicios = sum(len(ejs) for ejs in rutina['rutina_semanal'].values())
-            complejidad = num_ejercicios / perfil.get('dias', 4)
-            
-            if nivel == 1:  # Principiante: 3-4 ejercicios/día
-                scores['nivel'] = 20 if 3 <= complejidad <= 4 else 10
-            elif nivel == 2:  # Intermedio: 4-5 ejercicios/día
-                scores['nivel'] = 20 if 4 <= complejidad <= 5 else 15
-            else:  # Avanzado: 5-7 ejercicios/día
-                scores['nivel'] = 20 if 5 <= complejidad <= 7 else 15
-        else:
-            scores['nivel'] = 10
+        if nivel == 1:  # Principiante: 3-4 ejercicios/día
+            en_rango, fuera_rango = (complejidad >= 3) & (complejidad <= 4), 10
+        elif nivel == 2:  # Intermedio: 4-5 ejercicios/día
+            en_rango, fuera_rango = (complejidad >= 4) & (complejidad <= 5), 15
+        else:  # Avanzado: 5-7 ejercicios/día
+            en_rango, fuera_rango = (complejidad >= 5) & (complejidad <= 7), 15
+        scores_nivel = np.where(validas, np.where(en_rango, 20, fuera_rango), 10)
         
         # Criterio 3: Consistencia con objetivo (20 puntos)
-        objetivo = perfil.get('objetivo_str', 'ganar_masa')
         # (Aquí se podría analizar si los ejercicios son apropiados)
-        scores['objetivo'] = 20  # Simplificado
+        score_objetivo = 20  # Simplificado
         
         # Criterio 4: Variedad y balance (20 puntos)
-        if rutina and 'rutina_semanal' in rutina:
-            grupos_trabajados = set()
-            for ejercicios in rutina['rutina_semanal'].values():
-                for ej in ejercicios:
-                    if 'grupo' in ej:
-                        grupos_trabajados.add(ej['grupo'])
-            
-            variedad = len(grupos_trabajados)
-            scores['variedad'] = min(20, variedad * 4)
+        scores_variedad = np.where(validas, np.minimum(20, variedad * 4), 10)
+        
+        # Score total (mismo orden de suma que el detalle)
+        scores_totales = scores_satisfaccion + scores_nivel + score_objetivo + scores_variedad
+        
+        resultados = []
+        for i in range(len(rutinas)):
+            resultados.append({
+                'score_total': round(float(scores_totales[i]), 2),
+                'scores_detallados': {
+                    'satisfaccion': float(scores_satisfaccion[i]),
+                    'nivel': int(scores_nivel[i]),
+                    'objetivo': score_objetivo,
+                    'variedad': int(scores_variedad[i])
+                }
+            })
+        
+        return resultados
+    
+    def _extraer_caracteristicas_rutinas(self, rutinas):
+        """
+        Extrae en arrays las características de varias rutinas
+        
+        Returns:
+            tuple: (num_ejercicios, grupos distintos, máscara de rutinas válidas)
+        """
+        num_ejercicios = np.zeros(len(rutinas))
+        variedad = np.zeros(len(rutinas), dtype=int)
+        validas = np.zeros(len(rutinas), dtype=bool)
+        
+        for i, rutina in enumerate(rutinas):
+            if rutina and 'rutina_semanal' in rutina:
+                validas[i] = True
+                grupos_trabajados = set()
+                for ejercicios in rutina['rutina_semanal'].values():
+                    num_ejercicios[i] += len(ejercicios)
+                    for ej in ejercicios:
+                        if 'grupo' in ej:
+                            grupos_trabajados.add(ej['grupo'])
+                variedad[i] = len(grupos_trabajados)
+        
+        return num_ejercicios, variedad, validas
+    
+    def _predecir_satisfaccion_lote(self, perfil, complejidad, validas):
+        """
+        Versión vectorizada de predecir_satisfaccion para varias rutinas
+        
+        Solo el ajuste por complejidad depende de la rutina; el resto de
+        factores sale de una única búsqueda de usuarios similares.
+        """
+        usuarios_similares = self._buscar_usuarios_similares(perfil)
+        
+        if not usuarios_similares:
+            return np.full(len(complejidad), 3.5)
+        
+        factores = self._analizar_factores_satisfaccion(perfil, None, usuarios_similares)
+        
+        # Ajuste de complejidad por rutina (ver _analizar_factores_satisfaccion)
+        nivel = perfil.get('nivel_num', 2)
+        ideal = 4 if nivel == 1 else 5 if nivel == 2 else 6
+        ajuste_complejidad = np.where(validas, 1 - np.abs(complejidad - ideal) / ideal, 1.0)
+        
+        # Mismos ajustes y orden que _calcular_prediccion_bayesiana
+        satisfacciones = [u['usuario'].get('satisfaccion', 3) for u in usuarios_similares]
+        prior = sum(satisfacciones) / len(satisfacciones)
+        
+        if factores['similitud_promedio'] > self.umbrales['similitud_alta']:
+            ajuste_total = 0.3
+        elif factores['similitud_promedio'] > self.umbrales['similitud_media']:
+            ajuste_total = 0.1
         else:
-            scores['variedad'] = 10
+            ajuste_total = -0.1
         
-        # Score total
-        score_total = sum(scores.values())
+        if factores['cantidad_similares'] >= 5:
+            ajuste_total += 0.2
+        elif factores['cantidad_similares'] >= 3:
+            ajuste_total += 0.1
         
-        return {
-            'score_total': round(score_total, 2),
-            'scores_detallados': scores
-        }
+        ajuste_total = ajuste_total + np.where(
+            ajuste_complejidad > 0.8, 0.2,
+            np.where(ajuste_complejidad > 0.6, 0.0, -0.2)
+        )
+        
+        if factores['patron_existe'] and factores['cantidad_patrones'] >= 5:
+            ajuste_total = ajuste_total + 0.3
+        
+        posterior = np.clip(prior + ajuste_total, 1.0, 5.0)
+        
+        # Redondeo idéntico al de predecir_satisfaccion
+        return np.array([round(float(p), 2) for p in posterior])
     
     def _generar_justificacion(self, detalles):
         """Genera justificación textual de la recomendación"""
@@ -729,7 +967,7 @@ class MotorInferencia:
         Returns:
             dict: Reporte completo
         """
-        print("\n📋 Generando reporte de inferencias...")
+        self.eventos.debug('reporte.inicio', "\n📋 Generando reporte de inferencias...")
         
         reporte = {
             'perfil': perfil,
@@ -744,7 +982,7 @@ class MotorInferencia:
             }
         }
         
-        print("   ✓ Reporte generado exitosamente")
+        self.eventos.info('reporte.generado', "   ✓ Reporte generado exitosamente")
         
         return reporte
 
@@ -756,8 +994,7 @@ class MotorInferencia:
 def cargar_motor_inferencia(archivo_datos='gym_ai_advanced_data.json'):
     """Carga el motor de inferencia con datos existentes"""
     try:
-        with open(archivo_datos, 'r', encoding='utf-8') as f:
-            base_conocimientos = json.load(f)
+        base_conocimientos = cargar_json(archivo_datos)
         print(f"✓ Base de conocimientos cargada desde {archivo_datos}")
     except FileNotFoundError:
         base_conocimientos = {}
@@ -772,8 +1009,8 @@ def ejemplo_uso():
     print("EJEMPLO DE USO DEL MOTOR DE INFERENCIA")
     print("="*70)
     
-    # Crear motor
-    motor = MotorInferencia()
+    # Crear motor (con eventos visibles en consola)
+    motor = MotorInferencia(eventos=RegistroEventos(activo=True, nivel='DEBUG', consola=True))
     
     # Perfil de ejemplo
     perfil_ejemplo = {
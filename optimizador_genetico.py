@@ -0,0 +1,420 @@
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from motor_inferencia import MotorInferencia
+from atribucion_ejercicios import EstadisticasEjercicios
+
+
+# Motor de inferencia de cada proceso trabajador (ver _inicializar_proceso)
+_MOTOR_PROCESO = None
+
+
+def _inicializar_proceso(base_conocimientos, catalogo=None, estadisticas=None, fuerza_contraccion=None):
+    """
+    Crea una sola vez por proceso el motor con la base de conocimientos
+    
+    Con las estadísticas por ejercicio (arrays de a_arrays, indexados por
+    los IDs de 'catalogo') el motor del trabajador mezcla la satisfacción
+    atribuida igual que el del proceso principal, así el fitness no
+    depende del número de procesos.
+    """
+    global _MOTOR_PROCESO
+    estadisticas_ejercicios = None
+    if estadisticas is not None:
+        estadisticas_ejercicios = EstadisticasEjercicios.desde_arrays(
+            estadisticas, catalogo, fuerza_contraccion=fuerza_contraccion)
+    _MOTOR_PROCESO = MotorInferencia(base_conocimientos, estadisticas_ejercicios=estadisticas_ejercicios)
+
+
+def _evaluar_lote_proceso(perfil, rutinas):
+    """Puntúa un lote de rutinas dentro de un proceso trabajador"""
+    return [s['score_total'] for s in _MOTOR_PROCESO._evaluar_rutinas_lote(perfil, rutinas)]
+
+
+def _rango(texto, defecto):
+    """Extrae (min, max) de textos como '8-12', '60s' o '60-90s'"""
+    numeros = [int(n) for n in re.findall(r'\d+', str(texto))]
+    if not numeros:
+        return defecto
+    return numeros[0], numeros[-1]
+
+
+class OptimizadorGenetico:
+    """
+    Algoritmo genético que optimiza rutinas completas.
+    
+    Cada individuo se codifica como arrays sobre una plantilla de huecos
+    (día, grupo) común a toda la población:
+        ids       IDs del catálogo por hueco (-1 si vacío)
+        activo    Si el hueco se usa
+        params    series, reps mín/máx, descanso mín/máx (segundos)
+        cardio    ID de cardio por día (-1 si no hay) y sus minutos
+    
+    El cruce intercambia bloques (día, grupo) completos, así el hijo nunca
+    repite ejercicio dentro de un grupo de un día; la mutación cambia un
+    ejercicio por otro candidato del mismo grupo y nivel (respetando la
+    máscara de limitaciones), activa o desactiva huecos y perturba los
+    parámetros. El fitness es el score del motor de inferencia, evaluado
+    en lote y opcionalmente repartido en un pool de procesos.
+    """
+    
+    MAX_POR_GRUPO = 3
+    
+    # Límites de los parámetros: series, reps_min, reps_max, descanso_min, descanso_max
+    LIMITES_PARAMS = np.array([[2, 3, 4, 15, 15], [6, 30, 35, 240, 300]])
+    
+    def __init__(self, motor, catalogo, tamano_poblacion=24, generaciones=40,
+                 tiempo_max=None, paciencia=8, tolerancia=1e-3, elite=2,
+                 prob_cruce=0.8, prob_mutacion=0.15, procesos=0, rng=None):
+        """
+        Args:
+            motor: MotorInferencia que puntúa las rutinas
+            catalogo: CatalogoEjercicios con los candidatos por grupo y nivel
+            tamano_poblacion: Individuos por generación
+            generaciones: Máximo de generaciones (al menos 1: la población
+                inicial también se evalúa como una generación)
+            tiempo_max: Máximo de segundos (None = sin límite de tiempo)
+            paciencia: Generaciones sin mejora antes de parar
+            tolerancia: Mejora mínima del mejor fitness que cuenta como mejora
+            elite: Mejores individuos que pasan intactos a la siguiente generación
+            prob_cruce: Probabilidad de cruzar cada pareja
+            prob_mutacion: Probabilidad de mutar cada gen
+            procesos: Procesos para evaluar el fitness (0 = en este proceso)
+            rng: np.random.Generator (por defecto uno nuevo sin semilla)
+        """
+        if generaciones < 1:
+            raise ValueError(f"Se necesita al menos una generación: {generaciones!r}")
+        
+        self.motor = motor
+        self.catalogo = catalogo
+        self.tamano_poblacion = tamano_poblacion
+        self.generaciones = generaciones
+        self.tiempo_max = tiempo_max
+        self.paciencia = paciencia
+        self.tolerancia = tolerancia
+        self.elite = elite
+        self.prob_cruce = prob_cruce
+        self.prob_mutacion = prob_mutacion
+        self.procesos = procesos
+        self.rng = rng if rng is not None else np.random.default_rng()
+    
+    # ------------------------------------------------------------------
+    # Plantilla y codificación
+    # ------------------------------------------------------------------
+    
+    def _construir_plantilla(self, semillas, nivel, mascara):
+        """
+        Plantilla de huecos a partir de las rutinas semilla
+        
+        Cada bloque (día, grupo) tiene tantos huecos como el máximo usado por
+        las semillas, ampliado hasta MAX_POR_GRUPO si hay candidatos.
+        """
+        dias = []
+        conteos = {}  # (dia, grupo) -> máximo de ejercicios en las semillas
+        intensidades = {}
+        for rutina in semillas:
+            for dia, ejercicios in rutina.get('rutina_semanal', {}).items():
+                if dia not in dias:
+                    dias.append(dia)
+                por_grupo = {}
+                for ej in ejercicios:
+                    if ej.get('grupo') == 'cardio':
+                        intensidades.setdefault(dia, ej.get('intensidad', 'moderada'))
+                        continue
+                    por_grupo[ej.get('grupo')] = por_grupo.get(ej.get('grupo'), 0) + 1
+                for grupo, n in por_grupo.items():
+                    conteos[(dia, grupo)] = max(conteos.get((dia, grupo), 0), n)
+        
+        bloques = []
+        slot_bloque = []
+        for d, dia in enumerate(dias):
+            for (dia_b, grupo), n in conteos.items():
+                if dia_b != dia:
+                    continue
+                candidatos = self.catalogo.candidatos(grupo, nivel, mascara)
+                capacidad = max(n, min(self.MAX_POR_GRUPO, len(candidatos)))
+                bloques.append({
+                    'dia': d,
+                    'grupo': grupo,
+                    'candidatos': np.array(candidatos, dtype=np.int32),
+                    'huecos': list(range(len(slot_bloque), len(slot_bloque) + capacidad))
+                })
+                slot_bloque.extend([len(bloques) - 1] * capacidad)
+        
+        return {
+            'dias': dias,
+            'bloques': bloques,
+            'slot_bloque': np.array(slot_bloque, dtype=np.int32),
+            'cardios': np.array(self.catalogo.candidatos('cardio', nivel, mascara), dtype=np.int32),
+            'intensidades': [intensidades.get(dia, 'moderada') for dia in dias]
+        }
+    
+    def _codificar(self, rutina, plantilla, params_defecto):
+        """Convierte una rutina dict en los arrays de un individuo"""
+        num_huecos = len(plantilla['slot_bloque'])
+        num_dias = len(plantilla['dias'])
+        ids = np.full(num_huecos, -1, dtype=np.int32)
+        activo = np.zeros(num_huecos, dtype=bool)
+        params = np.tile(params_defecto, (num_huecos, 1))
+        cardio = np.full(num_dias, -1, dtype=np.int32)
+        cardio_min = np.full(num_dias, 20, dtype=np.int16)
+        
+        libres = {i: list(b['huecos']) for i, b in enumerate(plantilla['bloques'])}
+        indice_bloque = {(b['dia'], b['grupo']): i for i, b in enumerate(plantilla['bloques'])}
+        
+        for d, dia in enumerate(plantilla['dias']):
+            for ej in rutina.get('rutina_semanal', {}).get(dia, []):
+                grupo = ej.get('grupo')
+                ejercicio_id = self.catalogo.id_de(grupo, ej.get('ejercicio'))
+                if ejercicio_id is None:
+                    continue
+                
+                if grupo == 'cardio':
+                    cardio[d] = ejercicio_id
+                    cardio_min[d] = _rango(ej.get('duracion'), (20, 20))[0]
+                    continue
+                
+                huecos = libres.get(indice_bloque.get((d, grupo)), [])
+                if not huecos:
+                    continue
+                hueco = huecos.pop(0)
+                ids[hueco] = ejercicio_id
+                activo[hueco] = True
+                reps = _rango(ej.get('repeticiones'), (params_defecto[1], params_defecto[2]))
+                descanso = _rango(ej.get('descanso'), (params_defecto[3], params_defecto[4]))
+                params[hueco] = (ej.get('series', params_defecto[0]),) + reps + descanso
+        
+        return {
+            'ids': ids,
+            'activo': activo,
+            'params': np.clip(params, *self.LIMITES_PARAMS),
+            'cardio': cardio,
+            'cardio_min': cardio_min
+        }
+    
+    def _decodificar(self, individuo, plantilla, estructura):
+        """Convierte los arrays de un individuo en una rutina dict"""
+        rutina_semanal = {dia: [] for dia in plantilla['dias']}
+        for bloque in plantilla['bloques']:
+            dia = plantilla['dias'][bloque['dia']]
+            for hueco in bloque['huecos']:
+                if not individuo['activo'][hueco]:
+                    continue
+                series, reps_min, reps_max, desc_min, desc_max = (int(v) for v in individuo['params'][hueco])
+                rutina_semanal[dia].append({
+                    'ejercicio': self.catalogo.nombre(int(individuo['ids'][hueco])),
+                    'grupo': bloque['grupo'],
+                    'series': series,
+                    'repeticiones': f"{reps_min}-{reps_max}",
+                    'descanso': f"{desc_min}s" if desc_min == desc_max else f"{desc_min}-{desc_max}s"
+                })
+        
+        for d, dia in enumerate(plantilla['dias']):
+            if individuo['cardio'][d] >= 0:
+                rutina_semanal[dia].append({
+                    'ejercicio': self.catalogo.nombre(int(individuo['cardio'][d])),
+                    'grupo': 'cardio',
+                    'duracion': f"{int(individuo['cardio_min'][d])} min",
+                    'intensidad': plantilla['intensidades'][d]
+                })
+        
+        return {
+            'rutina_semanal': rutina_semanal,
+            'estructura': estructura,
+            'metadatos': {
+                'modo_generacion': 'genetico'
+            }
+        }
+    
+    # ------------------------------------------------------------------
+    # Operadores
+    # ------------------------------------------------------------------
+    
+    def _copiar(self, individuo):
+        return {k: v.copy() for k, v in individuo.items()}
+    
+    def _cruzar(self, padre, madre, plantilla):
+        """Cruce uniforme por bloques (día, grupo) y por día para el cardio"""
+        num_bloques = len(plantilla['bloques'])
+        de_madre = self.rng.random(num_bloques) < 0.5
+        huecos = de_madre[plantilla['slot_bloque']]
+        dias = self.rng.random(len(plantilla['dias'])) < 0.5
+        
+        hijo = self._copiar(padre)
+        hijo['ids'][huecos] = madre['ids'][huecos]
+        hijo['activo'][huecos] = madre['activo'][huecos]
+        hijo['params'][huecos] = madre['params'][huecos]
+        hijo['cardio'][dias] = madre['cardio'][dias]
+        hijo['cardio_min'][dias] = madre['cardio_min'][dias]
+        return hijo
+    
+    def _mutar(self, individuo, plantilla):
+        """Muta un individuo en el sitio"""
+        p = self.prob_mutacion
+        
+        for bloque in plantilla['bloques']:
+            huecos = bloque['huecos']
+            candidatos = bloque['candidatos']
+            if len(candidatos) == 0:
+                continue
+            
+            # Activar/desactivar un hueco (siempre queda al menos uno activo)
+            if self.rng.random() < p:
+                hueco = huecos[self.rng.integers(len(huecos))]
+                activos = int(individuo['activo'][huecos].sum())
+                if individuo['activo'][hueco] and activos > 1:
+                    individuo['activo'][hueco] = False
+                elif not individuo['activo'][hueco]:
+                    individuo['activo'][hueco] = True
+            
+            # Cambiar ejercicios por otros candidatos del mismo grupo y nivel
+            for hueco in huecos:
+                if individuo['ids'][hueco] >= 0 and self.rng.random() >= p:
+                    continue
+                usados = set(individuo['ids'][huecos].tolist())
+                libres = [c for c in candidatos.tolist() if c not in usados]
+                if libres:
+                    individuo['ids'][hueco] = libres[self.rng.integers(len(libres))]
+                elif individuo['ids'][hueco] < 0:
+                    individuo['activo'][hueco] = False
+        
+        # Perturbar parámetros
+        forma = individuo['params'].shape
+        cambios = self.rng.random(forma) < p
+        pasos = np.array([1, 2, 2, 15, 15])
+        delta = self.rng.integers(-1, 2, size=forma) * pasos
+        params = individuo['params'] + np.where(cambios, delta, 0)
+        params = np.clip(params, *self.LIMITES_PARAMS)
+        params[:, 2] = np.maximum(params[:, 2], params[:, 1] + 1)
+        params[:, 4] = np.maximum(params[:, 4], params[:, 3])
+        individuo['params'] = params
+        
+        # Cardio: quitar, poner o cambiar
+        if len(plantilla['cardios']):
+            for d in range(len(plantilla['dias'])):
+                if self.rng.random() < p:
+                    if individuo['cardio'][d] >= 0 and self.rng.random() < 0.5:
+                        individuo['cardio'][d] = -1
+                    else:
+                        individuo['cardio'][d] = self.rng.choice(plantilla['cardios'])
+                if self.rng.random() < p:
+                    individuo['cardio_min'][d] = np.clip(individuo['cardio_min'][d] + self.rng.integers(-5, 6), 10, 45)
+        
+        return individuo
+    
+    def _torneo(self, fitness, k=3):
+        """Índice del ganador de un torneo de tamaño k"""
+        participantes = self.rng.integers(len(fitness), size=k)
+        return participantes[np.argmax(fitness[participantes])]
+    
+    # ------------------------------------------------------------------
+    # Evaluación
+    # ------------------------------------------------------------------
+    
+    def _evaluar(self, perfil, rutinas, pool):
+        """Fitness de un lote de rutinas (en procesos si hay pool)"""
+        if pool is None:
+            return np.array([s['score_total'] for s in self.motor._evaluar_rutinas_lote(perfil, rutinas)])
+        
+        tamano = -(-len(rutinas) // self.procesos)
+        lotes = [rutinas[i:i + tamano] for i in range(0, len(rutinas), tamano)]
+        resultados = pool.map(_evaluar_lote_proceso, [perfil] * len(lotes), lotes)
+        return np.array([score for lote in resultados for score in lote])
+    
+    # ------------------------------------------------------------------
+    # Bucle principal
+    # ------------------------------------------------------------------
+    
+    def optimizar(self, perfil, semillas, mascara=None, params_defecto=None):
+        """
+        Evoluciona una población a partir de rutinas semilla
+        
+        Args:
+            perfil: Perfil del usuario (de crear_perfil_usuario)
+            semillas: Rutinas iniciales (definen la plantilla de días y grupos)
+            mascara: Bitset de ejercicios permitidos (None = todos)
+            params_defecto: (series, reps_min, reps_max, descanso_min, descanso_max)
+                para huecos sin parámetros en las semillas
+        
+        Returns:
+            dict: {'rutina', 'fitness', 'generaciones', 'traza', 'motivo_parada'}
+        """
+        nivel = perfil['nivel_str']
+        estructura = semillas[0].get('estructura', 'fullbody')
+        params_defecto = np.array(params_defecto or (4, 8, 12, 60, 90))
+        plantilla = self._construir_plantilla(semillas, nivel, mascara)
+        
+        poblacion = [self._codificar(r, plantilla, params_defecto) for r in semillas]
+        while len(poblacion) < self.tamano_poblacion:
+            base = poblacion[self.rng.integers(len(semillas))]
+            poblacion.append(self._mutar(self._copiar(base), plantilla))
+        
+        pool = None
+        if self.procesos:
+            estadisticas = self.motor.estadisticas_ejercicios
+            initargs = (self.motor.base_conocimientos,)
+            if estadisticas is not None:
+                initargs += (estadisticas.catalogo, estadisticas.a_arrays(), estadisticas.k)
+            pool = ProcessPoolExecutor(max_workers=self.procesos,
+                                       initializer=_inicializar_proceso,
+                                       initargs=initargs)
+        
+        inicio = time.perf_counter()
+        traza = []
+        mejor_fitness = -np.inf
+        mejor = None
+        sin_mejora = 0
+        motivo = 'generaciones'
+        
+        try:
+            for generacion in range(self.generaciones):
+                rutinas = [self._decodificar(ind, plantilla, estructura) for ind in poblacion]
+                fitness = self._evaluar(perfil, rutinas, pool)
+                
+                orden = np.argsort(-fitness, kind='stable')
+                traza.append({
+                    'generacion': generacion,
+                    'mejor': float(fitness[orden[0]]),
+                    'media': float(fitness.mean()),
+                    'segundos': round(time.perf_counter() - inicio, 4)
+                })
+                
+                if fitness[orden[0]] > mejor_fitness + self.tolerancia:
+                    mejor_fitness = float(fitness[orden[0]])
+                    mejor = rutinas[orden[0]]
+                    sin_mejora = 0
+                else:
+                    sin_mejora += 1
+                
+                if sin_mejora >= self.paciencia:
+                    motivo = 'paciencia'
+                    break
+                if self.tiempo_max is not None and time.perf_counter() - inicio >= self.tiempo_max:
+                    motivo = 'tiempo'
+                    break
+                
+                # Siguiente generación: élite + hijos por torneo, cruce y mutación
+                siguiente = [self._copiar(poblacion[i]) for i in orden[:self.elite]]
+                while len(siguiente) < self.tamano_poblacion:
+                    padre = poblacion[self._torneo(fitness)]
+                    if self.rng.random() < self.prob_cruce:
+                        hijo = self._cruzar(padre, poblacion[self._torneo(fitness)], plantilla)
+                    else:
+                        hijo = self._copiar(padre)
+                    siguiente.append(self._mutar(hijo, plantilla))
+                poblacion = siguiente
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        
+        mejor['metadatos']['fitness'] = mejor_fitness
+        return {
+            'rutina': mejor,
+            'fitness': mejor_fitness,
+            'generaciones': len(traza),
+            'traza': traza,
+            'motivo_parada': motivo
+        }
@@ -0,0 +1,199 @@
+import os
+from datetime import datetime
+
+import numpy as np
+
+
+# Una fila por experiencia del histórico, en el mismo orden; ancho fijo y
+# little-endian para que el archivo sirva igual a cualquier proceso
+DTYPE_PERFIL = np.dtype([
+    ('edad', '<f8'),
+    ('imc', '<f8'),
+    ('nivel_num', '<f8'),
+    ('objetivo', '<i2'),       # Índice en OBJETIVOS (-1 = otro)
+    ('dias', '<f8'),
+    ('satisfaccion', '<f8'),
+    ('timestamp', '<f8')       # Fecha de la experiencia (segundos)
+])
+
+OBJETIVOS = ('', 'perder_peso', 'ganar_masa', 'resistencia', 'fuerza')
+
+
+def codigo_objetivo(objetivo):
+    return OBJETIVOS.index(objetivo) if objetivo in OBJETIVOS else -1
+
+
+def marca_tiempo(fecha):
+    try:
+        return datetime.fromisoformat(fecha).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ColumnasPerfiles:
+    """
+    Columnas numéricas de los perfiles del histórico en un archivo binario.
+    
+    Buscar usuarios similares compara el perfil nuevo con todo el
+    histórico; con estas columnas la comparación es una operación
+    vectorizada sobre un numpy.memmap, sin recorrer los dicts. Solo de los
+    pocos más similares se toma después la experiencia completa.
+    
+    El archivo '<datos>.perfiles' tiene una fila de DTYPE_PERFIL por
+    experiencia, en el orden del histórico tal como queda en la base (la
+    instantánea y luego el diario). Todos los procesos que comparten la
+    base añaden sus filas al final, con el bloqueo de la base tomado, así
+    que comparten también las páginas en caché del sistema. Las
+    experiencias propias aún no guardadas se llevan en un array pequeño
+    en memoria hasta que se escriben.
+    
+    Las similitudes son las mismas (bit a bit) que las de
+    MotorInferencia._calcular_similitud; los objetivos fuera de OBJETIVOS
+    se comparan todos como iguales entre sí.
+    """
+    
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.canonicas = 0    # Filas del archivo que corresponden al histórico en memoria
+        self._mapa = None     # memmap de las primeras filas del archivo
+        # Histórico[canonicas:], en un búfer que crece al doble para que
+        # añadir filas sin archivo (o sin guardar) no copie todo cada vez
+        self._buffer = np.zeros(0, dtype=DTYPE_PERFIL)
+        self._num_locales = 0
+    
+    def __len__(self):
+        return self.canonicas + self._num_locales
+    
+    @property
+    def _locales(self):
+        return self._buffer[:self._num_locales]
+    
+    @_locales.setter
+    def _locales(self, filas):
+        self._buffer = filas
+        self._num_locales = len(filas)
+    
+    @staticmethod
+    def fila(experiencia):
+        perfil = experiencia.get('perfil', {})
+        return (perfil.get('edad', 30), perfil.get('imc', 22), perfil.get('nivel_num', 2),
+                codigo_objetivo(perfil.get('objetivo_str', '')), perfil.get('dias', 4),
+                experiencia.get('satisfaccion', 0), marca_tiempo(experiencia.get('fecha')))
+    
+    @classmethod
+    def filas(cls, experiencias):
+        return np.array([cls.fila(e) for e in experiencias], dtype=DTYPE_PERFIL)
+    
+    def agregar(self, experiencia):
+        """Añade la fila de una experiencia recién añadida al histórico (aún sin escribir)"""
+        if self._num_locales == len(self._buffer):
+            buffer = np.zeros(max(16, 2 * self._num_locales), dtype=DTYPE_PERFIL)
+            buffer[:self._num_locales] = self._locales
+            self._buffer = buffer
+        self._buffer[self._num_locales] = self.fila(experiencia)
+        self._num_locales += 1
+    
+    def cubre(self, historico):
+        """Las columnas están alineadas con esta lista del histórico"""
+        return len(historico) == len(self)
+    
+    # ------------------------------------------------------------------
+    # Archivo (siempre con el bloqueo de la base tomado)
+    # ------------------------------------------------------------------
+    
+    def _filas_en_archivo(self):
+        try:
+            return os.path.getsize(self.ruta) // DTYPE_PERFIL.itemsize
+        except OSError:
+            return 0
+    
+    def _leer_fila(self, f, i):
+        f.seek(i * DTYPE_PERFIL.itemsize)
+        return np.frombuffer(f.read(DTYPE_PERFIL.itemsize), dtype=DTYPE_PERFIL)[0]
+    
+    def _coincide(self, historico, canonicas):
+        """Comprobación barata: primera y última fila del tramo común"""
+        with open(self.ruta, 'rb') as f:
+            for i in {0, canonicas - 1}:
+                if self._leer_fila(f, i)['timestamp'] != marca_tiempo(historico[i].get('fecha')):
+                    return False
+        return True
+    
+    def sincronizar(self, historico, canonicas):
+        """
+        Deja el archivo con las filas de historico[:canonicas] y vuelve a mapearlo
+        
+        Args:
+            historico: Lista historico_usuarios en memoria
+            canonicas: Cuántas experiencias del principio ya están en la base
+                en ese mismo orden (el resto son propias sin guardar)
+        """
+        en_archivo = self._filas_en_archivo()
+        comunes = min(en_archivo, canonicas)
+        try:
+            if comunes and not self._coincide(historico, comunes):
+                # El archivo es de otra base (p. ej. se fusionó otra encima)
+                comunes = 0
+            if comunes < canonicas:
+                self._mapa = None  # Soltar el mapeo antes de tocar el archivo
+                if comunes == en_archivo:
+                    # Solo se añade al final: las filas que otros procesos
+                    # tengan mapeadas no cambian
+                    with open(self.ruta, 'ab') as f:
+                        f.write(self.filas(historico[comunes:canonicas]).tobytes())
+                else:
+                    # Hay que rehacerlo: en un archivo nuevo que sustituye al
+                    # anterior, nunca acortando éste, porque otro proceso
+                    # puede tenerlo mapeado y leer más allá del nuevo final
+                    # lo mataría (SIGBUS); su mapeo sigue viendo el antiguo
+                    temporal = self.ruta + '.tmp'
+                    with open(temporal, 'wb') as f:
+                        f.write(self.filas(historico[:canonicas]).tobytes())
+                    os.replace(temporal, self.ruta)
+        except OSError:
+            # Sin archivo utilizable: todo el histórico va en memoria
+            self._mapa = None
+            self.canonicas = 0
+            self._locales = self.filas(historico)
+            return
+        
+        self._mapa = (np.memmap(self.ruta, dtype=DTYPE_PERFIL, mode='r', shape=(canonicas,))
+                      if canonicas else None)
+        self.canonicas = canonicas
+        self._locales = self.filas(historico[canonicas:])
+    
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    
+    def _tramos(self):
+        if self._mapa is not None:
+            yield self._mapa
+        yield self._locales
+    
+    def columna(self, nombre):
+        return np.concatenate([tramo[nombre] for tramo in self._tramos()])
+    
+    def similitudes(self, perfil):
+        """
+        Similitud del perfil con cada experiencia del histórico
+        
+        Misma fórmula y mismo orden de operaciones que
+        MotorInferencia._calcular_similitud (1 / (1 + distancia)).
+        """
+        edad = perfil.get('edad', 30)
+        imc = perfil.get('imc', 22)
+        nivel = perfil.get('nivel_num', 2)
+        dias = perfil.get('dias', 4)
+        objetivo = codigo_objetivo(perfil.get('objetivo_str', ''))
+        
+        resultado = []
+        for tramo in self._tramos():
+            diff_edad = np.abs(edad - tramo['edad']) / 100
+            diff_imc = np.abs(imc - tramo['imc']) / 20
+            diff_nivel = np.abs(nivel - tramo['nivel_num']) / 3
+            diff_obj = (tramo['objetivo'] != objetivo).astype(np.float64)
+            diff_dias = np.abs(dias - tramo['dias']) / 7
+            distancia = np.sqrt(diff_edad**2 + diff_imc**2 + diff_nivel**2 + diff_obj**2 + diff_dias**2)
+            resultado.append(1 / (1 + distancia))
+        return np.concatenate(resultado)
@@ -0,0 +1,220 @@
+import threading
+import time
+
+
+class PoolRutinas:
+    """
+    Pool de rutinas candidatas precalculadas por celda de perfil.
+    
+    El espacio de celdas (nivel, objetivo, días) es pequeño: 3 x 4 x 7.
+    Un hilo en segundo plano genera rutinas de exploración para cada celda,
+    las puntúa en lote con el motor de inferencia y guarda las mejores.
+    Así generar_rutina_inteligente solo tiene que tomar una del pool y
+    personalizar los parámetros.
+    
+    Cada celda recuerda la versión del conocimiento con la que se llenó
+    (generación y patrones exitosos); si cambia, la celda se descarta y se
+    vuelve a llenar.
+    """
+    
+    NIVELES = ('principiante', 'intermedio', 'avanzado')
+    OBJETIVOS = ('perder_peso', 'ganar_masa', 'resistencia', 'fuerza')
+    DIAS = tuple(range(1, 8))
+    
+    def __init__(self, sistema, tamano=6, minimo=2, candidatos_por_lote=12, pausa=0.2):
+        """
+        Args:
+            sistema: Instancia de AdvancedGymAI que genera y puntúa rutinas
+            tamano: Rutinas que se conservan por celda
+            minimo: Por debajo de este número la celda se rellena
+            candidatos_por_lote: Rutinas generadas en cada relleno
+            pausa: Segundos de espera entre celdas para no acaparar la CPU
+        """
+        self.sistema = sistema
+        self.tamano = tamano
+        self.minimo = minimo
+        self.candidatos_por_lote = candidatos_por_lote
+        self.pausa = pausa
+        
+        # Flujo aleatorio propio del hilo de relleno
+        self.rng = sistema.semillas.nuevo()
+        
+        self._celdas = {}  # clave -> {'version': ..., 'rutinas': [(score, rutina), ...]}
+        self._pendientes = []  # Celdas pedidas recientemente (se rellenan primero)
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        
+        self.aciertos = 0
+        self.fallos = 0
+    
+    @staticmethod
+    def clave(perfil):
+        """Celda a la que pertenece un perfil"""
+        return (perfil['nivel_str'], perfil['objetivo_str'], perfil['dias'])
+    
+    def claves(self):
+        """Todas las celdas del espacio de perfiles"""
+        return [(n, o, d) for n in self.NIVELES for o in self.OBJETIVOS for d in self.DIAS]
+    
+    # ------------------------------------------------------------------
+    # Uso desde la generación interactiva
+    # ------------------------------------------------------------------
+    
+    def tomar(self, perfil):
+        """
+        Saca la mejor rutina disponible para la celda del perfil
+        
+        Returns:
+            dict o None: Rutina lista para personalizar, o None si la celda
+            está vacía o desactualizada
+        """
+        clave = self.clave(perfil)
+        version = self.sistema.version_conocimiento()
+        
+        with self._lock:
+            celda = self._celdas.get(clave)
+            if celda and celda['version'] == version and celda['rutinas']:
+                _, rutina = celda['rutinas'].pop(0)
+                restantes = len(celda['rutinas'])
+                self.aciertos += 1
+            else:
+                rutina = None
+                restantes = 0
+                self.fallos += 1
+            
+            if restantes < self.minimo and clave not in self._pendientes:
+                self._pendientes.append(clave)
+        
+        self._despertar.set()
+        return rutina
+    
+    def invalidar(self):
+        """Descarta todas las celdas (se rellenan en segundo plano)"""
+        with self._lock:
+            self._celdas.clear()
+        self._despertar.set()
+    
+    def estado(self):
+        """Resumen del pool para diagnóstico"""
+        version = self.sistema.version_conocimiento()
+        with self._lock:
+            llenas = sum(1 for c in self._celdas.values()
+                         if c['version'] == version and c['rutinas'])
+            rutinas = sum(len(c['rutinas']) for c in self._celdas.values()
+                          if c['version'] == version)
+        return {
+            'celdas_llenas': llenas,
+            'celdas_totales': len(self.claves()),
+            'rutinas_disponibles': rutinas,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos
+        }
+    
+    # ------------------------------------------------------------------
+    # Relleno
+    # ------------------------------------------------------------------
+    
+    def rellenar_celda(self, clave):
+        """
+        Genera, puntúa y guarda las mejores rutinas para una celda
+        
+        La generación y la puntuación se hacen con el lock_conocimiento del
+        sistema tomado: así no se cruzan con un feedback o una recarga que
+        esté cambiando el histórico, el catálogo o las estadísticas, y todas
+        las rutinas de la celda se puntúan con la misma versión.
+        """
+        with self.sistema.lock_conocimiento:
+            version = self.sistema.version_conocimiento()
+            perfil = self._perfil_representativo(clave)
+            
+            candidatos = [
+                self.sistema._generar_rutina_exploracion(perfil, self.rng)
+                for _ in range(self.candidatos_por_lote)
+            ]
+            
+            motor = self.sistema.motor_inferencia
+            if motor:
+                scores = [s['score_total'] for s in motor._evaluar_rutinas_lote(perfil, candidatos)]
+            else:
+                scores = [0] * len(candidatos)
+        
+        with self._lock:
+            celda = self._celdas.get(clave)
+            if celda is None or celda['version'] != version:
+                celda = {'version': version, 'rutinas': []}
+                self._celdas[clave] = celda
+            
+            celda['rutinas'].extend(zip(scores, candidatos))
+            celda['rutinas'].sort(key=lambda x: x[0], reverse=True)
+            del celda['rutinas'][self.tamano:]
+        
+        self.sistema.eventos.debug('pool.celda_rellenada', clave=list(clave),
+                                   version=list(version), rutinas=len(celda['rutinas']))
+    
+    def _perfil_representativo(self, clave):
+        """Perfil medio de una celda (adulto de complexión normal)"""
+        nivel, objetivo, dias = clave
+        return self.sistema.crear_perfil_usuario({
+            'edad': 30,
+            'peso': 70.0,
+            'altura': 1.72,
+            'nivel_experiencia': nivel,
+            'objetivo': objetivo,
+            'dias_entrenamiento': dias
+        })
+    
+    def _siguiente_celda(self):
+        """Celda que más necesita relleno (primero las pedidas), o None"""
+        version = self.sistema.version_conocimiento()
+        with self._lock:
+            while self._pendientes:
+                clave = self._pendientes.pop(0)
+                celda = self._celdas.get(clave)
+                if celda is None or celda['version'] != version or len(celda['rutinas']) < self.tamano:
+                    return clave
+            
+            for clave in self.claves():
+                celda = self._celdas.get(clave)
+                if celda is None or celda['version'] != version or len(celda['rutinas']) < self.minimo:
+                    return clave
+        
+        return None
+    
+    # ------------------------------------------------------------------
+    # Hilo en segundo plano
+    # ------------------------------------------------------------------
+    
+    def iniciar(self):
+        """Arranca el hilo de relleno (daemon)"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name='PoolRutinas', daemon=True)
+        self._hilo.start()
+    
+    def detener(self, timeout=None):
+        """Detiene el hilo de relleno"""
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join(timeout)
+            self._hilo = None
+    
+    def _bucle(self):
+        while not self._detener.is_set():
+            clave = self._siguiente_celda()
+            
+            if clave is None:
+                # Todo lleno: esperar a que alguien consuma o invalide
+                self._despertar.wait(timeout=5.0)
+                self._despertar.clear()
+                continue
+            
+            try:
+                self.rellenar_celda(clave)
+            except Exception as e:
+                self.sistema.eventos.error('pool.error_relleno', clave=list(clave), error=str(e))
+            
+            time.sleep(self.pausa)
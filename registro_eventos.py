@@ -0,0 +1,143 @@
+import json
+import string
+import threading
+from collections import deque
+from datetime import datetime
+
+
+# Niveles de severidad (mismo orden que el módulo logging)
+NIVELES = {
+    'DEBUG': 10,
+    'INFO': 20,
+    'WARNING': 30,
+    'ERROR': 40
+}
+
+
+class _FormatoMensaje(string.Formatter):
+    """
+    str.format con dos conversiones más para los mensajes de consola:
+    '!u' pasa el valor a mayúsculas y '!b' escribe un booleano como SÍ/NO.
+    Así el texto de consola se mantiene igual que el de los antiguos print
+    mientras los campos del evento guardan el valor original.
+    """
+    
+    def convert_field(self, value, conversion):
+        if conversion == 'u':
+            return str(value).upper()
+        if conversion == 'b':
+            return 'SÍ' if value else 'NO'
+        return super().convert_field(value, conversion)
+
+
+_FORMATO_MENSAJE = _FormatoMensaje()
+
+
+class RegistroEventos:
+    """
+    Registro estructurado de eventos del sistema de IA.
+    
+    Sustituye a los print() de las rutas críticas (generación, feedback,
+    inferencia). Cada evento es un dict con nombre, nivel y campos, que se
+    guarda en un buffer circular en memoria y opcionalmente en un archivo
+    JSONL. El texto para consola solo se formatea si la consola está activa.
+    
+    Por defecto está desactivado: en uso como librería o en lotes emitir
+    un evento cuesta una comparación y no hay E/S de terminal.
+    """
+    
+    def __init__(self, activo=False, nivel='INFO', capacidad=1000,
+                 archivo_jsonl=None, consola=False):
+        """
+        Args:
+            activo: Si False, todos los eventos se descartan
+            nivel: Nivel mínimo registrado ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+            capacidad: Tamaño del buffer circular en memoria
+            archivo_jsonl: Ruta opcional donde anexar cada evento como JSON
+            consola: Si True, imprime el mensaje legible de cada evento
+        """
+        self.activo = activo
+        self.nivel_minimo = NIVELES[nivel]
+        self.buffer = deque(maxlen=capacidad)
+        self.archivo_jsonl = archivo_jsonl
+        self.consola = consola
+        self._lock = threading.Lock()
+        self._archivo = None
+    
+    def habilitado(self, nivel):
+        """Indica si un evento de este nivel se registraría"""
+        return self.activo and NIVELES[nivel] >= self.nivel_minimo
+    
+    def emitir(self, nivel, evento, mensaje=None, **campos):
+        """
+        Registra un evento
+        
+        Args:
+            nivel: Nivel del evento
+            evento: Nombre del evento (ej: 'prediccion.resultado')
+            mensaje: Plantilla str.format para consola, rellenada con los campos
+                (admite además las conversiones '!u' y '!b', ver _FormatoMensaje)
+            **campos: Información estructurada del evento
+        """
+        if not self.activo or NIVELES[nivel] < self.nivel_minimo:
+            return
+        
+        registro = {
+            'ts': datetime.now().isoformat(),
+            'nivel': nivel,
+            'evento': evento,
+            **campos
+        }
+        self.buffer.append(registro)
+        
+        if self.archivo_jsonl:
+            linea = json.dumps(registro, ensure_ascii=False, default=str)
+            with self._lock:
+                if self._archivo is None:
+                    self._archivo = open(self.archivo_jsonl, 'a', encoding='utf-8')
+                self._archivo.write(linea + '\n')
+                self._archivo.flush()
+        
+        if self.consola and mensaje:
+            print(_FORMATO_MENSAJE.format(mensaje, **campos))
+    
+    def debug(self, evento, mensaje=None, **campos):
+        self.emitir('DEBUG', evento, mensaje, **campos)
+    
+    def info(self, evento, mensaje=None, **campos):
+        self.emitir('INFO', evento, mensaje, **campos)
+    
+    def advertencia(self, evento, mensaje=None, **campos):
+        self.emitir('WARNING', evento, mensaje, **campos)
+    
+    def error(self, evento, mensaje=None, **campos):
+        self.emitir('ERROR', evento, mensaje, **campos)
+    
+    def eventos(self, evento=None, nivel='DEBUG'):
+        """
+        Devuelve los eventos del buffer en memoria
+        
+        Args:
+            evento: Filtra por nombre de evento (o prefijo terminado en '.')
+            nivel: Nivel mínimo de los eventos devueltos
+        
+        Returns:
+            list: Eventos en orden cronológico
+        """
+        minimo = NIVELES[nivel]
+        resultado = []
+        for registro in list(self.buffer):
+            if NIVELES[registro['nivel']] < minimo:
+                continue
+            if evento and not (registro['evento'] == evento or
+                               (evento.endswith('.') and registro['evento'].startswith(evento))):
+                continue
+            resultado.append(registro)
+        return resultado
+    
+    def cerrar(self):
+        """Cierra el archivo JSONL si está abierto"""
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo = None
@@ -0,0 +1,81 @@
+import re
+import unicodedata
+
+
+# Frases de las limitaciones -> etiquetas de ejercicios a excluir.
+# Se evalúan en orden y cada frase encontrada se elimina del texto, así
+# "barra fija" no cuenta además como "barra".
+PALABRAS_CLAVE_LIMITACIONES = [
+    (r'barra fija|dominadas?', ('equipo_barra_fija',)),
+    (r'rodilla|menisco|ligamento', ('carga_rodilla',)),
+    (r'hombro|manguito', ('carga_hombro',)),
+    (r'espalda|lumbar|columna|hernia|ciatica', ('carga_lumbar',)),
+    (r'muneca', ('carga_muneca',)),
+    (r'codo', ('carga_codo',)),
+    (r'impacto|tobillo|salto', ('alto_impacto',)),
+    (r'barra', ('equipo_barra',)),
+    (r'mancuerna', ('equipo_mancuernas',)),
+    (r'polea', ('equipo_polea',)),
+    (r'maquina', ('equipo_maquina',)),
+    (r'banco', ('equipo_banco',)),
+    (r'paralela', ('equipo_paralelas',)),
+]
+
+
+def _normalizar(texto):
+    """Minúsculas y sin tildes"""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def etiquetas_excluidas(limitaciones):
+    """
+    Interpreta el texto libre de limitaciones (lesiones, equipo que falta)
+    
+    Returns:
+        set: Etiquetas de ejercicios que no se deben usar
+    """
+    if not limitaciones:
+        return set()
+    
+    texto = _normalizar(limitaciones)
+    excluidas = set()
+    for patron, etiquetas in PALABRAS_CLAVE_LIMITACIONES:
+        texto, encontradas = re.subn(patron, ' ', texto)
+        if encontradas:
+            excluidas.update(etiquetas)
+    return excluidas
+
+
+def compilar_limitaciones(limitaciones, catalogo):
+    """
+    Compila las limitaciones de un socio a una máscara de ejercicios permitidos
+    
+    La máscara es un entero usado como bitset sobre los IDs del catálogo:
+    excluir ejercicios en la generación es un AND por grupo.
+    
+    Args:
+        limitaciones: Texto libre del formulario
+        catalogo: CatalogoEjercicios con etiquetas
+    
+    Returns:
+        int o None: Bitset de IDs permitidos, o None si no hay restricciones
+    """
+    return mascara_permitidos(etiquetas_excluidas(limitaciones), catalogo)
+
+
+def mascara_permitidos(excluidas, catalogo):
+    """
+    Bitset de los ejercicios del catálogo sin ninguna de las etiquetas excluidas
+    
+    Returns:
+        int o None: Bitset de IDs permitidos, o None si no se excluye nada
+    """
+    if not excluidas:
+        return None
+    
+    prohibidos = 0
+    for etiqueta in excluidas:
+        prohibidos |= catalogo.bits_etiqueta(etiqueta)
+    
+    return catalogo.bits_todos & ~prohibidos
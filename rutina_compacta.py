@@ -0,0 +1,198 @@
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Una fila por ejercicio de la rutina
+DTYPE_RUTINA = np.dtype([
+    ('dia', np.uint8),            # Índice del día (0 = "Día 1")
+    ('ejercicio_id', np.int32),   # ID del catálogo (-1 si no hay catálogo)
+    ('grupo_id', np.int16),       # ID del grupo en el catálogo (-1 si no hay catálogo)
+    ('series', np.uint8),
+    ('reps_min', np.uint8),
+    ('reps_max', np.uint8),
+    ('reps_rango', np.bool_),     # Las repeticiones venían como rango 'a-b' (no '12')
+    ('descanso_min_s', np.uint16),
+    ('descanso_max_s', np.uint16),
+    ('cardio_min', np.uint8),     # Duración del cardio en minutos
+    ('intensidad', np.uint8)      # Índice en INTENSIDADES (0 = no es cardio)
+])
+
+INTENSIDADES = ('', 'moderada', 'alta', 'HIIT')
+
+
+def _rango(texto):
+    """(min, max) de textos como '8-12', '60s' o '60-90s'; (0, 0) si no hay números"""
+    numeros = re.findall(r'\d+', str(texto))
+    if not numeros:
+        return 0, 0
+    return int(numeros[0]), int(numeros[-1])
+
+
+def _numero(valor):
+    """Entero de un valor numérico o, si es texto ('3', '3-4'), su primer número (0 si no hay)"""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return int(valor)
+    return _rango(valor)[0]
+
+
+def _acotado(valor, campo):
+    """Valor recortado al rango del campo de DTYPE_RUTINA (datos antiguos o editados a mano)"""
+    return min(max(valor, 0), np.iinfo(DTYPE_RUTINA[campo]).max)
+
+
+def _es_rango(texto):
+    """Si un texto es un rango numérico 'a-b' como '8-12' (no '12' ni 'AMRAP')"""
+    partes = str(texto).split('-')
+    return len(partes) == 2 and all(p.strip().isdigit() for p in partes)
+
+
+class RutinaCompacta:
+    """
+    Rutina respaldada por un array estructurado de NumPy.
+    
+    El formato JSON de siempre ("Día N" -> lista de dicts con textos como
+    '8-12' o '60-90s') se convierte una vez a filas de tamaño fijo; los
+    análisis sobre muchas rutinas trabajan con columnas en lugar de volver
+    a parsear los textos. Cada fila ocupa DTYPE_RUTINA.itemsize bytes.
+    
+    Los nombres de los días se guardan aparte (normalmente "Día 1".."Día N")
+    junto con la estructura y los metadatos, para poder volver al dict.
+    """
+    
+    __slots__ = ('filas', 'dias', 'estructura', 'metadatos')
+    
+    def __init__(self, filas, dias, estructura=None, metadatos=None):
+        self.filas = filas
+        self.dias = dias
+        self.estructura = estructura
+        self.metadatos = metadatos or {}
+    
+    def __len__(self):
+        return len(self.filas)
+    
+    @classmethod
+    def desde_dict(cls, rutina, catalogo=None):
+        """
+        Convierte una rutina en formato dict
+        
+        Args:
+            rutina: Rutina con 'rutina_semanal'
+            catalogo: CatalogoEjercicios para resolver IDs; los ejercicios
+                desconocidos se registran como no seleccionables
+        """
+        rutina_semanal = rutina.get('rutina_semanal', {}) if rutina else {}
+        dias = list(rutina_semanal)
+        total = sum(len(ejercicios) for ejercicios in rutina_semanal.values())
+        filas = np.zeros(total, dtype=DTYPE_RUTINA)
+        
+        i = 0
+        for d, dia in enumerate(dias):
+            for ej in rutina_semanal[dia]:
+                fila = filas[i]
+                fila['dia'] = d
+                grupo = ej.get('grupo')
+                
+                if catalogo is not None and 'ejercicio' in ej:
+                    ejercicio_id = catalogo.id_o_registrar(grupo, ej['ejercicio'])
+                    fila['ejercicio_id'] = ejercicio_id
+                    fila['grupo_id'] = catalogo.grupo_id[ejercicio_id]
+                else:
+                    fila['ejercicio_id'] = -1
+                    fila['grupo_id'] = -1
+                
+                if grupo == 'cardio':
+                    fila['cardio_min'] = _acotado(_rango(ej.get('duracion'))[0], 'cardio_min')
+                    intensidad = ej.get('intensidad', 'moderada')
+                    fila['intensidad'] = INTENSIDADES.index(intensidad) if intensidad in INTENSIDADES else 1
+                else:
+                    fila['series'] = _acotado(_numero(ej.get('series', 0)), 'series')
+                    reps_min, reps_max = _rango(ej.get('repeticiones'))
+                    fila['reps_min'] = _acotado(reps_min, 'reps_min')
+                    fila['reps_max'] = _acotado(reps_max, 'reps_max')
+                    fila['reps_rango'] = _es_rango(ej.get('repeticiones'))
+                    descanso_min, descanso_max = _rango(ej.get('descanso'))
+                    fila['descanso_min_s'] = _acotado(descanso_min, 'descanso_min_s')
+                    fila['descanso_max_s'] = _acotado(descanso_max, 'descanso_max_s')
+                i += 1
+        
+        return cls(filas, dias, rutina.get('estructura') if rutina else None,
+                   dict(rutina.get('metadatos', {})) if rutina else {})
+    
+    def a_dict(self, catalogo):
+        """Vuelve al formato dict de siempre (necesita el catálogo para los nombres)"""
+        rutina_semanal = OrderedDict((dia, []) for dia in self.dias)
+        for fila in self.filas:
+            dia = self.dias[fila['dia']]
+            ejercicio_id = int(fila['ejercicio_id'])
+            if fila['intensidad']:
+                rutina_semanal[dia].append({
+                    'ejercicio': catalogo.nombre(ejercicio_id),
+                    'grupo': 'cardio',
+                    'duracion': f"{int(fila['cardio_min'])} min",
+                    'intensidad': INTENSIDADES[fila['intensidad']]
+                })
+            else:
+                desc_min, desc_max = int(fila['descanso_min_s']), int(fila['descanso_max_s'])
+                rutina_semanal[dia].append({
+                    'ejercicio': catalogo.nombre(ejercicio_id),
+                    'grupo': catalogo.grupo(ejercicio_id),
+                    'series': int(fila['series']),
+                    'repeticiones': f"{int(fila['reps_min'])}-{int(fila['reps_max'])}",
+                    'descanso': f"{desc_min}s" if desc_min == desc_max else f"{desc_min}-{desc_max}s"
+                })
+        
+        rutina = {'rutina_semanal': dict(rutina_semanal)}
+        if self.estructura is not None:
+            rutina['estructura'] = self.estructura
+        rutina['metadatos'] = dict(self.metadatos)
+        return rutina
+
+
+def concatenar_filas(rutinas):
+    """
+    Une las filas de varias rutinas compactas en un único array
+    
+    Returns:
+        tuple: (filas, índice de rutina de cada fila)
+    """
+    if not rutinas:
+        return np.zeros(0, dtype=DTYPE_RUTINA), np.zeros(0, dtype=np.int32)
+    filas = np.concatenate([r.filas for r in rutinas])
+    origen = np.repeat(np.arange(len(rutinas), dtype=np.int32), [len(r) for r in rutinas])
+    return filas, origen
+
+
+class CacheRutinasCompactas:
+    """
+    Versiones compactas de las rutinas del histórico, convertidas una vez.
+    
+    Las experiencias del histórico no cambian después de guardarse, así
+    que se indexan por (rutina_id, fecha). LRU acotada por capacidad.
+    """
+    
+    def __init__(self, catalogo=None, capacidad=5000):
+        self.catalogo = catalogo
+        self.capacidad = capacidad
+        self._rutinas = OrderedDict()
+    
+    def de_experiencia(self, experiencia, campo='rutina_exitosa'):
+        """RutinaCompacta de la rutina de una experiencia (o None si no tiene)"""
+        rutina = experiencia.get(campo)
+        if not rutina:
+            return None
+        
+        clave = (experiencia.get('rutina_id'), experiencia.get('fecha'), campo)
+        compacta = self._rutinas.get(clave)
+        if compacta is None:
+            compacta = RutinaCompacta.desde_dict(rutina, self.catalogo)
+            self._rutinas[clave] = compacta
+            if len(self._rutinas) > self.capacidad:
+                self._rutinas.popitem(last=False)
+        else:
+            self._rutinas.move_to_end(clave)
+        return compacta
+    
+    def limpiar(self):
+        self._rutinas.clear()